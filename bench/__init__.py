@@ -0,0 +1,20 @@
+"""
+Load and benchmark suite for the API.
+
+    $ python -m bench.datagen --scale 10k           # fill an empty database
+    $ python -m bench.run --scale 10k               # Flask test client
+    $ python -m bench.run --scale 10k --url http://localhost:3000 --concurrency 16
+    $ python -m bench.run --scale 10k --serve asgi --workers 2  # start uvicorn (or gunicorn: wsgi)
+    $ python -m bench.micro encode                  # focused microbenchmarks
+    $ python -m bench.startup                       # boot time and memory per profile
+
+The database is the one in DATABASE_URL. See bench/README.md.
+"""
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+BENCH_PASSWORD = "bench-password"
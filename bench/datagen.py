@@ -0,0 +1,179 @@
+"""
+Synthetic data generator.
+
+Fills an empty database with doctors, their working hours, patients,
+appointments and records at one of the SCALES. Rows are generated lazily
+and inserted in batches through the same path as `flask import` (COPY on
+Postgres, executemany elsewhere), so memory stays flat even at 10M
+appointments. The output is deterministic: the same scale always produces
+the same rows with the same ids.
+
+Appointment i belongs to doctor i % doctors and takes that doctor's next
+free 30-minute slot on a weekday, so the (id_doctor, date, time) unique
+constraint is never hit.
+"""
+import argparse
+import datetime
+import random
+import time
+from bench import BENCH_PASSWORD
+
+SCALES = {
+    "10k": {"doctors": 50, "patients": 2_000, "appointments": 10_000, "records": 5_000},
+    "1m": {"doctors": 2_000, "patients": 100_000, "appointments": 1_000_000, "records": 500_000},
+    "10m": {"doctors": 10_000, "patients": 1_000_000, "appointments": 10_000_000, "records": 5_000_000},
+}
+BATCH_SIZE = 10_000
+START_DATE = datetime.date(2023, 1, 2)  # lunes
+SLOTS_PER_DAY = 16  # 09:00 a 17:00 cada 30 minutos
+
+SPECIALTIES = ("cardiologia", "pediatria", "dermatologia", "neurologia", "traumatologia", "psiquiatria", "medicina general")
+CITIES = (("Caracas", "Venezuela"), ("Bogota", "Colombia"), ("Lima", "Peru"), ("Madrid", "Espana"), ("Santiago", "Chile"))
+FIRST_NAMES = ("Ana", "Luis", "Maria", "Jose", "Carmen", "Pedro", "Lucia", "Jorge", "Elena", "Miguel")
+LAST_NAMES = ("Perez", "Gomez", "Rodriguez", "Fernandez", "Lopez", "Martinez", "Sanchez", "Ramirez", "Torres", "Diaz")
+MODES = ("presencial", "virtual")
+CONFIRMATIONS = ("pendiente", "confirmada", "cancelada")
+REASONS = ("control anual", "dolor de cabeza", "fiebre persistente", "revision de examenes", "dolor lumbar", "consulta de seguimiento")
+DIAGNOSES = ("migraña cronica", "hipertension arterial", "dermatitis atopica", "lumbalgia mecanica", "ansiedad generalizada", "gripe estacional", "fractura de tibia", "diabetes tipo 2")
+TREATMENTS = ("ibuprofeno 400mg cada 8 horas", "losartan 50mg diario", "crema de hidrocortisona", "fisioterapia dos veces por semana", "terapia cognitivo conductual", "reposo e hidratacion", "inmovilizacion con yeso", "metformina 850mg")
+RECOMMENDATIONS = ("control en un mes", "dieta baja en sal", "evitar el sol", "caminar 30 minutos al dia", "dormir ocho horas", "volver si la fiebre continua", "no apoyar la pierna", "medir la glucosa en ayunas")
+
+
+def name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def doctors(count, password):
+    rng = random.Random(1)
+    for i in range(1, count + 1):
+        yield {
+            "name": name(rng),
+            "dni": f"D{i:09d}",
+            "email": f"doctor{i}@bench.test",
+            "password": password,
+            "registrationt": f"REG{i:09d}",
+            "specialty": rng.choice(SPECIALTIES),
+            "number": rng.randint(1_000_000, 9_999_999),
+            "is_active": True,
+        }
+
+
+def availability(count):
+    for id_doctor in range(1, count + 1):
+        for weekday in range(5):
+            yield {
+                "id_doctor": id_doctor,
+                "weekday": weekday,
+                "start_time": datetime.time(9, 0),
+                "end_time": datetime.time(17, 0),
+                "slot_minutes": 30,
+            }
+
+
+def patients(count, password):
+    rng = random.Random(2)
+    for i in range(1, count + 1):
+        city, country = rng.choice(CITIES)
+        yield {
+            "name": name(rng),
+            "dni": f"P{i:09d}",
+            "email": f"patient{i}@bench.test",
+            "password": password,
+            "city": city,
+            "country": country,
+            "age": rng.randint(0, 95),
+            "gender": rng.choice(("femenino", "masculino")),
+            "number": rng.randint(1_000_000, 9_999_999),
+            "is_active": True,
+        }
+
+
+def slot(index):
+    # n-esimo turno libre de un doctor: solo dias de semana
+    day, position = divmod(index, SLOTS_PER_DAY)
+    weeks, weekday = divmod(day, 5)
+    date = START_DATE + datetime.timedelta(days=weeks * 7 + weekday)
+    minutes = 9 * 60 + position * 30
+    return date, datetime.time(minutes // 60, minutes % 60)
+
+
+def appointments(count, doctor_count, patient_count):
+    rng = random.Random(3)
+    for i in range(count):
+        date, time_ = slot(i // doctor_count)
+        yield {
+            "date": date,
+            "time": time_,
+            "reason": rng.choice(REASONS),
+            "mode": rng.choice(MODES),
+            "confirmation": rng.choice(CONFIRMATIONS),
+            "id_doctor": i % doctor_count + 1,
+            "id_patient": rng.randint(1, patient_count),
+        }
+
+
+def records(count, appointment_count, doctor_count):
+    rng = random.Random(4)
+    for i in range(1, count + 1):
+        id_appointment = (i - 1) * appointment_count // count + 1
+        date, _ = slot((id_appointment - 1) // doctor_count)
+        yield {
+            "date": date,
+            "diagnosis": rng.choice(DIAGNOSES),
+            "treatment": rng.choice(TREATMENTS),
+            "recommendations": rng.choice(RECOMMENDATIONS),
+            "id_appointment": id_appointment,
+        }
+
+
+def load(model, rows, label):
+    from commands import insert_batch, SKIPPED_COLUMNS
+
+    table = model.__table__
+    columns = [column for column in table.columns if column.name not in SKIPPED_COLUMNS]
+    started = time.monotonic()
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            insert_batch(table, columns, batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        insert_batch(table, columns, batch)
+        total += len(batch)
+    elapsed = time.monotonic() - started
+    print(f"{label}: {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+def generate(app, scale):
+    from flask_migrate import upgrade
+    from hashing import hash_password
+    from models import db, Doctor, Patient, Appointment, Availability, Record
+
+    sizes = SCALES[scale]
+    with app.app_context():
+        upgrade()
+        if db.session.query(Doctor.id).first() is not None:
+            raise SystemExit("the database already has data; datagen needs an empty database")
+
+        password = hash_password(BENCH_PASSWORD)
+        load(Doctor, doctors(sizes["doctors"], password), "doctors")
+        load(Availability, availability(sizes["doctors"]), "availability")
+        load(Patient, patients(sizes["patients"], password), "patients")
+        load(Appointment, appointments(sizes["appointments"], sizes["doctors"], sizes["patients"]), "appointments")
+        load(Record, records(sizes["records"], sizes["appointments"], sizes["doctors"]), "records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    args = parser.parse_args()
+
+    from app import create_app
+    generate(create_app(), args.scale)
+
+
+if __name__ == "__main__":
+    main()
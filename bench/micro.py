@@ -0,0 +1,178 @@
+"""
+Microbenchmarks for single code paths, without HTTP or routing.
+
+    $ python -m bench.micro encode     # Flask default JSON vs FastJSONProvider
+    $ python -m bench.micro search     # full-text index vs LIKE over records
+    $ python -m bench.micro login      # two email lookups vs one UNION ALL
+    $ python -m bench.micro export     # streamed CSV / Parquet export of every appointment
+    $ python -m bench.micro stats      # dashboard counts: GROUP BY over appointment vs the rollup
+
+search, login, export and stats read the database in DATABASE_URL, filled by
+bench.datagen. encode builds its rows in memory.
+"""
+import argparse
+import datetime
+import random
+import resource
+import time
+import timeit
+from bench.datagen import SCALES
+
+SEARCH_TERMS = ("migraña", "hipertension", "fisioterapia", "glucosa", "dolor", "control")
+
+
+def report(label, seconds, number):
+    print(f"{label:40} {seconds / number * 1000:10.3f} ms")
+
+
+def best(callable_, number, repeat=5):
+    return min(timeit.repeat(callable_, number=number, repeat=repeat))
+
+
+def encode(app, args):
+    from flask.json.provider import DefaultJSONProvider
+    from json_provider import FastJSONProvider
+
+    providers = {"flask default": DefaultJSONProvider(app), "FastJSONProvider": FastJSONProvider(app)}
+    row = {
+        "id": 1, "date": datetime.date(2024, 1, 1), "time": "09:30",
+        "reason": "control anual", "mode": "virtual", "confirmation": "pendiente",
+        "id_doctor": 1, "id_patient": 1,
+    }
+    for size in (1_000, 10_000, 100_000):
+        payload = {"appointment": [{**row, "id": i} for i in range(size)]}
+        number = max(1, 100_000 // size)
+        for name, provider in providers.items():
+            report(f"encode {size} rows, {name}", best(lambda: provider.dumps(payload), number), number)
+
+    from models import Appointment
+
+    def literal(appointment):
+        # como eran los serialize() escritos a mano
+        return {
+            "id": appointment.id, "date": appointment.date, "reason": appointment.reason,
+            "mode": appointment.mode, "confirmation": appointment.confirmation,
+            "id_doctor": appointment.id_doctor, "id_patient": appointment.id_patient,
+            "time": appointment.time,
+        }
+
+    appointments = [Appointment(**{**row, "id": i, "time": datetime.time(9, 30)}) for i in range(10_000)]
+    report("serialize 10000 rows, dict literal", best(lambda: [literal(a) for a in appointments], 1), 1)
+    report("serialize 10000 rows, per-model layout", best(lambda: [a.serialize() for a in appointments], 1), 1)
+
+
+def search(app, args):
+    from sqlalchemy import or_
+    from models import db, Record
+    from search import search_records
+
+    rng = random.Random(0)
+    terms = [rng.choice(SEARCH_TERMS) for _ in range(args.number)]
+
+    def like(q):
+        pattern = f"%{q}%"
+        return (
+            db.session.query(Record.id)
+            .filter(or_(
+                Record.diagnosis.like(pattern),
+                Record.treatment.like(pattern),
+                Record.recommendations.like(pattern),
+            ))
+            .order_by(Record.id)
+            .limit(20)
+            .all()
+        )
+
+    with app.app_context():
+        report(f"search, {db.engine.dialect.name} index", best(lambda: [search_records(q, 20, 0) for q in terms], 1), args.number)
+        report("search, LIKE", best(lambda: [like(q) for q in terms], 1), args.number)
+
+
+def login(app, args):
+    from app import find_user_by_email
+    from models import Doctor, Patient
+
+    rng = random.Random(0)
+    sizes = SCALES[args.scale]
+    emails = [
+        f"doctor{rng.randint(1, sizes['doctors'])}@bench.test" if rng.random() < 0.5
+        else f"patient{rng.randint(1, sizes['patients'])}@bench.test"
+        for _ in range(args.number)
+    ]
+
+    def two_queries(email):
+        # como era antes: doctor primero, patient si no hay doctor
+        return Doctor.query.filter_by(email=email).first() or Patient.query.filter_by(email=email).first()
+
+    with app.test_request_context():
+        report("login lookup, two queries", best(lambda: [two_queries(email) for email in emails], 1), args.number)
+        report("login lookup, UNION ALL", best(lambda: [find_user_by_email(email) for email in emails], 1), args.number)
+
+
+def export(app, args):
+    import export as export_module
+
+    start, end = datetime.date.min, datetime.date.max
+    with app.app_context():
+        for fmt in export_module.available_formats():
+            counts = []
+
+            def counted(chunks):
+                for chunk in chunks:
+                    counts.append(len(chunk))
+                    yield chunk
+
+            size = 0
+            started = time.perf_counter()
+            for data in export_module.encode(counted(export_module.export_rows(start, end)), fmt):
+                size += len(data)
+            seconds = time.perf_counter() - started
+            rows = sum(counts)
+            # ru_maxrss en KB (Linux): el pico no debe crecer con la escala
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(
+                f"export {fmt:8} {rows:>10} rows {rows / seconds:>12.0f} rows/s "
+                f"{size / 1e6 / seconds:>8.1f} MB/s   peak rss {peak:.0f} MB"
+            )
+
+
+def stats(app, args):
+    from sqlalchemy import func
+    from models import db, Appointment, Doctor
+    import stats as stats_module
+
+    groups = ["specialty", "confirmation"]
+
+    def from_appointments():
+        # como antes: contar sobre todas las citas
+        return (
+            db.session.query(Doctor.specialty, Appointment.confirmation, func.count())
+            .join(Doctor, Doctor.id == Appointment.id_doctor)
+            .group_by(Doctor.specialty, Appointment.confirmation)
+            .all()
+        )
+
+    with app.app_context():
+        number = max(1, args.number // 10)
+        report("stats by specialty, GROUP BY appointment", best(from_appointments, number), number)
+        report("stats by specialty, rollup", best(lambda: stats_module.appointment_stats(groups), number), number)
+
+
+BENCHMARKS = {"encode": encode, "search": search, "login": login, "export": export, "stats": stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--number", type=int, default=200, help="calls per measurement")
+    args = parser.parse_args()
+
+    from app import create_app
+    started = time.perf_counter()
+    BENCHMARKS[args.benchmark](create_app(), args)
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
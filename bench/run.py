@@ -0,0 +1,546 @@
+"""
+Drive every route of the API and report latency and throughput.
+
+Two modes:
+
+- client (default): in-process through the Flask test client. Requests run
+  one after another, and the SQL statements of each request are counted.
+- http: against a running server (--url), with --concurrency threads that
+  each keep one connection alive. This is the mode that shows what workers,
+  the pool and the database do under load.
+
+--serve wsgi or --serve asgi starts the server itself, in http mode:
+gunicorn with wsgi.py (--preload) or uvicorn with asgi.py, both with
+--workers processes on the same database. When the run ends it reports the
+memory of the server (PSS summed over the master and its workers, so
+pages shared copy-on-write are counted once) before stopping it. Running
+both with the same --workers compares the two entry points at the same
+memory budget.
+
+Every scenario runs --requests times. Read scenarios pick random ids
+inside the generated data, so the database must be filled by
+bench.datagen at the same --scale. Write scenarios create their own rows
+and delete them afterwards.
+
+With --baseline the results are compared to a stored run. A scenario
+regresses when its p50 or p99 grows, or its throughput drops, by more than
+--tolerance, or when it has more errors than before. Any regression makes
+the command exit with status 1. --save-baseline writes the current run as
+the new baseline.
+"""
+import argparse
+import collections
+import datetime
+import http.client
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+import urllib.parse
+from bench import BENCH_PASSWORD, SRC
+from bench.datagen import SCALES, slot
+
+Scenario = collections.namedtuple("Scenario", "name method path body role heavy")
+
+
+def scenario(name, method, path, body=None, role="doctor", heavy=False):
+    return Scenario(name, method, path, body, role, heavy)
+
+
+class Context:
+    # ids del dataset y de las filas que crean los escenarios de escritura
+    def __init__(self, scale, seed=0):
+        self.sizes = SCALES[scale]
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.run = f"{int(time.time())}{self.rng.randint(0, 999):03d}"
+        self.counter = itertools.count()
+        self.created = collections.defaultdict(collections.deque)
+        # turnos muy por delante de los que uso datagen
+        self.slot_base = self.sizes["appointments"] // self.sizes["doctors"] + 1000 + self.rng.randint(0, 10**6)
+
+    def pick(self, kind):
+        with self.lock:
+            return self.rng.randint(1, self.sizes[kind])
+
+    def unique(self):
+        with self.lock:
+            return f"{self.run}-{next(self.counter)}"
+
+    def push(self, kind, id):
+        with self.lock:
+            self.created[kind].append(id)
+
+    def pop(self, kind):
+        with self.lock:
+            return self.created[kind].popleft() if self.created[kind] else None
+
+    def peek(self, kind):
+        with self.lock:
+            return self.created[kind][0] if self.created[kind] else None
+
+    def record_appointment(self):
+        # la cita de un record que existe, con el mismo reparto que datagen
+        return (self.pick("records") - 1) * self.sizes["appointments"] // self.sizes["records"] + 1
+
+    def free_slot(self):
+        with self.lock:
+            n = next(self.counter)
+        id_doctor = n % self.sizes["doctors"] + 1
+        date, time_ = slot(self.slot_base + n // self.sizes["doctors"])
+        return id_doctor, date, time_
+
+    def date(self):
+        with self.lock:
+            return slot(self.rng.randint(0, self.sizes["appointments"] // self.sizes["doctors"]))[0]
+
+
+def doctor_body(ctx):
+    key = ctx.unique()
+    return {
+        "name": "Bench Doctor", "dni": f"BD{key}", "email": f"doctor-{key}@bench.test",
+        "password": BENCH_PASSWORD, "registrationt": f"BR{key}", "specialty": "cardiologia", "number": 5550000,
+    }
+
+
+def patient_body(ctx):
+    key = ctx.unique()
+    return {
+        "name": "Bench Patient", "dni": f"BP{key}", "email": f"patient-{key}@bench.test",
+        "password": BENCH_PASSWORD, "city": "Lima", "country": "Peru", "age": 40, "gender": "femenino", "number": 5550000,
+    }
+
+
+def appointment_body(ctx, **extra):
+    return {"reason": "control anual", "mode": "virtual", "confirmation": "pendiente", **extra}
+
+
+def record_body(ctx):
+    return {
+        "date": ctx.date().isoformat(), "diagnosis": "gripe estacional",
+        "treatment": "reposo e hidratacion", "recommendations": "control en un mes",
+    }
+
+
+def new_appointment(ctx):
+    id_doctor, date, time_ = ctx.free_slot()
+    path = f"/appointment/{id_doctor}/{ctx.pick('patients')}"
+    return path, appointment_body(ctx, date=date.isoformat(), time=time_.isoformat("minutes"))
+
+
+def bulk_appointments(ctx):
+    items = []
+    for _ in range(10):
+        id_doctor, date, _ = ctx.free_slot()
+        items.append(appointment_body(ctx, date=date.isoformat(), id_doctor=id_doctor, id_patient=ctx.pick("patients")))
+    return items
+
+
+def range_query(ctx, days):
+    start = ctx.date()
+    return f"from={start.isoformat()}&to={(start + datetime.timedelta(days=days)).isoformat()}"
+
+
+def build_scenarios():
+    return [
+        scenario("sitemap", "GET", lambda ctx: "/", role=None),
+        scenario("hello", "GET", lambda ctx: "/user", role=None),
+        scenario("login", "POST", lambda ctx: "/login", lambda ctx: {
+            "email": f"doctor{ctx.pick('doctors')}@bench.test", "password": BENCH_PASSWORD,
+        }, role=None),
+        scenario("doctor_get", "GET", lambda ctx: f"/doctor/{ctx.pick('doctors')}", role=None),
+        scenario("doctor_availability_get", "GET", lambda ctx: f"/doctor/{ctx.pick('doctors')}/availability", role=None),
+        scenario("doctor_availability_put", "PUT", lambda ctx: "/doctor/1/availability", lambda ctx: [
+            {"weekday": day, "start_time": "09:00", "end_time": "17:00", "slot_minutes": 30} for day in range(5)
+        ]),
+        scenario("doctor_slots", "GET", lambda ctx: f"/doctor/{ctx.pick('doctors')}/slots?{range_query(ctx, 6)}", role=None),
+        scenario("doctor_schedule", "GET", lambda ctx: f"/doctor/{ctx.pick('doctors')}/schedule?{range_query(ctx, 30)}"),
+        scenario("patient_get", "GET", lambda ctx: f"/patient/{ctx.pick('patients')}"),
+        scenario("patients_page", "GET", lambda ctx: f"/patients?after={ctx.pick('patients')}&limit=50"),
+        scenario("patient_timeline", "GET", lambda ctx: f"/patient/{ctx.pick('patients')}/timeline"),
+        scenario("appointment_get", "GET", lambda ctx: f"/appointment/{ctx.pick('appointments')}"),
+        scenario("appointments_all", "GET", lambda ctx: "/appointments", heavy=True),
+        scenario("appointments_status", "POST", lambda ctx: "/appointment/status", lambda ctx: {"confirmation": "pendiente"}, heavy=True),
+        scenario("appointments_search", "GET", lambda ctx: f"/appointments/search?id_doctor={ctx.pick('doctors')}&{range_query(ctx, 30)}"),
+        scenario("appointments_count", "GET", lambda ctx: f"/appointments/search?count_only=true&{range_query(ctx, 7)}"),
+        scenario("appointments_stats", "GET", lambda ctx: f"/appointments/stats?group_by=specialty,confirmation&{range_query(ctx, 30)}"),
+        scenario("appointments_stats_doctor", "GET", lambda ctx: f"/appointments/stats?id_doctor={ctx.pick('doctors')}&group_by=day,confirmation&{range_query(ctx, 30)}"),
+        scenario("record_get", "GET", lambda ctx: f"/record/{ctx.pick('records')}"),
+        scenario("record_by_appointment", "GET", lambda ctx: f"/record/appointment/{ctx.record_appointment()}"),
+        scenario("records_search", "GET", lambda ctx: "/records/search?q=" + urllib.parse.quote(ctx.rng.choice(("migraña", "hipertension", "fisioterapia", "glucosa")))),
+        # escrituras: cada fila creada se edita y se borra despues
+        scenario("doctor_create", "POST", lambda ctx: "/doctor", doctor_body, role=None),
+        scenario("doctor_edit", "PUT", lambda ctx: f"/doctor/{ctx.peek('doctor')}", doctor_body),
+        scenario("doctor_delete", "DELETE", lambda ctx: f"/doctor/{ctx.pop('doctor')}"),
+        scenario("patient_create", "POST", lambda ctx: "/patient", patient_body, role=None),
+        scenario("patients_bulk", "POST", lambda ctx: "/patients/bulk", lambda ctx: [patient_body(ctx) for _ in range(10)]),
+        scenario("patient_edit", "PUT", lambda ctx: f"/patient/{ctx.peek('patient')}", patient_body),
+        scenario("patient_delete", "DELETE", lambda ctx: f"/patient/{ctx.pop('patient')}"),
+        scenario("appointment_create", "POST", None, None),
+        scenario("appointments_bulk", "POST", lambda ctx: "/appointments/bulk", bulk_appointments),
+        scenario("appointment_edit", "PUT", lambda ctx: f"/appointment/{ctx.peek('appointment')}", lambda ctx: appointment_body(ctx, date=ctx.date().isoformat())),
+        scenario("record_create", "POST", lambda ctx: f"/record/{ctx.peek('appointment')}/", record_body),
+        scenario("record_edit", "PUT", lambda ctx: f"/record/{ctx.peek('record')}", record_body),
+        scenario("record_delete", "DELETE", lambda ctx: f"/record/{ctx.pop('record')}"),
+        scenario("appointment_delete", "DELETE", lambda ctx: f"/appointment/{ctx.pop('appointment')}"),
+    ]
+
+
+# que tipo de fila deja cada escenario de creacion en el Context
+CREATES = {
+    "doctor_create": "doctor",
+    "patient_create": "patient",
+    "patients_bulk": "patient",
+    "appointment_create": "appointment",
+    "appointments_bulk": "appointment",
+    "record_create": "record",
+}
+DELETES = {
+    "doctor_delete": "doctor",
+    "patient_delete": "patient",
+    "record_delete": "record",
+    "appointment_delete": "appointment",
+}
+
+
+def prepare(item, ctx):
+    # arma (method, path, body) para una peticion; None si no hay fila que usar
+    if item.name == "appointment_create":
+        path, body = new_appointment(ctx)
+        return item.method, path, body
+    path = item.path(ctx)
+    if path.endswith("/None") or "/None/" in path:
+        return None
+    return item.method, path, item.body(ctx) if item.body else None
+
+
+def remember(item, ctx, status, payload):
+    kind = CREATES.get(item.name)
+    if kind is None or status not in (201, 207) or payload is None:
+        return
+    if isinstance(payload, dict) and "results" in payload:
+        for result in payload["results"]:
+            if result.get("status") == 201:
+                ctx.push(kind, result["id"])
+    elif isinstance(payload, dict) and "id" in payload:
+        ctx.push(kind, payload["id"])
+
+
+class ClientDriver:
+    # en proceso con el test client; cuenta las consultas de cada peticion
+    def __init__(self):
+        # un solo usuario hace todas las peticiones: sin limite de tasa
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        from app import create_app
+
+        app = create_app()
+        self.app = app
+        self.client = app.test_client()
+        self.queries = 0
+
+        def count(*args):
+            self.queries += 1
+
+        event.listen(Engine, "before_cursor_execute", count)
+
+    def login(self, email):
+        response = self.client.post("/login", json={"email": email, "password": BENCH_PASSWORD})
+        if response.status_code != 200:
+            raise SystemExit(f"login as {email} failed ({response.status_code}); run bench.datagen first")
+        return response.get_json()["token"]
+
+    def request(self, method, path, body, token):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        before = self.queries
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        payload = response.get_json(silent=True)
+        return response.status_code, payload, self.queries - before
+
+    def run(self, item, ctx, count, token):
+        samples, errors, queries = [], 0, 0
+        started = time.perf_counter()
+        for _ in range(count):
+            prepared = prepare(item, ctx)
+            if prepared is None:
+                continue
+            t0 = time.perf_counter()
+            status, payload, statements = self.request(*prepared, token)
+            samples.append(time.perf_counter() - t0)
+            queries += statements
+            errors += status >= 400
+            remember(item, ctx, status, payload)
+        return samples, errors, queries, time.perf_counter() - started
+
+
+class HttpDriver:
+    # contra un servidor ya levantado; un hilo por conexion keep-alive
+    def __init__(self, url, concurrency):
+        parsed = urllib.parse.urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self.host = parsed.netloc
+        self.prefix = parsed.path.rstrip("/")
+        self.concurrency = concurrency
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = self.connection_class(self.host, timeout=60)
+        return self.local.connection
+
+    def request(self, method, path, body, token):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        data = json.dumps(body) if body is not None else None
+        try:
+            connection = self.connection()
+            connection.request(method, self.prefix + path, body=data, headers=headers)
+            response = connection.getresponse()
+            raw = response.read()
+        except (OSError, http.client.HTTPException):
+            # el servidor cerro la conexion: la proxima peticion abre otra
+            self.local.connection = None
+            return 599, None, None
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = None
+        return response.status, payload, None
+
+    def login(self, email):
+        status, payload, _ = self.request("POST", "/login", {"email": email, "password": BENCH_PASSWORD}, None)
+        if status != 200:
+            raise SystemExit(f"login as {email} failed ({status}); run bench.datagen first")
+        return payload["token"]
+
+    def run(self, item, ctx, count, token):
+        samples, errors = [], 0
+        lock = threading.Lock()
+        remaining = iter(range(count))
+
+        def worker():
+            nonlocal errors
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                prepared = prepare(item, ctx)
+                if prepared is None:
+                    continue
+                t0 = time.perf_counter()
+                status, payload, _ = self.request(*prepared, token)
+                elapsed = time.perf_counter() - t0
+                remember(item, ctx, status, payload)
+                with lock:
+                    samples.append(elapsed)
+                    errors += status >= 400
+
+        threads = [threading.Thread(target=worker) for _ in range(self.concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, errors, None, time.perf_counter() - started
+
+
+SERVERS = {
+    "wsgi": ["gunicorn", "wsgi", "--chdir", SRC, "--preload", "--workers", "{workers}", "--bind", "127.0.0.1:{port}"],
+    "asgi": ["uvicorn", "asgi:application", "--app-dir", SRC, "--workers", "{workers}", "--host", "127.0.0.1", "--port", "{port}"],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, workers, timeout=60):
+    port = free_port()
+    command = [part.format(workers=workers, port=port) for part in SERVERS[kind]]
+    # todas las peticiones son del mismo usuario
+    env = {**os.environ, "RATE_LIMIT_ENABLED": "0"}
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{command[0]} exited with status {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f"{command[0]} did not listen on port {port} within {timeout}s")
+
+
+def process_tree(pid):
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as file:
+            for child in file.read().split():
+                pids.extend(process_tree(int(child)))
+    return pids
+
+
+def server_memory_mb(pid):
+    # PSS (Linux): una pagina compartida entre N procesos cuenta 1/N en cada uno
+    total = 0
+    for process in process_tree(pid):
+        try:
+            with open(f"/proc/{process}/smaps_rollup") as file:
+                total += sum(int(line.split()[1]) for line in file if line.startswith("Pss:"))
+        except OSError:
+            continue
+    return total / 1024
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples, errors, queries, elapsed):
+    if not samples:
+        return {"requests": 0, "skipped": True}
+    result = {
+        "requests": len(samples),
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+    if queries is not None:
+        result["queries_per_request"] = round(queries / len(samples), 2)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before or before.get("skipped") or current.get("skipped"):
+            continue
+        for key in ("p50_ms", "p99_ms"):
+            if current[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {before[key]} -> {current[key]}")
+        if current["rps"] < before["rps"] / (1 + tolerance):
+            regressions.append(f"{name}: rps {before['rps']} -> {current['rps']}")
+        if current["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {current['errors']}")
+        if current.get("queries_per_request", 0) > before.get("queries_per_request", float("inf")):
+            regressions.append(f"{name}: queries/request {before['queries_per_request']} -> {current['queries_per_request']}")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':28} {'reqs':>6} {'err':>5} {'p50 ms':>9} {'p99 ms':>9} {'rps':>9} {'sql':>6}")
+    for name, result in results.items():
+        if result.get("skipped"):
+            print(f"{name:28} {'skipped':>6}")
+            continue
+        print(
+            f"{name:28} {result['requests']:>6} {result['errors']:>5} {result['p50_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['rps']:>9.1f} {result.get('queries_per_request', ''):>6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--url", help="run over HTTP against this server instead of the test client")
+    parser.add_argument("--serve", choices=sorted(SERVERS), help="start gunicorn (wsgi) or uvicorn (asgi) and run over HTTP against it")
+    parser.add_argument("--workers", type=int, default=2, help="server processes with --serve")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads in http mode")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--only", help="comma separated scenario names")
+    parser.add_argument("--heavy", action="store_true", help="include unpaginated list routes above the 10k scale")
+    parser.add_argument("--baseline", help="JSON file with a previous run to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    if args.serve:
+        server, args.url = start_server(args.serve, args.workers)
+    try:
+        run = run_scenarios(args)
+        if server:
+            run["server"] = args.serve
+            run["workers"] = args.workers
+            run["server_memory_mb"] = server_memory_mb(server.pid)
+            print(f"{args.serve} server, {args.workers} workers: {run['server_memory_mb']:.0f} MB PSS")
+    finally:
+        if server:
+            stop_server(server)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(run, file, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if (baseline["scale"], baseline["mode"]) != (run["scale"], run["mode"]):
+            raise SystemExit(f"baseline is {baseline['mode']} at {baseline['scale']}, this run is {run['mode']} at {run['scale']}")
+        regressions = compare(run["results"], baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+        print("no regressions")
+
+
+def run_scenarios(args):
+    driver = HttpDriver(args.url, args.concurrency) if args.url else ClientDriver()
+    ctx = Context(args.scale, args.seed)
+    tokens = {
+        None: None,
+        "doctor": driver.login("doctor1@bench.test"),
+    }
+
+    only = set(args.only.split(",")) if args.only else None
+    results = {}
+    for item in build_scenarios():
+        if only and item.name not in only:
+            continue
+        if item.heavy and args.scale != "10k" and not args.heavy:
+            results[item.name] = {"requests": 0, "skipped": True}
+            continue
+        count = max(1, args.requests // 10) if item.heavy else args.requests
+        if item.name in DELETES:
+            # se borra todo lo creado, tambien lo que dejaron los bulk
+            count = len(ctx.created[DELETES[item.name]])
+        results[item.name] = summarize(*driver.run(item, ctx, count, tokens[item.role]))
+
+    print_table(results)
+    return {
+        "scale": args.scale,
+        "mode": "http" if args.url else "client",
+        "concurrency": args.concurrency if args.url else 1,
+        "requests": args.requests,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Worker boot time and memory per app profile.
+
+    $ python -m bench.startup --repeat 5
+
+Each run starts a fresh interpreter, imports app, calls create_app(profile)
+and reports the wall time of the import and of create_app, the peak RSS of
+the process and the number of loaded modules. The figures are medians over
+--repeat runs.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from bench import SRC
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app(sys.argv[1])
+created = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_ms": (created - imported) * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+def probe(profile):
+    env = {**os.environ, "PYTHONPATH": SRC}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, profile], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    from app import APP_PROFILES
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--profile", action="append", choices=sorted(APP_PROFILES), help="default: all")
+    args = parser.parse_args()
+
+    print(f"{'profile':10} {'import ms':>10} {'create ms':>10} {'rss MB':>8} {'modules':>8}")
+    for profile in args.profile or APP_PROFILES:
+        runs = [probe(profile) for _ in range(args.repeat)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(
+            f"{profile:10} {median['import_ms']:>10.1f} {median['create_ms']:>10.1f} "
+            f"{median['rss_mb']:>8.1f} {median['modules']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""appointment and record access-path indexes
+
+Creates the base tables when the database is empty, then adds the
+composite indexes used by the per-doctor, per-patient and status lookups
+on appointment and the appointment lookup on record. Tables or indexes
+that already exist (databases created before migrations were versioned)
+are left untouched.
+
+Revision ID: 3f1a2b7c9d01
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a2b7c9d01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ('ix_appointment_id_doctor_date', 'appointment', ['id_doctor', 'date']),
+    ('ix_appointment_id_patient_date', 'appointment', ['id_patient', 'date']),
+    ('ix_appointment_confirmation_date', 'appointment', ['confirmation', 'date']),
+    ('ix_record_id_appointment', 'record', ['id_appointment']),
+)
+
+
+def create_base_tables(existing):
+    if 'user' not in existing:
+        op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password', sa.String(length=80), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+        )
+    if 'doctor' not in existing:
+        op.create_table('doctor',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('dni', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password', sa.String(length=300), nullable=False),
+        sa.Column('registrationt', sa.String(length=200), nullable=False),
+        sa.Column('specialty', sa.String(length=30), nullable=False),
+        sa.Column('number', sa.Integer(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dni'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('registrationt')
+        )
+    if 'patient' not in existing:
+        op.create_table('patient',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.Column('dni', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password', sa.String(length=300), nullable=False),
+        sa.Column('city', sa.String(length=50), nullable=False),
+        sa.Column('country', sa.String(length=40), nullable=False),
+        sa.Column('age', sa.Integer(), nullable=False),
+        sa.Column('gender', sa.String(length=20), nullable=False),
+        sa.Column('number', sa.Integer(), nullable=False),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dni'),
+        sa.UniqueConstraint('email')
+        )
+    if 'appointment' not in existing:
+        op.create_table('appointment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('reason', sa.String(length=200), nullable=False),
+        sa.Column('mode', sa.String(length=30), nullable=False),
+        sa.Column('confirmation', sa.String(length=20), nullable=False),
+        sa.Column('id_doctor', sa.Integer(), nullable=False),
+        sa.Column('id_patient', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['id_doctor'], ['doctor.id'], ),
+        sa.ForeignKeyConstraint(['id_patient'], ['patient.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'record' not in existing:
+        op.create_table('record',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('diagnosis', sa.String(length=1000), nullable=False),
+        sa.Column('recommendations', sa.String(length=1000), nullable=False),
+        sa.Column('treatment', sa.String(length=1000), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('id_appointment', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['id_appointment'], ['appointment.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    create_base_tables(set(inspector.get_table_names()))
+
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        existing = {index['name'] for index in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
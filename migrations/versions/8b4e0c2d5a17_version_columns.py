@@ -0,0 +1,30 @@
+"""version columns for ETags
+
+Revision ID: 8b4e0c2d5a17
+Revises: 3f1a2b7c9d01
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e0c2d5a17'
+down_revision = '3f1a2b7c9d01'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('doctor', 'patient', 'appointment', 'record')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('version')
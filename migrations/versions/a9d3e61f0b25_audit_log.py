@@ -0,0 +1,97 @@
+"""audit log of patient and record reads
+
+The table is append-only: triggers reject UPDATE and DELETE on SQLite and
+Postgres.
+
+Revision ID: a9d3e61f0b25
+Revises: e5a7b3c90f42
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e61f0b25'
+down_revision = 'e5a7b3c90f42'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = (
+    """
+    CREATE TRIGGER audit_log_no_update BEFORE UPDATE ON audit_log BEGIN
+        SELECT RAISE(ABORT, 'audit_log is append-only');
+    END
+    """,
+    """
+    CREATE TRIGGER audit_log_no_delete BEFORE DELETE ON audit_log BEGIN
+        SELECT RAISE(ABORT, 'audit_log is append-only');
+    END
+    """,
+)
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS audit_log_no_delete",
+    "DROP TRIGGER IF EXISTS audit_log_no_update",
+)
+
+POSTGRES_UPGRADE = (
+    """
+    CREATE FUNCTION audit_log_append_only() RETURNS trigger AS $$
+    BEGIN
+        RAISE EXCEPTION 'audit_log is append-only';
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER audit_log_append_only BEFORE UPDATE OR DELETE ON audit_log
+    FOR EACH ROW EXECUTE FUNCTION audit_log_append_only()
+    """,
+)
+POSTGRES_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS audit_log_append_only ON audit_log",
+    "DROP FUNCTION IF EXISTS audit_log_append_only()",
+)
+
+
+def run(statements):
+    for statement in statements:
+        op.execute(sa.text(statement))
+
+
+def upgrade():
+    op.create_table('audit_log',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('user_type', sa.String(length=20), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('ip', sa.String(length=45), nullable=True),
+    sa.Column('endpoint', sa.String(length=80), nullable=False),
+    sa.Column('resource', sa.String(length=30), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_audit_log_created_at'), ['created_at'], unique=False)
+        batch_op.create_index('ix_audit_log_resource', ['resource', 'resource_id'], unique=False)
+
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        run(SQLITE_UPGRADE)
+    elif dialect == 'postgresql':
+        run(POSTGRES_UPGRADE)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        run(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql':
+        run(POSTGRES_DOWNGRADE)
+
+    with op.batch_alter_table('audit_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_log_resource')
+        batch_op.drop_index(batch_op.f('ix_audit_log_created_at'))
+
+    op.drop_table('audit_log')
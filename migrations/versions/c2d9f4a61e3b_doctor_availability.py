@@ -0,0 +1,46 @@
+"""doctor availability and appointment slots
+
+Revision ID: c2d9f4a61e3b
+Revises: 8b4e0c2d5a17
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2d9f4a61e3b'
+down_revision = '8b4e0c2d5a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('availability',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('id_doctor', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.Time(), nullable=False),
+    sa.Column('end_time', sa.Time(), nullable=False),
+    sa.Column('slot_minutes', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['id_doctor'], ['doctor.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('availability', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_availability_id_doctor'), ['id_doctor'], unique=False)
+
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('time', sa.Time(), nullable=True))
+        batch_op.create_unique_constraint('uq_appointment_doctor_slot', ['id_doctor', 'date', 'time'])
+
+
+def downgrade():
+    with op.batch_alter_table('appointment', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_appointment_doctor_slot', type_='unique')
+        batch_op.drop_column('time')
+
+    with op.batch_alter_table('availability', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_availability_id_doctor'))
+
+    op.drop_table('availability')
@@ -0,0 +1,163 @@
+"""appointment counts per doctor, day and confirmation
+
+The appointment_stat rollup is filled from the existing appointments and
+then kept up to date by triggers on appointment: row triggers on SQLite,
+statement triggers with transition tables on Postgres (one grouped upsert
+per INSERT, UPDATE, DELETE or COPY).
+
+Revision ID: d4f81c0e7a39
+Revises: b7e2c4d91a06
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f81c0e7a39'
+down_revision = 'b7e2c4d91a06'
+branch_labels = None
+depends_on = None
+
+
+BACKFILL = """
+    INSERT INTO appointment_stat (id_doctor, day, confirmation, count)
+    SELECT id_doctor, date, confirmation, count(*)
+    FROM appointment
+    GROUP BY id_doctor, date, confirmation
+"""
+
+SQLITE_UPGRADE = (
+    """
+    CREATE TRIGGER appointment_stat_insert AFTER INSERT ON appointment BEGIN
+        INSERT INTO appointment_stat (id_doctor, day, confirmation, count)
+        VALUES (new.id_doctor, new.date, new.confirmation, 1)
+        ON CONFLICT (id_doctor, day, confirmation) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER appointment_stat_delete AFTER DELETE ON appointment BEGIN
+        UPDATE appointment_stat SET count = count - 1
+        WHERE id_doctor = old.id_doctor AND day = old.date AND confirmation = old.confirmation;
+        DELETE FROM appointment_stat
+        WHERE id_doctor = old.id_doctor AND day = old.date AND confirmation = old.confirmation AND count <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER appointment_stat_update AFTER UPDATE OF id_doctor, date, confirmation ON appointment
+    WHEN old.id_doctor IS NOT new.id_doctor OR old.date IS NOT new.date OR old.confirmation IS NOT new.confirmation
+    BEGIN
+        UPDATE appointment_stat SET count = count - 1
+        WHERE id_doctor = old.id_doctor AND day = old.date AND confirmation = old.confirmation;
+        DELETE FROM appointment_stat
+        WHERE id_doctor = old.id_doctor AND day = old.date AND confirmation = old.confirmation AND count <= 0;
+        INSERT INTO appointment_stat (id_doctor, day, confirmation, count)
+        VALUES (new.id_doctor, new.date, new.confirmation, 1)
+        ON CONFLICT (id_doctor, day, confirmation) DO UPDATE SET count = count + 1;
+    END
+    """,
+)
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS appointment_stat_update",
+    "DROP TRIGGER IF EXISTS appointment_stat_delete",
+    "DROP TRIGGER IF EXISTS appointment_stat_insert",
+)
+
+POSTGRES_UPGRADE = (
+    # new_rows / old_rows: todas las filas de la sentencia; las claves se
+    # actualizan en orden para que dos sentencias no se bloqueen en cruz
+    """
+    CREATE FUNCTION appointment_stat_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO appointment_stat AS stat (id_doctor, day, confirmation, count)
+            SELECT id_doctor, date, confirmation, count(*) FROM new_rows
+            GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+            ON CONFLICT (id_doctor, day, confirmation) DO UPDATE SET count = stat.count + excluded.count;
+            RETURN NULL;
+        ELSIF TG_OP = 'DELETE' THEN
+            UPDATE appointment_stat AS stat SET count = stat.count - deleted.count
+            FROM (
+                SELECT id_doctor, date, confirmation, count(*) AS count FROM old_rows
+                GROUP BY 1, 2, 3
+            ) AS deleted
+            WHERE stat.id_doctor = deleted.id_doctor AND stat.day = deleted.date
+                AND stat.confirmation = deleted.confirmation;
+        ELSE
+            INSERT INTO appointment_stat AS stat (id_doctor, day, confirmation, count)
+            SELECT id_doctor, date, confirmation, sum(delta) FROM (
+                SELECT id_doctor, date, confirmation, 1 AS delta FROM new_rows
+                UNION ALL
+                SELECT id_doctor, date, confirmation, -1 FROM old_rows
+            ) AS changes
+            GROUP BY 1, 2, 3 HAVING sum(delta) <> 0 ORDER BY 1, 2, 3
+            ON CONFLICT (id_doctor, day, confirmation) DO UPDATE SET count = stat.count + excluded.count;
+        END IF;
+        DELETE FROM appointment_stat AS stat USING old_rows
+        WHERE stat.id_doctor = old_rows.id_doctor AND stat.day = old_rows.date
+            AND stat.confirmation = old_rows.confirmation AND stat.count <= 0;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER appointment_stat_insert AFTER INSERT ON appointment
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stat_apply()
+    """,
+    """
+    CREATE TRIGGER appointment_stat_update AFTER UPDATE ON appointment
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stat_apply()
+    """,
+    """
+    CREATE TRIGGER appointment_stat_delete AFTER DELETE ON appointment
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION appointment_stat_apply()
+    """,
+)
+POSTGRES_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS appointment_stat_delete ON appointment",
+    "DROP TRIGGER IF EXISTS appointment_stat_update ON appointment",
+    "DROP TRIGGER IF EXISTS appointment_stat_insert ON appointment",
+    "DROP FUNCTION IF EXISTS appointment_stat_apply()",
+)
+
+
+def run(statements):
+    for statement in statements:
+        op.execute(sa.text(statement))
+
+
+def upgrade():
+    op.create_table('appointment_stat',
+    sa.Column('id_doctor', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('confirmation', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['id_doctor'], ['doctor.id'], ),
+    sa.PrimaryKeyConstraint('id_doctor', 'day', 'confirmation')
+    )
+    with op.batch_alter_table('appointment_stat', schema=None) as batch_op:
+        batch_op.create_index('ix_appointment_stat_day', ['day'], unique=False)
+
+    run((BACKFILL,))
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        run(SQLITE_UPGRADE)
+    elif dialect == 'postgresql':
+        run(POSTGRES_UPGRADE)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        run(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql':
+        run(POSTGRES_DOWNGRADE)
+
+    with op.batch_alter_table('appointment_stat', schema=None) as batch_op:
+        batch_op.drop_index('ix_appointment_stat_day')
+
+    op.drop_table('appointment_stat')
@@ -0,0 +1,97 @@
+"""record full-text search
+
+SQLite gets an external-content FTS5 table kept in sync by triggers;
+Postgres gets a generated tsvector column with a GIN index. Neither is
+declared on the models, see search.include_object.
+
+Revision ID: e5a7b3c90f42
+Revises: c2d9f4a61e3b
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7b3c90f42'
+down_revision = 'c2d9f4a61e3b'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = (
+    """
+    CREATE VIRTUAL TABLE record_fts USING fts5(
+        diagnosis, treatment, recommendations,
+        content='record', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER record_fts_ai AFTER INSERT ON record BEGIN
+        INSERT INTO record_fts(rowid, diagnosis, treatment, recommendations)
+        VALUES (new.id, new.diagnosis, new.treatment, new.recommendations);
+    END
+    """,
+    """
+    CREATE TRIGGER record_fts_ad AFTER DELETE ON record BEGIN
+        INSERT INTO record_fts(record_fts, rowid, diagnosis, treatment, recommendations)
+        VALUES ('delete', old.id, old.diagnosis, old.treatment, old.recommendations);
+    END
+    """,
+    """
+    CREATE TRIGGER record_fts_au AFTER UPDATE ON record BEGIN
+        INSERT INTO record_fts(record_fts, rowid, diagnosis, treatment, recommendations)
+        VALUES ('delete', old.id, old.diagnosis, old.treatment, old.recommendations);
+        INSERT INTO record_fts(rowid, diagnosis, treatment, recommendations)
+        VALUES (new.id, new.diagnosis, new.treatment, new.recommendations);
+    END
+    """,
+    "INSERT INTO record_fts(record_fts) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER IF EXISTS record_fts_au",
+    "DROP TRIGGER IF EXISTS record_fts_ad",
+    "DROP TRIGGER IF EXISTS record_fts_ai",
+    "DROP TABLE IF EXISTS record_fts",
+)
+
+POSTGRES_UPGRADE = (
+    """
+    ALTER TABLE record ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('simple',
+            coalesce(diagnosis, '') || ' ' ||
+            coalesce(treatment, '') || ' ' ||
+            coalesce(recommendations, ''))
+    ) STORED
+    """,
+    "CREATE INDEX ix_record_search_vector ON record USING GIN (search_vector)",
+)
+
+POSTGRES_DOWNGRADE = (
+    "DROP INDEX IF EXISTS ix_record_search_vector",
+    "ALTER TABLE record DROP COLUMN IF EXISTS search_vector",
+)
+
+
+def run(statements):
+    for statement in statements:
+        op.execute(sa.text(statement))
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        run(SQLITE_UPGRADE)
+    elif dialect == 'postgresql':
+        run(POSTGRES_UPGRADE)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        run(SQLITE_DOWNGRADE)
+    elif dialect == 'postgresql':
+        run(POSTGRES_DOWNGRADE)
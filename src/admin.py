@@ -1,20 +1,162 @@
-import os
+"""
+Flask-Admin views that stay fast on tables with millions of rows.
+
+The stock ModelView runs an exact COUNT(*) on every list page, pages with
+OFFSET over full rows, searches with ILIKE '%term%' on every searchable
+column and loads every column of every row. ScalableModelView instead:
+
+- shows an estimated row count (pg_class.reltuples on Postgres, max(id)
+  elsewhere) and no count at all while searching or filtering;
+- pages by id: the last id of every page served is remembered, so moving
+  to the next or previous page is an index range scan. Jumping to a page
+  that was not visited yet pages over the id index only (deferred join)
+  and then loads the rows of that page;
+- searches with equality or prefix ranges on indexed columns (email, dni,
+  ids) that the database can answer from an index;
+- loads only the columns shown in the list (load_only).
+"""
 from flask_admin import Admin
-from models import db, User,Doctor,Patient,Appointment,Record
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import and_, false, or_, text
+from sqlalchemy.orm import load_only
+from cache import MemoryBackend
+from models import db, User,Doctor,Patient,Appointment,Record
+
+# ultimo id de cada pagina servida, por vista/busqueda/orden
+_page_boundaries = MemoryBackend(maxsize=4096, ttl=300)
+
+
+def estimated_count(model):
+    table = model.__table__.name
+    if db.engine.dialect.name == "postgresql":
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": table},
+        ).scalar()
+        # -1 si la tabla nunca se analizo
+        if estimate is not None and estimate >= 0:
+            return estimate
+    return db.session.query(db.func.max(model.id)).scalar() or 0
+
+
+class ScalableModelView(ModelView):
+    page_size = 50
+    can_set_page_size = False
+    simple_list_pager = True
+    column_display_pk = True
+    column_default_sort = ("id", True)
+    column_sortable_list = ("id",)
+    # prefijo sobre columnas con indice unico / igualdad sobre ids
+    search_prefix_columns = ()
+    search_id_columns = ("id",)
+
+    def __init__(self, model, session, **kwargs):
+        self.column_searchable_list = self.search_prefix_columns + self.search_id_columns
+        super().__init__(model, session, **kwargs)
+
+    def get_query(self):
+        query = super().get_query()
+        if self.column_list:
+            query = query.options(load_only(*[getattr(self.model, name) for name in self.column_list]))
+        return query
+
+    def search_filter(self, search):
+        conditions = []
+        for term in search.split():
+            options = [
+                and_(getattr(self.model, name) >= term, getattr(self.model, name) < term + "\uffff")
+                for name in self.search_prefix_columns
+            ]
+            if term.isdigit():
+                options += [getattr(self.model, name) == int(term) for name in self.search_id_columns]
+            conditions.append(or_(*options) if options else false())
+        return and_(*conditions)
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        page = page or 0
+        page_size = self.page_size if page_size is None else page_size
+        if sort_column is None:
+            sort_column, sort_desc = self.column_default_sort
+        column = getattr(self.model, sort_column)
+        order = (column.desc(), self.model.id.desc()) if sort_desc else (column, self.model.id)
+
+        ids = self.session.query(self.model.id)
+        if search:
+            ids = ids.filter(self.search_filter(search))
+        if filters and self._filters:
+            ids, _, _, _ = self._apply_filters(ids, None, {}, {}, filters)
+
+        boundary_key = (self.endpoint, sort_column, bool(sort_desc), search, repr(filters), page)
+        after = _page_boundaries.get(boundary_key) if page and sort_column == "id" else None
+        if after is not None:
+            # pagina siguiente a una ya servida: rango sobre el indice de id
+            ids = ids.filter(self.model.id < after if sort_desc else self.model.id > after)
+            ids = ids.order_by(*order).limit(page_size)
+        else:
+            ids = ids.order_by(*order)
+            if page_size:
+                ids = ids.limit(page_size).offset(page * page_size)
+
+        # primero los ids de la pagina (solo el indice), despues sus filas
+        page_ids = ids.subquery()
+        query = (
+            self.get_query()
+            .join(page_ids, page_ids.c.id == self.model.id)
+            .order_by(*order)
+        )
+
+        count = None if search or filters else estimated_count(self.model)
+        if not execute:
+            return count, query
+
+        rows = query.all()
+        if rows and page_size and sort_column == "id":
+            _page_boundaries.set(boundary_key[:-1] + (page + 1,), rows[-1].id)
+        return count, rows
+
+
+class UserView(ScalableModelView):
+    column_list = ("id", "email", "is_active")
+    column_sortable_list = ("id", "email")
+    search_prefix_columns = ("email",)
+
+
+class DoctorView(ScalableModelView):
+    column_list = ("id", "name", "email", "dni", "specialty", "is_active")
+    column_sortable_list = ("id", "email", "dni")
+    search_prefix_columns = ("email", "dni")
+
+
+class PatientView(ScalableModelView):
+    column_list = ("id", "name", "email", "dni", "city", "country", "is_active")
+    column_sortable_list = ("id", "email", "dni")
+    search_prefix_columns = ("email", "dni")
+
+
+class RecordView(ScalableModelView):
+    # diagnosis/treatment/recommendations (1000 caracteres) solo en el detalle
+    column_list = ("id", "date", "id_appointment")
+    search_id_columns = ("id", "id_appointment")
+    can_view_details = True
+
+
+class AppointmentView(ScalableModelView):
+    column_list = ("id", "date", "time", "id_doctor", "id_patient", "mode", "confirmation")
+    search_id_columns = ("id", "id_doctor", "id_patient")
+
 
 def setup_admin(app):
-    app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
+
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
-    admin.add_view(ModelView(Doctor, db.session))
-    admin.add_view(ModelView(Patient, db.session))
-    admin.add_view(ModelView(Record, db.session))
-    admin.add_view(ModelView(Appointment, db.session))
+    admin.add_view(UserView(User, db.session))
+    admin.add_view(DoctorView(Doctor, db.session))
+    admin.add_view(PatientView(Patient, db.session))
+    admin.add_view(RecordView(Record, db.session))
+    admin.add_view(AppointmentView(Appointment, db.session))
 
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(YourModelView(YourModelName, db.session))
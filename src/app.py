@@ -2,46 +2,128 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, Blueprint
+from flask import Flask, request, jsonify, url_for, Blueprint, current_app, Response, stream_with_context
 from flask_migrate import Migrate
-from flask_swagger import swagger
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
-from admin import setup_admin
-from models import db, User, Doctor, Patient, Appointment, Record
+from json_provider import FastJSONProvider
+from utils import (
+    APIException,
+    generate_sitemap,
+    wants_ndjson,
+    ndjson_response,
+    etag_for,
+    with_etag,
+    not_modified,
+    encode_cursor,
+    decode_cursor,
+    int_arg,
+)
+from commands import setup_commands
+from metrics import setup_metrics
+from querycheck import setup_query_check
+from ratelimit import setup_rate_limit
+from audit import setup_audit, log_access
+from db_routing import setup_db_routing, database_url, read_from_replica
+from cache import cache
+import bulk
+import availability
+import search
+import export
+import stats
+from models import db, User, Doctor, Patient, Appointment, Record, Availability
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+import datetime
+from sqlalchemy import select, literal, union_all, update, func, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from hashing import hash_password, verify_password, needs_rehash
 # JWT TOKEN
 from flask_jwt_extended import JWTManager
 #from models import Person
 
-app = Flask(__name__)
-app.url_map.strict_slashes = False
-
-db_url = os.getenv("DATABASE_URL")
-if db_url is not None:
-    app.config['SQLALCHEMY_DATABASE_URI'] = db_url.replace("postgres://", "postgresql://")
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-MIGRATE = Migrate(app, db)
-db.init_app(app)
-CORS(app)
-jwt = JWTManager(app)
-setup_admin(app)
+# componentes opcionales de cada perfil; la API, CORS, JWT, Migrate,
+# los comandos y las metricas se cargan siempre
+APP_PROFILES = {
+    "full": ("admin",),
+    # nodos que solo sirven la API: sin Flask-Admin
+    "api": (),
+}
+APP_PROFILE = os.getenv("APP_PROFILE", "full")
+
+api = Blueprint("api", __name__)
+MIGRATE = Migrate(db=db, include_object=search.include_object)
+
+
+def create_app(profile=None):
+    profile = profile or APP_PROFILE
+    if profile not in APP_PROFILES:
+        raise ValueError(f"unknown APP_PROFILE {profile!r}, expected one of {', '.join(APP_PROFILES)}")
+
+    app = Flask(__name__)
+    # firma los JWT y la sesion de /admin
+    app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
+    app.url_map.strict_slashes = False
+    app.json = FastJSONProvider(app)
+
+    db_url = os.getenv("DATABASE_URL")
+    if db_url is not None:
+        app.config['SQLALCHEMY_DATABASE_URI'] = database_url(db_url)
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['APP_PROFILE'] = profile
+    # la identidad del token es un dict {"type", "id"}; flask-jwt-extended
+    # >= 4.7 exige un sub de tipo string salvo que se desactive
+    app.config['JWT_VERIFY_SUB'] = False
+    setup_db_routing(app)
+
+    MIGRATE.init_app(app)
+    db.init_app(app)
+    CORS(app)
+    JWTManager(app)
+    if "admin" in APP_PROFILES[profile]:
+        # Flask-Admin y sus vistas solo se importan si el perfil las usa
+        from admin import setup_admin
+        setup_admin(app)
+    setup_commands(app)
+    setup_metrics(app)
+    setup_query_check(app)
+    setup_rate_limit(app)
+    setup_audit(app)
+
+    app.register_blueprint(api)
+    return app
+
+
+PATIENTS_PAGE_SIZE = 50
+PATIENTS_MAX_PAGE_SIZE = 500
+PATIENT_COLUMNS = tuple(getattr(Patient, field) for field in Patient.serialize_fields)
+APPOINTMENTS_PAGE_SIZE = 50
+APPOINTMENTS_MAX_PAGE_SIZE = 500
+SCHEDULE_DEFAULT_DAYS = 31
+SCHEDULE_MAX_DAYS = 366
+APPOINTMENT_COLUMNS = (
+    Appointment.id,
+    Appointment.date,
+    Appointment.reason,
+    Appointment.mode,
+    Appointment.confirmation,
+    Appointment.id_doctor,
+    Appointment.id_patient,
+    Appointment.time,
+)
 
 # Handle/serialize errors like a JSON object
-@app.errorhandler(APIException)
+@api.app_errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
 # generate sitemap with all your endpoints
-@app.route('/')
+@api.route('/')
 def sitemap():
-    return generate_sitemap(app)
+    return generate_sitemap(current_app)
 
-@app.route('/user', methods=['GET'])
+@api.route('/user', methods=['GET'])
 def handle_hello():
 
     response_body = {
@@ -51,34 +133,75 @@ def handle_hello():
     return jsonify(response_body), 200
 
 
+def find_user_by_email(email):
+    # UNION ALL sobre los indices unicos de email de doctor y patient:
+    # una sola ida a la base de datos. Si el email existe en ambas tablas
+    # gana el doctor, como antes.
+    doctors = select(
+        literal("doctor").label("type"), Doctor.id, Doctor.email, Doctor.password
+    ).where(Doctor.email == email)
+    patients = select(
+        literal("patient").label("type"), Patient.id, Patient.email, Patient.password
+    ).where(Patient.email == email)
+    rows = db.session.execute(union_all(doctors, patients)).all()
+    if not rows:
+        return None
+    return min(rows, key=lambda row: row.type != "doctor")
+
+
+def check_not_modified(model, id):
+    # con If-None-Match solo consultamos la columna version; si el ETag
+    # coincide respondemos 304 sin cargar ni serializar el objeto
+    if not request.if_none_match:
+        return None
+    version = db.session.query(model.version).filter_by(id=id).scalar()
+    if version is None:
+        return None
+    etag = etag_for(model, id, version)
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    return None
+
+
+def cached_response(model, id, entry):
+    # respuesta armada desde el cache, sin tocar la base de datos
+    etag = etag_for(model, id, entry["version"])
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    return with_etag(jsonify(entry["data"]), etag), 200
+
+
 # aqui cominezas mis rutas
 # login doctor
 # validamos al usuario y le asignamos un token
-@app.route("/login", methods=["POST"])
+@api.route("/login", methods=["POST"])
 def doctor_login():
 
     data = request.get_json()
     email = data.get("email", None)
     password = data.get("password", None)
-    # Reserva.query.filter_by(fecha=fecha, time=time, id_place=id).first()
-    # validamos que el usario exista
-    doctor_exist = Doctor.query.filter_by(email=email).first()
-    patient_exist = Patient.query.filter_by(email=email).first()
-    if not doctor_exist:
-        if not patient_exist:
-            return jsonify({"error": "User not found"}), 404
-        else:
-            user_exit = patient_exist
-            type_user = "patient"
-    else:
-        user_exit = doctor_exist
-        type_user = "doctor"
+    # validamos que el usario exista, buscando en doctor y patient
+    # con una sola consulta
+    user_exit = find_user_by_email(email)
+    if not user_exit:
+        return jsonify({"error": "User not found"}), 404
+    type_user = user_exit.type
 
     # obtenemos el password y lo comparamos
-    password_check = check_password_hash(user_exit.password, password)
+    password_check = verify_password(user_exit.password, password)
     if not password_check:
         return jsonify({"error": "Password incorrecto"}), 401
 
+    # si el hash se genero con un costo viejo lo actualizamos
+    if needs_rehash(user_exit.password):
+        model = Doctor if type_user == "doctor" else Patient
+        db.session.execute(
+            update(model)
+            .where(model.id == user_exit.id)
+            .values(password=hash_password(password))
+        )
+        db.session.commit()
+
     # se crea el token
     token_data = {"id": user_exit.id, "email": user_exit.email, "type": type_user}
     token = create_access_token(token_data)
@@ -87,16 +210,28 @@ def doctor_login():
 
 ##########################CRUD DOCTOR#########################################
 # get doctor by id
-@app.route("/doctor/<int:id>", methods=["GET"])
+@api.route("/doctor/<int:id>", methods=["GET"])
 def get_doctor_by_id(id):
+    entry = cache.get(Doctor, id)
+    if entry:
+        return cached_response(Doctor, id, entry)
+    cached = check_not_modified(Doctor, id)
+    if cached:
+        return cached
+    generation = cache.generation()
     current_doctor = Doctor.query.get(id)
     if not current_doctor:
         return jsonify({"error": "doctor not found"}), 404
-    return jsonify(current_doctor.serialize()), 200
+    serialized = current_doctor.serialize()
+    # una replica atrasada no llena el cache (lo dejaria viejo hasta CACHE_TTL)
+    if not read_from_replica():
+        cache.set(Doctor, id, current_doctor.version, serialized, generation)
+    etag = etag_for(Doctor, id, current_doctor.version)
+    return with_etag(jsonify(serialized), etag), 200
 
 
 # create a doctor
-@app.route("/doctor", methods=["POST"])
+@api.route("/doctor", methods=["POST"])
 def create_doctor():
     data = request.get_json()
     name = data.get("name", None)
@@ -113,7 +248,7 @@ def create_doctor():
         return jsonify({"error": "Doctor exist"}), 404
 
     # si no existe continuamos
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
 
     try:
         new_doctor = Doctor(
@@ -137,7 +272,7 @@ def create_doctor():
 
 
 # edict a doctor
-@app.route("/doctor/<int:id>", methods=["PUT"])
+@api.route("/doctor/<int:id>", methods=["PUT"])
 @jwt_required()
 def edit_doctor(id):
     data = request.get_json()
@@ -154,13 +289,13 @@ def edit_doctor(id):
     if not doctor_exist:
         return jsonify({"error": "Doctor not exist"}), 404
 
-    # si no existe el paswword se le asigna su mismo valor
-    if not password:
+    # si no viene el paswword se mantiene el hash actual,
+    # de los contrario se hashea el nuevo
+    if password:
+        password = hash_password(password)
+    else:
         password = doctor_exist.password
 
-    # de los contrario se hashead el nuevo
-    password = generate_password_hash(password)
-
     try:
         update_doctor = Doctor.query.get(id)
         if not update_doctor:
@@ -169,11 +304,10 @@ def edit_doctor(id):
         update_doctor.name = name
         update_doctor.password = password
         update_doctor.email = email
-        update_doctor.password = (password,)
-        update_doctor.dni = (dni,)
-        update_doctor.registrationt = (registrattiont,)
-        update_doctor.specialty = (specialty,)
-        update_doctor.number = (number,)
+        update_doctor.dni = dni
+        update_doctor.registrationt = registrattiont
+        update_doctor.specialty = specialty
+        update_doctor.number = number
         db.session.commit()
         return jsonify({"Doctor": update_doctor.serialize()}), 200
 
@@ -183,7 +317,7 @@ def edit_doctor(id):
 
 
 # delete doctor
-@app.route("/doctor/<int:id>", methods=["DELETE"])
+@api.route("/doctor/<int:id>", methods=["DELETE"])
 def delete_doctor_by_id(id):
     doctor_to_delete = Doctor.query.get(id)
     if not doctor_to_delete:
@@ -199,38 +333,239 @@ def delete_doctor_by_id(id):
         return error, 500
 
 
+##########################AVAILABILITY#########################################
+
+
+# get doctor working hours
+@api.route("/doctor/<int:id>/availability", methods=["GET"])
+def get_doctor_availability(id):
+    blocks = Availability.query.filter_by(id_doctor=id).order_by(
+        Availability.weekday, Availability.start_time
+    )
+    return jsonify({"availability": [block.serialize() for block in blocks]}), 200
+
+
+# replace doctor working hours
+# recibe una lista de bloques {weekday, start_time, end_time, slot_minutes}
+@api.route("/doctor/<int:id>/availability", methods=["PUT"])
+@jwt_required()
+def edit_doctor_availability(id):
+    user = get_jwt_identity()
+    if user["type"] != "doctor" or user["id"] != id:
+        return jsonify({"error": "only the doctor can edit its availability"}), 403
+
+    try:
+        blocks = availability.parse_blocks(request.get_json())
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    try:
+        Availability.query.filter_by(id_doctor=id).delete()
+        for weekday, start, end, slot_minutes in blocks:
+            db.session.add(Availability(
+                id_doctor=id,
+                weekday=weekday,
+                start_time=start,
+                end_time=end,
+                slot_minutes=slot_minutes,
+            ))
+        db.session.commit()
+        availability.invalidate(id)
+        return get_doctor_availability(id)
+
+    except Exception as error:
+        db.session.rollback()
+        return jsonify(error.args), 500
+
+
+# get free slots of a doctor: ?from=2024-01-01&to=2024-01-31
+@api.route("/doctor/<int:id>/slots", methods=["GET"])
+def get_doctor_slots(id):
+    try:
+        start = datetime.date.fromisoformat(request.args["from"])
+        end = datetime.date.fromisoformat(request.args.get("to", request.args["from"]))
+    except (KeyError, ValueError):
+        return jsonify({"error": "from and to must be dates (YYYY-MM-DD)"}), 400
+    if end < start or (end - start).days > availability.MAX_RANGE_DAYS:
+        return jsonify({"error": f"range must be between 0 and {availability.MAX_RANGE_DAYS} days"}), 400
+
+    return jsonify({"slots": availability.free_slots(id, start, end)}), 200
+
+
+# get doctor schedule: citas con sus records, ?from=2024-01-01&to=2024-01-31
+# dos consultas en total (citas + records con selectinload) sin importar
+# cuantas citas tenga el doctor
+@api.route("/doctor/<int:id>/schedule", methods=["GET"])
+@jwt_required()
+def get_doctor_schedule(id):
+    user = get_jwt_identity()
+    if user["type"] != "doctor":
+        return jsonify({"error": "this useris not a doctor"}), 404
+
+    try:
+        start = datetime.date.fromisoformat(request.args.get("from", datetime.date.today().isoformat()))
+        end = request.args.get("to")
+        end = datetime.date.fromisoformat(end) if end else start + datetime.timedelta(days=SCHEDULE_DEFAULT_DAYS)
+    except ValueError:
+        return jsonify({"error": "from and to must be dates (YYYY-MM-DD)"}), 400
+    if end < start or (end - start).days > SCHEDULE_MAX_DAYS:
+        return jsonify({"error": f"range must be between 0 and {SCHEDULE_MAX_DAYS} days"}), 400
+
+    appointments = (
+        Appointment.query.options(selectinload(Appointment.record))
+        .filter(
+            Appointment.id_doctor == id,
+            Appointment.date >= start,
+            Appointment.date <= end,
+        )
+        .order_by(Appointment.date, Appointment.time, Appointment.id)
+        .all()
+    )
+    log_access("patient", *{appointment.id_patient for appointment in appointments})
+    log_access("record", *[record.id for appointment in appointments for record in appointment.record])
+    return jsonify({
+        "appointment": [
+            {
+                **appointment.serialize(),
+                "records": [record.serialize() for record in appointment.record],
+            }
+            for appointment in appointments
+        ]
+    }), 200
+
+
 ##########################CRUD PATIENT#########################################
 
 
 # get patient by id
-@app.route("/patient/<int:id>", methods=["GET"])
+@api.route("/patient/<int:id>", methods=["GET"])
 @jwt_required()
 def get_patient_by_id(id):
     user = get_jwt_identity()
     if user["type"] == "doctor":
+        log_access("patient", id)
+        entry = cache.get(Patient, id)
+        if entry:
+            return cached_response(Patient, id, entry)
+        cached = check_not_modified(Patient, id)
+        if cached:
+            return cached
+        generation = cache.generation()
         current_patient = Patient.query.get(id)
         if not current_patient:
             return jsonify({"error": "patient not found"}), 404
-        return jsonify(current_patient.serialize()), 200
+        serialized = current_patient.serialize()
+        if not read_from_replica():
+            cache.set(Patient, id, current_patient.version, serialized, generation)
+        etag = etag_for(Patient, id, current_patient.version)
+        return with_etag(jsonify(serialized), etag), 200
     else:
         return jsonify({"error": "this user is not a doctor"}), 404
 
 
 # get patients
-@app.route("/patients", methods=["GET"])
+# paginado por cursor (keyset sobre Patient.id): ?limit=50&after=<id>
+@api.route("/patients", methods=["GET"])
 #@jwt_required()
 def get_patients():
-    patients = Patient.query.all()
-    return jsonify({"patienst": [patient.serialize() for patient in patients]}), 200
-    # serialized_pacient = [patients.serialize() for patient in patients]
-    # serialized_pacient = []
-    # for patient in patients:
-    #    serialized_pacient.append(patient.serialize())
-    # return jsonify({"patienst": serialized_pacient}), 200
+    limit = int_arg("limit", PATIENTS_PAGE_SIZE)
+    after = int_arg("after", 0)
+    limit = max(1, min(limit, PATIENTS_MAX_PAGE_SIZE))
+
+    # solo pedimos las columnas que emite Patient.serialize()
+    rows = (
+        db.session.query(*PATIENT_COLUMNS)
+        .filter(Patient.id > after)
+        .order_by(Patient.id)
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    log_access("patient", *[row.id for row in rows[:limit]])
+    return jsonify({
+        "patienst": [row._asdict() for row in rows[:limit]],
+        "next": next_cursor,
+    }), 200
+
+
+# get patient timeline: citas con sus records en orden de fecha
+# paginado por cursor de fecha (limit/after), sort=-date para ver lo mas reciente primero
+@api.route("/patient/<int:id>/timeline", methods=["GET"])
+@jwt_required()
+def get_patient_timeline(id):
+    user = get_jwt_identity()
+    if user["type"] != "doctor" and not (user["type"] == "patient" and user["id"] == id):
+        return jsonify({"error": "not allowed to read this timeline"}), 403
+
+    descending = request.args.get("sort", "date") == "-date"
+    limit = int_arg("limit", APPOINTMENTS_PAGE_SIZE)
+    limit = max(1, min(limit, APPOINTMENTS_MAX_PAGE_SIZE))
+
+    filters = [Appointment.id_patient == id]
+    key = tuple_(Appointment.date, Appointment.id)
+    if request.args.get("after"):
+        after = decode_cursor(request.args["after"], datetime.date.fromisoformat, int)
+        filters.append(key < after if descending else key > after)
+
+    if descending:
+        order = (Appointment.date.desc(), Appointment.id.desc())
+    else:
+        order = (Appointment.date, Appointment.id)
+
+    # la pagina de citas va en una subconsulta y los records se unen en
+    # la misma sentencia: una sola ida a la base de datos
+    page = (
+        select(Appointment.id)
+        .where(*filters)
+        .order_by(*order)
+        .limit(limit + 1)
+        .subquery()
+    )
+    rows = (
+        db.session.query(
+            *APPOINTMENT_COLUMNS,
+            Record.id.label("record_id"),
+            Record.date.label("record_date"),
+            Record.diagnosis,
+            Record.treatment,
+            Record.recommendations,
+        )
+        .join(page, page.c.id == Appointment.id)
+        .outerjoin(Record, Record.id_appointment == Appointment.id)
+        .order_by(*order, Record.id)
+        .all()
+    )
+
+    timeline = {}
+    for row in rows:
+        appointment = timeline.get(row.id)
+        if appointment is None:
+            appointment = timeline[row.id] = {
+                column.key: getattr(row, column.key) for column in APPOINTMENT_COLUMNS
+            }
+            appointment["records"] = []
+        if row.record_id is not None:
+            appointment["records"].append({
+                "id": row.record_id,
+                "date": row.record_date,
+                "diagnosis": row.diagnosis,
+                "treatment": row.treatment,
+                "recommendations": row.recommendations,
+            })
+
+    appointments = list(timeline.values())
+    next_cursor = None
+    if len(appointments) > limit:
+        appointments = appointments[:limit]
+        last = appointments[-1]
+        next_cursor = encode_cursor([last["date"], last["id"]])
+    log_access("patient", id)
+    log_access("record", *[record["id"] for appointment in appointments for record in appointment["records"]])
+    return jsonify({"appointment": appointments, "next": next_cursor}), 200
 
 
 # create a patient
-@app.route("/patient", methods=["POST"])
+@api.route("/patient", methods=["POST"])
 def create_patient():
     data = request.get_json()
     name = data.get("name", None)
@@ -249,7 +584,7 @@ def create_patient():
         return jsonify({"error": "patient exist"}), 404
 
     # si no existe continuamos
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
 
     try:
         new_patient = Patient(
@@ -274,8 +609,25 @@ def create_patient():
         return jsonify(error.args), 500
 
 
+# create patients in bulk
+# recibe una lista de pacientes y devuelve un resultado por cada uno
+@api.route("/patients/bulk", methods=["POST"])
+@jwt_required()
+def create_patients_bulk():
+    items = request.get_json()
+    if not isinstance(items, list):
+        return jsonify({"error": "expected a list of patients"}), 400
+    # cada patient hashea su password: el limite es mas bajo (ver bulk.py)
+    if len(items) > bulk.BULK_MAX_PATIENTS:
+        return jsonify({"error": f"at most {bulk.BULK_MAX_PATIENTS} items per request"}), 413
+
+    results = bulk.create_patients(items)
+    created = sum(1 for result in results if result["status"] == 201)
+    return jsonify({"created": created, "results": results}), 207
+
+
 # edit a patient
-@app.route("/patient/<int:id>", methods=["PUT"])
+@api.route("/patient/<int:id>", methods=["PUT"])
 @jwt_required()
 def edit_patient(id):
     data = request.get_json()
@@ -295,13 +647,13 @@ def edit_patient(id):
     if not patient_exist:
         return jsonify({"error": "patient not exist"}), 404
 
-    # si no existe el paswword se le asigna su mismo valor
-    if not password:
+    # si no viene el paswword se mantiene el hash actual,
+    # de los contrario se hashea el nuevo
+    if password:
+        password = hash_password(password)
+    else:
         password = patient_exist.password
 
-    # de los contrario se hashead el nuevo
-    password = generate_password_hash(password)
-
     try:
         update_patient = Patient.query.get(id)
         if not update_patient:
@@ -309,7 +661,6 @@ def edit_patient(id):
 
         update_patient.password = password
         update_patient.email = email
-        update_patient.password = password
         update_patient.dni = dni
         update_patient.country = country
         update_patient.city = city
@@ -325,7 +676,7 @@ def edit_patient(id):
 
 
 # delete patient
-@app.route("/patient/<int:id>", methods=["DELETE"])
+@api.route("/patient/<int:id>", methods=["DELETE"])
 @jwt_required()
 def delete_patient_by_id(id):
     patient_to_delete = Patient.query.get(id)
@@ -347,25 +698,31 @@ def delete_patient_by_id(id):
 
 
 # get appointment by id
-@app.route("/appointment/<int:id>", methods=["GET"])
+@api.route("/appointment/<int:id>", methods=["GET"])
 @jwt_required()
 def get_appointment_by_id(id):
     user = get_jwt_identity()
     if user["type"] == "doctor":
+        cached = check_not_modified(Appointment, id)
+        if cached:
+            return cached
         current_appointment = Appointment.query.get(id)
         if not current_appointment:
             return jsonify({"error": "appointment not found"}), 404
-        return jsonify(current_appointment.serialize()), 200
+        etag = etag_for(Appointment, id, current_appointment.version)
+        return with_etag(jsonify(current_appointment.serialize()), etag), 200
     else:
         return jsonify({"error": "this useris not a doctor"}), 404
 
 
 # get all appointments
-@app.route("/appointments", methods=["GET"])
+@api.route("/appointments", methods=["GET"])
 @jwt_required()
 def get_appointments():
     user = get_jwt_identity()
     if user["type"] == "doctor":
+        if wants_ndjson():
+            return ndjson_response(Appointment.query.order_by(Appointment.id))
         appointments = Appointment.query.all()
         return (
             jsonify(
@@ -387,14 +744,17 @@ def get_appointments():
 
 
 # get appointment by status
-@app.route("/appointment/status", methods=["POST"])
+@api.route("/appointment/status", methods=["POST"])
 @jwt_required()
 def get_appointments_status():
     data = request.get_json()
     user = get_jwt_identity()
     if user["type"] == "doctor":
         status = data.get("confirmation", None)
-        appointments = Appointment.query.filter_by(confirmation=status).all()
+        query = Appointment.query.filter_by(confirmation=status)
+        if wants_ndjson():
+            return ndjson_response(query.order_by(Appointment.id))
+        appointments = query.all()
         return (
             jsonify(
                 {
@@ -415,8 +775,106 @@ def get_appointments_status():
     # return jsonify({"appointment": serialized_appointment}), 200
 
 
+# search appointments
+# filtros: from, to, id_doctor, id_patient, mode, confirmation
+# orden: sort=date o sort=-date; paginado con limit/after; count_only=true
+@api.route("/appointments/search", methods=["GET"])
+@jwt_required()
+def search_appointments():
+    user = get_jwt_identity()
+    if user["type"] != "doctor":
+        return jsonify({"error": "this useris not a doctor"}), 404
+
+    args = request.args
+    filters = []
+    try:
+        if args.get("from"):
+            filters.append(Appointment.date >= datetime.date.fromisoformat(args["from"]))
+        if args.get("to"):
+            filters.append(Appointment.date <= datetime.date.fromisoformat(args["to"]))
+    except ValueError:
+        return jsonify({"error": "from and to must be dates (YYYY-MM-DD)"}), 400
+    for name in ("id_doctor", "id_patient"):
+        value = int_arg(name)
+        if value is not None:
+            filters.append(getattr(Appointment, name) == value)
+    for name in ("mode", "confirmation"):
+        if args.get(name):
+            filters.append(getattr(Appointment, name) == args[name])
+
+    # solo contamos, sin traer filas
+    if args.get("count_only", "").lower() in ("1", "true"):
+        count = db.session.query(func.count(Appointment.id)).filter(*filters).scalar()
+        return jsonify({"count": count}), 200
+
+    descending = args.get("sort", "date") == "-date"
+    limit = int_arg("limit", APPOINTMENTS_PAGE_SIZE)
+    limit = max(1, min(limit, APPOINTMENTS_MAX_PAGE_SIZE))
+
+    key = tuple_(Appointment.date, Appointment.id)
+    if args.get("after"):
+        after = decode_cursor(args["after"], datetime.date.fromisoformat, int)
+        filters.append(key < after if descending else key > after)
+
+    if descending:
+        order = (Appointment.date.desc(), Appointment.id.desc())
+    else:
+        order = (Appointment.date, Appointment.id)
+
+    rows = (
+        db.session.query(*APPOINTMENT_COLUMNS)
+        .filter(*filters)
+        .order_by(*order)
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last.date, last.id])
+    return jsonify({
+        "appointment": [row._asdict() for row in rows[:limit]],
+        "next": next_cursor,
+    }), 200
+
+
+# appointment counts from the rollup (ver stats.py)
+# group_by: doctor, day, confirmation, specialty (default doctor,confirmation)
+# filtros: from, to, id_doctor, specialty, confirmation
+@api.route("/appointments/stats", methods=["GET"])
+@jwt_required()
+def get_appointments_stats():
+    user = get_jwt_identity()
+    if user["type"] != "doctor":
+        return jsonify({"error": "this useris not a doctor"}), 404
+
+    args = request.args
+    try:
+        groups = stats.parse_groups(args.get("group_by"))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    try:
+        start = datetime.date.fromisoformat(args["from"]) if args.get("from") else None
+        end = datetime.date.fromisoformat(args["to"]) if args.get("to") else None
+    except ValueError:
+        return jsonify({"error": "from and to must be dates (YYYY-MM-DD)"}), 400
+
+    rows = stats.appointment_stats(
+        groups,
+        start=start,
+        end=end,
+        id_doctor=int_arg("id_doctor"),
+        specialty=args.get("specialty") or None,
+        confirmation=args.get("confirmation") or None,
+    )
+    return jsonify({
+        "stats": rows,
+        "total": sum(row["count"] for row in rows),
+    }), 200
+
+
 # create a appointment
-@app.route("/appointment/<int:id_doctor>/<int:id_patient>", methods=["POST"])
+@api.route("/appointment/<int:id_doctor>/<int:id_patient>", methods=["POST"])
 @jwt_required()
 def create_appointment(id_doctor, id_patient):
     data = request.get_json()
@@ -424,10 +882,22 @@ def create_appointment(id_doctor, id_patient):
     reason = data.get("reason", None)
     mode = data.get("mode", None)
     confirmation = data.get("confirmation", None)
+    time = data.get("time", None)
+
+    try:
+        date = datetime.date.fromisoformat(date)
+        time = datetime.time.fromisoformat(time) if time else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid date or time"}), 400
+
+    # si viene la hora, la cita tiene que caer en un turno del doctor
+    if time and not availability.is_slot(id_doctor, date, time):
+        return jsonify({"error": "doctor is not available at that time"}), 400
 
     try:
         new_appointment = Appointment(
             date=date,
+            time=time,
             reason=reason,
             mode=mode,
             confirmation=confirmation,
@@ -439,13 +909,35 @@ def create_appointment(id_doctor, id_patient):
 
         return jsonify(new_appointment.serialize()), 201
 
+    except IntegrityError as error:
+        # la restriccion unica (id_doctor, date, time) rechaza el turno tomado
+        db.session.rollback()
+        if time:
+            return jsonify({"error": "slot already booked"}), 409
+        return jsonify(error.args), 500
+
     except Exception as error:
         db.session.rollback()
         return jsonify(error.args), 500
 
 
+# create appointments in bulk
+@api.route("/appointments/bulk", methods=["POST"])
+@jwt_required()
+def create_appointments_bulk():
+    items = request.get_json()
+    if not isinstance(items, list):
+        return jsonify({"error": "expected a list of appointments"}), 400
+    if len(items) > bulk.BULK_MAX_ITEMS:
+        return jsonify({"error": f"at most {bulk.BULK_MAX_ITEMS} items per request"}), 413
+
+    results = bulk.create_appointments(items)
+    created = sum(1 for result in results if result["status"] == 201)
+    return jsonify({"created": created, "results": results}), 207
+
+
 # edit a appointment
-@app.route("/appointment/<int:id>", methods=["PUT"])
+@api.route("/appointment/<int:id>", methods=["PUT"])
 @jwt_required()
 def edit_appointment(id):
     data = request.get_json()
@@ -453,18 +945,31 @@ def edit_appointment(id):
     reason = data.get("reason", None)
     mode = data.get("mode", None)
     confirmation = data.get("confirmation", None)
+    time = data.get("time", None)
 
     # validamos que el appointment no exista
     appointment_exist = Appointment.query.filter_by(id=id).first()
     if not appointment_exist:
         return jsonify({"error": "appointment not exist"}), 404
 
+    update_appointment = Appointment.query.get(id)
+    if not update_appointment:
+        return jsonify({"error": "appointment not found"}), 404
+
     try:
-        update_appointment = Appointment.query.get(id)
-        if not update_appointment:
-            return jsonify({"error": "appointment not found"}), 404
+        date = datetime.date.fromisoformat(date)
+        time = datetime.time.fromisoformat(time) if time else update_appointment.time
+    except (TypeError, ValueError):
+        return jsonify({"error": "invalid date or time"}), 400
 
+    # una cita con hora solo se mueve a otro turno del doctor, como al crearla
+    moved = (date, time) != (update_appointment.date, update_appointment.time)
+    if time and moved and not availability.is_slot(update_appointment.id_doctor, date, time):
+        return jsonify({"error": "doctor is not available at that time"}), 400
+
+    try:
         update_appointment.date = date
+        update_appointment.time = time
         update_appointment.reason = reason
         update_appointment.mode = mode
         update_appointment.confirmation = confirmation
@@ -472,13 +977,20 @@ def edit_appointment(id):
         db.session.commit()
         return jsonify({"appointment": update_appointment.serialize()}), 200
 
+    except IntegrityError as error:
+        # la restriccion unica (id_doctor, date, time) rechaza el turno tomado
+        db.session.rollback()
+        if time:
+            return jsonify({"error": "slot already booked"}), 409
+        return jsonify(error.args), 500
+
     except Exception as error:
         db.session.rollback()
-        return jsonify(error), 500
+        return jsonify(error.args), 500
 
 
 # delete appointment
-@app.route("/appointment/<int:id>", methods=["DELETE"])
+@api.route("/appointment/<int:id>", methods=["DELETE"])
 @jwt_required()
 def delete_appointment_by_id(id):
     appointment_to_delete = Appointment.query.get(id)
@@ -499,36 +1011,62 @@ def delete_appointment_by_id(id):
 
 
 # get record by id
-@app.route("/record/<int:id>", methods=["GET"])
+@api.route("/record/<int:id>", methods=["GET"])
 @jwt_required()
 def get_record_by_id(id):
     user = get_jwt_identity()
     if user["type"] == "doctor":
+        log_access("record", id)
+        cached = check_not_modified(Record, id)
+        if cached:
+            return cached
         record = Record.query.get(id)
         if not record:
             return jsonify({"error": "record not found"}), 404
 
-        return jsonify(record.serialize()), 200
+        etag = etag_for(Record, id, record.version)
+        return with_etag(jsonify(record.serialize()), etag), 200
     else:
         return jsonify({"error": "this useris not a doctor"}), 404
 
 
-# get record by appoitnment
-@app.route("/record/appointment/<int:id_appointment>", methods=["GET"])
+# search records: ?q=texto&limit=20&page=1
+# resultados ordenados por relevancia
+@api.route("/records/search", methods=["GET"])
+@jwt_required()
+def search_records():
+    user = get_jwt_identity()
+    if user["type"] != "doctor":
+        return jsonify({"error": "this useris not a doctor"}), 404
+
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "q is required"}), 400
+    limit = int_arg("limit", 20)
+    limit = max(1, min(limit, search.SEARCH_MAX_PAGE_SIZE))
+    page = max(1, int_arg("page", 1))
+
+    records = search.search_records(q, limit, (page - 1) * limit)
+    log_access("record", *[record["id"] for record in records])
+    return jsonify({"record": records, "page": page}), 200
+
+
+@api.route("/record/appointment/<int:id_appointment>", methods=["GET"])
 @jwt_required()
 def get_record_by_id_appointment(id_appointment):
     user = get_jwt_identity()
     if user["type"] == "doctor":
-        record = Record.query.filter_by(id_appointment=id_appointment)
+        record = Record.query.filter_by(id_appointment=id_appointment).first()
         if not record:
             return jsonify({"error": "record not found"}), 404
+        log_access("record", record.id)
         return jsonify(record.serialize()), 200
     else:
         return jsonify({"error": "this useris not a doctor"}), 404
 
 
 # create a record
-@app.route("/record/<int:id_appointment>/", methods=["POST"])
+@api.route("/record/<int:id_appointment>/", methods=["POST"])
 @jwt_required()
 def create_record(id_appointment):
     user = get_jwt_identity()
@@ -561,7 +1099,7 @@ def create_record(id_appointment):
 
 
 # edict a record
-@app.route("/record/<int:id>", methods=["PUT"])
+@api.route("/record/<int:id>", methods=["PUT"])
 @jwt_required()
 def edit_record(id):
     user = get_jwt_identity()
@@ -598,7 +1136,7 @@ def edit_record(id):
 
 
 # delete record
-@app.route("/record/<int:id>", methods=["DELETE"])
+@api.route("/record/<int:id>", methods=["DELETE"])
 @jwt_required()
 def delete_record_by_id(id):
     user = get_jwt_identity()
@@ -619,7 +1157,35 @@ def delete_record_by_id(id):
         return jsonify({"error": "this useris not a doctor"}), 404
 
 
+##########################EXPORT#########################################
+
+
+# export appointments with their records: ?from=2024-01-01&to=2024-03-31&format=csv
+# se envia por partes a medida que se leen las filas (ver export.py)
+@api.route("/export/appointments", methods=["GET"])
+@jwt_required()
+def export_appointments():
+    user = get_jwt_identity()
+    if user["type"] != "doctor":
+        return jsonify({"error": "this useris not a doctor"}), 404
+
+    fmt = request.args.get("format", "csv")
+    if fmt not in export.available_formats():
+        return jsonify({"error": f"format must be one of {', '.join(export.available_formats())}"}), 400
+    try:
+        start, end = export.parse_range(request.args.get("from"), request.args.get("to"))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    chunks = export.encode(export.audited(export.export_rows(start, end)), fmt)
+    return Response(
+        stream_with_context(chunks),
+        mimetype=export.MIMETYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="appointments-{start}-{end}.{fmt}"'},
+    )
+
+
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
-    app.run(host='0.0.0.0', port=PORT, debug=False)
+    create_app().run(host='0.0.0.0', port=PORT, debug=False)
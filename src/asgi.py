@@ -0,0 +1,300 @@
+"""
+Optional ASGI entry point with async read endpoints.
+
+    $ uvicorn asgi:application --app-dir src --workers 2
+
+The by-id reads and GET /patients are served by async handlers on an
+async SQLAlchemy engine, so a request waiting on the database only holds
+a coroutine, not a whole worker. The handlers reuse the models from
+models.py and return the same bodies, status codes and ETags as the Flask
+routes. Every other route, including writes, login and /admin, goes to
+the Flask app unchanged, built with the APP_PROFILE profile.
+
+The async handlers are rate limited with the same shared buckets and
+limits as the Flask routes (see ratelimit.py), under the same endpoint
+names, so a client is throttled the same whichever entry point serves it.
+They also record the same request metrics (latency, queries and database
+time per endpoint, see metrics.py), and read from the replicas in
+DATABASE_REPLICA_URLS with the rules of db_routing.py: every async
+handler is a read, so a request goes to a random replica unless the
+client wrote recently. Rows read from a replica are not cached.
+
+The async engine uses ASYNC_DATABASE_URL if set. Otherwise it is built
+from DATABASE_URL with the asyncpg (Postgres) or aiosqlite (SQLite)
+driver. Replica engines are built the same way from their URLs.
+"""
+import contextlib
+import contextvars
+import os
+import random
+import time
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from app import create_app, PATIENT_COLUMNS, PATIENTS_PAGE_SIZE, PATIENTS_MAX_PAGE_SIZE
+from audit import audit, events_for
+from ratelimit import identity_key, retry_after
+from cache import cache
+from db_routing import replica_binds, wrote_recently
+from metrics import observe
+from models import Doctor, Patient, Appointment, Record
+from utils import etag_for
+
+flask_app = create_app()
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url):
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+
+def async_database_url():
+    return os.getenv("ASYNC_DATABASE_URL") or async_url(flask_app.config["SQLALCHEMY_DATABASE_URI"])
+
+
+engine = create_async_engine(async_database_url(), pool_pre_ping=True)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+replica_engines = [create_async_engine(async_url(url), pool_pre_ping=True) for url in replica_binds().values()]
+replica_sessions = [async_sessionmaker(replica, expire_on_commit=False) for replica in replica_engines]
+
+# [consultas, segundos] de la peticion en curso; SQLAlchemy copia el
+# contexto al greenlet que ejecuta el cursor
+request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def query_started(conn, cursor, statement, parameters, context, executemany):
+    if request_queries.get() is not None:
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def query_finished(conn, cursor, statement, parameters, context, executemany):
+    totals = request_queries.get()
+    starts = conn.info.get("metrics_start")
+    if totals is None or not starts:
+        return
+    totals[0] += 1
+    totals[1] += time.perf_counter() - starts.pop()
+
+
+for async_engine in [engine, *replica_engines]:
+    event.listen(async_engine.sync_engine, "before_cursor_execute", query_started)
+    event.listen(async_engine.sync_engine, "after_cursor_execute", query_finished)
+
+
+def session_for(request):
+    # (sessionmaker, es replica): igual que RoutingSession para un GET
+    if replica_sessions and not wrote_recently(request.cookies):
+        return random.choice(replica_sessions), True
+    return Session, False
+
+
+def json_response(data, status=200, etag=None):
+    headers = {"ETag": f'"{etag}"'} if etag else None
+    return Response(
+        flask_app.json.dumps(data),
+        status_code=status,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def if_none_match(request, etag):
+    header = request.headers.get("if-none-match", "")
+    return f'"{etag}"' in [tag.strip() for tag in header.split(",")] or header.strip() == "*"
+
+
+def current_user(request):
+    # mismo token y misma configuracion que flask_jwt_extended
+    header = request.headers.get("authorization", "")
+    if not header.startswith("Bearer "):
+        return None, json_response({"msg": "Missing Authorization Header"}, 401)
+    try:
+        with flask_app.app_context():
+            claims = decode_token(header[len("Bearer "):])
+    except ExpiredSignatureError:
+        return None, json_response({"msg": "Token has expired"}, 401)
+    except Exception as error:
+        return None, json_response({"msg": str(error)}, 422)
+    return claims[flask_app.config["JWT_IDENTITY_CLAIM"]], None
+
+
+def rate_limit_key(request):
+    # igual que ratelimit.client_key(): identidad del JWT o IP del cliente
+    identity = None
+    header = request.headers.get("authorization", "")
+    if header.startswith("Bearer "):
+        try:
+            with flask_app.app_context():
+                identity = decode_token(header[len("Bearer "):])[flask_app.config["JWT_IDENTITY_CLAIM"]]
+        except Exception:
+            identity = None
+    remote_addr = request.client.host if request.client else None
+    forwarded = request.headers.get("x-forwarded-for")
+    access_route = [ip.strip() for ip in forwarded.split(",")] if forwarded else [remote_addr]
+    return identity_key(identity, access_route, remote_addr)
+
+
+def rate_limited(handler):
+    # mismo nombre de endpoint que la ruta de Flask: api.<handler>
+    endpoint = f"api.{handler.__name__}"
+
+    async def wrapper(request):
+        check = flask_app.extensions.get("rate_limit")
+        wait = check(endpoint, rate_limit_key(request)) if check else 0
+        if wait:
+            response = json_response({"error": "too many requests"}, 429)
+            response.headers["Retry-After"] = retry_after(wait)
+            return response
+        return await handler(request)
+
+    wrapper.__name__ = handler.__name__
+    return wrapper
+
+
+def measured(handler):
+    # las mismas series que metrics.setup_metrics para las rutas de Flask
+    endpoint = f"api.{handler.__name__}"
+
+    async def wrapper(request):
+        totals = [0, 0.0]
+        token = request_queries.set(totals)
+        started = time.perf_counter()
+        try:
+            response = await handler(request)
+        finally:
+            request_queries.reset(token)
+        observe(endpoint, request.method, response.status_code, time.perf_counter() - started, *totals)
+        return response
+
+    wrapper.__name__ = handler.__name__
+    return wrapper
+
+
+def read_route(path, handler):
+    return Route(path, measured(rate_limited(handler)), methods=["GET"])
+
+
+async def get_by_id(request, model, not_found, use_cache=False):
+    id = request.path_params["id"]
+    if use_cache:
+        entry = cache.get(model, id)
+        if entry:
+            etag = etag_for(model, id, entry["version"])
+            if if_none_match(request, etag):
+                return Response(status_code=304, headers={"ETag": f'"{etag}"'})
+            return json_response(entry["data"], etag=etag)
+
+    generation = cache.generation()
+    sessionmaker, replica = session_for(request)
+    async with sessionmaker() as session:
+        obj = await session.get(model, id)
+        if obj is None:
+            return json_response({"error": not_found}, 404)
+        etag = etag_for(model, id, obj.version)
+        if if_none_match(request, etag):
+            return Response(status_code=304, headers={"ETag": f'"{etag}"'})
+        serialized = obj.serialize()
+    # una replica puede ir atrasada: no se guarda en la cache
+    if use_cache and not replica:
+        cache.set(model, id, obj.version, serialized, generation)
+    return json_response(serialized, etag=etag)
+
+
+def log_access(request, user, resource, ids):
+    # sin esperar: un handler async no puede bloquear el event loop
+    events = events_for(user, request.client.host if request.client else None, f"api.{request.scope['endpoint'].__name__}", resource, ids)
+    if not audit.enqueue(events, timeout=0):
+        return json_response({"error": "Audit log is busy, try again later"}, 503)
+    return None
+
+
+async def doctor_only(request, model, not_found, use_cache=False, resource=None):
+    user, error = current_user(request)
+    if error:
+        return error
+    if user["type"] != "doctor":
+        return json_response({"error": "this useris not a doctor"}, 404)
+    if resource:
+        error = log_access(request, user, resource, [request.path_params["id"]])
+        if error:
+            return error
+    return await get_by_id(request, model, not_found, use_cache)
+
+
+async def get_doctor_by_id(request):
+    return await get_by_id(request, Doctor, "doctor not found", use_cache=True)
+
+
+async def get_patient_by_id(request):
+    return await doctor_only(request, Patient, "patient not found", use_cache=True, resource="patient")
+
+
+async def get_appointment_by_id(request):
+    return await doctor_only(request, Appointment, "appointment not found")
+
+
+async def get_record_by_id(request):
+    return await doctor_only(request, Record, "record not found", resource="record")
+
+
+async def get_patients(request):
+    # como utils.int_arg en la ruta de Flask: un valor que no es entero es un 400
+    values = {}
+    for name, default in (("limit", PATIENTS_PAGE_SIZE), ("after", 0)):
+        value = request.query_params.get(name, "")
+        try:
+            values[name] = int(value) if value != "" else default
+        except ValueError:
+            return json_response({"message": f"{name} must be an integer"}, 400)
+    limit = max(1, min(values["limit"], PATIENTS_MAX_PAGE_SIZE))
+    after = values["after"]
+
+    sessionmaker, _ = session_for(request)
+    async with sessionmaker() as session:
+        result = await session.execute(
+            select(*PATIENT_COLUMNS)
+            .where(Patient.id > after)
+            .order_by(Patient.id)
+            .limit(limit + 1)
+        )
+        rows = result.all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    if rows:
+        error = log_access(request, None, "patient", [row.id for row in rows[:limit]])
+        if error:
+            return error
+    return json_response({
+        "patienst": [row._asdict() for row in rows[:limit]],
+        "next": next_cursor,
+    })
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    for async_engine in [engine, *replica_engines]:
+        await async_engine.dispose()
+
+
+application = Starlette(
+    routes=[
+        read_route("/doctor/{id:int}", get_doctor_by_id),
+        read_route("/patient/{id:int}", get_patient_by_id),
+        read_route("/appointment/{id:int}", get_appointment_by_id),
+        read_route("/record/{id:int}", get_record_by_id),
+        read_route("/patients", get_patients),
+        # todo lo demas lo atiende la app de Flask
+        Mount("/", app=WSGIMiddleware(flask_app)),
+    ],
+    lifespan=lifespan,
+)
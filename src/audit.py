@@ -0,0 +1,212 @@
+"""
+Audit log of who read which patient or record, written off the request path.
+
+Routes call log_access() after the access check. Events go into a bounded
+in-memory buffer, and a background thread in each worker writes them in
+batches, either to the append-only audit_log table or to JSON lines
+segment files:
+
+- AUDIT_BACKEND: "db" (default), "file" or "off".
+- AUDIT_DIR: directory for the segment files (audit-<pid>-<n>.jsonl),
+  fsynced after every batch and rotated at AUDIT_SEGMENT_BYTES.
+- AUDIT_BUFFER: maximum events waiting in memory per worker.
+- AUDIT_BATCH and AUDIT_FLUSH_INTERVAL: the writer flushes when a batch is
+  full or every interval seconds, whichever comes first.
+- AUDIT_BLOCK_TIMEOUT: when the buffer is full (the writer is behind or
+  the database is down) a read waits this long for room and then fails
+  with 503. A read that cannot be audited is not served.
+
+Failed writes stay in the buffer and are retried. At interpreter exit (a
+worker shutting down) the buffer is written synchronously.
+"""
+import atexit
+import collections
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from flask import request
+from flask_jwt_extended import get_jwt_identity
+from utils import APIException
+
+AUDIT_BACKEND = os.getenv("AUDIT_BACKEND", "db")
+AUDIT_DIR = os.getenv("AUDIT_DIR", "audit")
+AUDIT_SEGMENT_BYTES = int(os.getenv("AUDIT_SEGMENT_BYTES", 64 * 1024 * 1024))
+AUDIT_BUFFER = int(os.getenv("AUDIT_BUFFER", 10000))
+AUDIT_BATCH = int(os.getenv("AUDIT_BATCH", 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1))
+AUDIT_BLOCK_TIMEOUT = float(os.getenv("AUDIT_BLOCK_TIMEOUT", 1))
+
+FIELDS = ("created_at", "user_type", "user_id", "ip", "endpoint", "resource", "resource_id")
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseSink:
+    def __init__(self, app):
+        self.app = app
+
+    def write(self, events):
+        from models import db, AuditLog
+
+        with self.app.app_context():
+            # directo al engine principal, sin la sesion de la peticion
+            with db.engine.begin() as connection:
+                connection.execute(AuditLog.__table__.insert(), [dict(zip(FIELDS, event)) for event in events])
+
+
+class FileSink:
+    def __init__(self, directory=AUDIT_DIR, segment_bytes=AUDIT_SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._file = None
+        self._pid = None
+        self._segment = 0
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if self._file is not None:
+            self._file.close()
+        if self._pid != os.getpid():
+            self._pid, self._segment = os.getpid(), 0
+        self._segment += 1
+        path = os.path.join(self.directory, f"audit-{self._pid}-{self._segment:06d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, events):
+        if self._file is None or self._pid != os.getpid() or self._file.tell() >= self.segment_bytes:
+            self._open()
+        for event in events:
+            row = dict(zip(FIELDS, event))
+            row["created_at"] = row["created_at"].isoformat()
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+class AuditLogger:
+    def __init__(self, maxsize=AUDIT_BUFFER, batch_size=AUDIT_BATCH, interval=AUDIT_FLUSH_INTERVAL):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.interval = interval
+        self.sink = None
+        self.written = 0
+        self._events = collections.deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pid = None
+
+    def _start(self):
+        # un hilo escritor por worker, creado despues del fork
+        self._pid = os.getpid()
+        self._events.clear()
+        threading.Thread(target=self._run, name="audit-writer", daemon=True).start()
+
+    def enqueue(self, events, timeout=AUDIT_BLOCK_TIMEOUT):
+        # False si no hubo lugar en el buffer dentro del timeout
+        if self.sink is None:
+            return True
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self._pid != os.getpid():
+                self._start()
+            while len(self._events) + len(events) > self.maxsize:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self._events.extend(events)
+            if len(self._events) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def _take(self):
+        with self._cond:
+            if len(self._events) < self.batch_size:
+                self._cond.wait(self.interval)
+            count = min(len(self._events), self.batch_size)
+            return [self._events.popleft() for _ in range(count)]
+
+    def _give_back(self, batch):
+        # el lote vuelve al frente del buffer, en el mismo orden
+        with self._cond:
+            self._events.extendleft(reversed(batch))
+
+    def _write(self, batch):
+        with self._write_lock:
+            self.sink.write(batch)
+            self.written += len(batch)
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            batch = self._take()
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+                backoff = self.interval
+            except Exception:
+                logger.exception("audit log write failed, retrying in %.1fs", backoff)
+                self._give_back(batch)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                with self._cond:
+                    self._cond.notify_all()
+
+    def flush(self):
+        # escribe lo pendiente en este hilo (al apagar el worker)
+        if self.sink is None or self._pid != os.getpid():
+            return
+        while True:
+            with self._cond:
+                batch = [self._events.popleft() for _ in range(min(len(self._events), self.batch_size))]
+            if not batch:
+                return
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("audit log flush failed, %d events lost", len(batch) + len(self._events))
+                return
+
+    def stats(self):
+        return {"buffered": len(self._events), "written": self.written}
+
+
+audit = AuditLogger()
+atexit.register(audit.flush)
+
+
+def events_for(user, ip, endpoint, resource, ids):
+    created_at = datetime.datetime.utcnow()
+    user = user if isinstance(user, dict) else {}
+    return [
+        (created_at, user.get("type"), user.get("id"), ip, endpoint, resource, id)
+        for id in ids
+    ]
+
+
+def log_access(resource, *ids):
+    if not ids:
+        return
+    try:
+        user = get_jwt_identity()
+    except RuntimeError:
+        # ruta sin jwt_required: solo queda la IP
+        user = None
+    events = events_for(user, request.remote_addr, request.endpoint, resource, ids)
+    if not audit.enqueue(events):
+        raise APIException("Audit log is busy, try again later", status_code=503)
+
+
+def setup_audit(app):
+    backend = app.config.get("AUDIT_BACKEND", AUDIT_BACKEND)
+    if backend == "db":
+        audit.sink = DatabaseSink(app)
+    elif backend == "file":
+        audit.sink = FileSink(app.config.get("AUDIT_DIR", AUDIT_DIR))
+    elif backend != "off":
+        raise ValueError(f"unknown AUDIT_BACKEND {backend!r}, expected db, file or off")
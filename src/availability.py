@@ -0,0 +1,115 @@
+"""
+Doctor availability: working hours, slots and free-slot lookups.
+
+A doctor's working hours are stored as Availability rows (weekday, start,
+end, slot length). They are expanded once into a weekly template of slot
+start times per weekday and kept in a small TTL cache. Free slots for a
+date range are the template minus the booked (date, time) pairs, which
+come from one range scan on the (id_doctor, date) index.
+
+Booking safety does not depend on the cache: the unique constraint on
+(id_doctor, date, time) makes the INSERT itself reject a taken slot.
+"""
+import datetime
+from bisect import bisect_left
+from models import db, Appointment, Availability
+from cache import MemoryBackend
+
+MAX_RANGE_DAYS = 62
+
+_templates = MemoryBackend(maxsize=4096, ttl=60)
+
+
+def parse_blocks(items):
+    """Validate a list of working-hour blocks; raise ValueError if invalid."""
+    if not isinstance(items, list):
+        raise ValueError("expected a list of blocks")
+
+    blocks = []
+    for item in items:
+        try:
+            weekday = int(item["weekday"])
+            start = datetime.time.fromisoformat(item["start_time"])
+            end = datetime.time.fromisoformat(item["end_time"])
+            slot_minutes = int(item["slot_minutes"])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("each block needs weekday, start_time, end_time and slot_minutes")
+        if not 0 <= weekday <= 6:
+            raise ValueError("weekday must be between 0 (monday) and 6 (sunday)")
+        if slot_minutes <= 0 or start >= end:
+            raise ValueError("blocks need a positive slot length and start_time before end_time")
+        blocks.append((weekday, start, end, slot_minutes))
+
+    # los bloques de un mismo dia no se pueden pisar, asi los turnos
+    # nunca se superponen y basta con la hora de inicio para identificarlos
+    blocks.sort()
+    for previous, current in zip(blocks, blocks[1:]):
+        if previous[0] == current[0] and current[1] < previous[2]:
+            raise ValueError("blocks overlap on the same weekday")
+    return blocks
+
+
+def expand(start, end, slot_minutes):
+    day = datetime.date.min
+    current = datetime.datetime.combine(day, start)
+    limit = datetime.datetime.combine(day, end)
+    step = datetime.timedelta(minutes=slot_minutes)
+    slots = []
+    while current + step <= limit:
+        slots.append(current.time())
+        current += step
+    return slots
+
+
+def weekly_template(id_doctor):
+    """Sorted slot start times per weekday for a doctor."""
+    template = _templates.get(id_doctor)
+    if template is not None:
+        return template
+
+    template = {weekday: [] for weekday in range(7)}
+    rows = db.session.query(
+        Availability.weekday,
+        Availability.start_time,
+        Availability.end_time,
+        Availability.slot_minutes,
+    ).filter(Availability.id_doctor == id_doctor)
+    for weekday, start, end, slot_minutes in rows:
+        template[weekday].extend(expand(start, end, slot_minutes))
+    template = {weekday: tuple(sorted(slots)) for weekday, slots in template.items()}
+    _templates.set(id_doctor, template)
+    return template
+
+
+def invalidate(id_doctor):
+    _templates.delete(id_doctor)
+
+
+def is_slot(id_doctor, date, time):
+    slots = weekly_template(id_doctor)[date.weekday()]
+    position = bisect_left(slots, time)
+    return position < len(slots) and slots[position] == time
+
+
+def free_slots(id_doctor, start, end):
+    template = weekly_template(id_doctor)
+    if not any(template.values()):
+        return []
+
+    booked = set(
+        db.session.query(Appointment.date, Appointment.time).filter(
+            Appointment.id_doctor == id_doctor,
+            Appointment.date >= start,
+            Appointment.date <= end,
+            Appointment.time.isnot(None),
+        )
+    )
+
+    free = []
+    day = start
+    while day <= end:
+        for time in template[day.weekday()]:
+            if (day, time) not in booked:
+                free.append({"date": day, "time": time})
+        day += datetime.timedelta(days=1)
+    return free
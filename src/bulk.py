@@ -0,0 +1,245 @@
+"""
+Set-based bulk creation of patients and appointments.
+
+Items are processed in chunks. Each chunk runs one existence query per
+unique/foreign key, one multi-row INSERT (executemany) and one commit.
+If the multi-row INSERT fails (a row raced in, a constraint the checks do
+not cover), the chunk is retried one row at a time, each in its own
+SAVEPOINT, so only the offending rows fail. Every item gets its own
+result entry, in input order. An appointment may carry a time, which has
+to fall on one of the doctor's slots, the same as in create_appointment.
+
+Patients are capped lower than appointments because every password is
+hashed: at the default scrypt cost (~130 ms per hash) a 2-process hash
+pool does about 15 hashes/s, so BULK_MAX_PATIENTS=200 takes ~13 s, well
+inside gunicorn's 30 s timeout. Hashing stops after BULK_HASH_TIMEOUT
+seconds; the patients not hashed by then get a 503 result and can be
+sent again. Raise both together with HASH_POOL_WORKERS, or use
+`flask import patient` for large loads.
+"""
+import datetime
+import os
+import time
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, Doctor, Patient, Appointment
+import availability
+from hashing import hash_passwords
+from utils import APIException
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 10000))
+BULK_MAX_PATIENTS = int(os.getenv("BULK_MAX_PATIENTS", 200))
+BULK_HASH_TIMEOUT = float(os.getenv("BULK_HASH_TIMEOUT", 20))
+
+PATIENT_FIELDS = ("name", "dni", "email", "password", "city", "country", "age", "gender", "number")
+APPOINTMENT_FIELDS = ("date", "reason", "mode", "confirmation", "id_doctor", "id_patient")
+PATIENT_STRING_FIELDS = ("name", "dni", "email", "password")
+
+
+def chunked(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def missing_fields(item, fields):
+    if not isinstance(item, dict):
+        return list(fields)
+    return [field for field in fields if item.get(field) in (None, "")]
+
+
+def wrong_types(item, fields, kind):
+    # bool es un int para isinstance, pero no es un id
+    return [
+        field for field in fields
+        if not isinstance(item[field], kind) or isinstance(item[field], bool)
+    ]
+
+
+def error(index, message, status):
+    return {"index": index, "status": status, "error": message}
+
+
+def insert_rows(model, rows):
+    # INSERT multi-fila; los ids vuelven en el mismo orden que las filas
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return db.session.execute(stmt, rows).scalars().all()
+
+
+def message_of(exc):
+    return str(exc.args[0] if exc.args else exc)
+
+
+def insert_chunk(model, to_insert, results, conflict):
+    # to_insert: [(index, fila)]; deja un resultado por item. conflict es
+    # el mensaje del 409, o una funcion que lo arma a partir de la fila
+    try:
+        ids = insert_rows(model, [row for _, row in to_insert])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        ids = None
+
+    if ids is not None:
+        for (index, _), new_id in zip(to_insert, ids):
+            results[index] = {"index": index, "status": 201, "id": new_id}
+        return
+
+    # el lote fallo entero: fila por fila, cada una en su SAVEPOINT
+    for index, row in to_insert:
+        try:
+            with db.session.begin_nested():
+                new_id = insert_rows(model, [row])[0]
+            results[index] = {"index": index, "status": 201, "id": new_id}
+        except IntegrityError:
+            results[index] = error(index, conflict(row) if callable(conflict) else conflict, 409)
+        except Exception as exc:
+            results[index] = error(index, message_of(exc), 500)
+    try:
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        for index, _ in to_insert:
+            results[index] = error(index, message_of(exc), 500)
+
+
+def create_patients(items):
+    results = [None] * len(items)
+    seen_emails = set()
+    seen_dnis = set()
+    deadline = time.monotonic() + BULK_HASH_TIMEOUT
+
+    for start, chunk in chunked(items):
+        candidates = []
+        for offset, item in enumerate(chunk):
+            index = start + offset
+            missing = missing_fields(item, PATIENT_FIELDS)
+            if missing:
+                results[index] = error(index, f"missing fields: {', '.join(missing)}", 400)
+                continue
+            wrong = wrong_types(item, PATIENT_STRING_FIELDS, str)
+            if wrong:
+                results[index] = error(index, f"must be strings: {', '.join(wrong)}", 400)
+            elif item["email"] in seen_emails or item["dni"] in seen_dnis:
+                results[index] = error(index, "duplicated in request", 409)
+            else:
+                seen_emails.add(item["email"])
+                seen_dnis.add(item["dni"])
+                candidates.append((index, item))
+
+        if not candidates:
+            continue
+
+        # una sola consulta para todos los email/dni del bloque
+        emails = [item["email"] for _, item in candidates]
+        dnis = [item["dni"] for _, item in candidates]
+        existing = db.session.query(Patient.email, Patient.dni).filter(
+            or_(Patient.email.in_(emails), Patient.dni.in_(dnis))
+        ).all()
+        taken_emails = {row.email for row in existing}
+        taken_dnis = {row.dni for row in existing}
+
+        to_insert = []
+        for index, item in candidates:
+            if item["email"] in taken_emails or item["dni"] in taken_dnis:
+                results[index] = error(index, "patient exist", 409)
+            else:
+                to_insert.append((index, item))
+
+        if not to_insert:
+            continue
+
+        try:
+            hashes = hash_passwords(
+                [item["password"] for _, item in to_insert],
+                timeout=max(0, deadline - time.monotonic()),
+            )
+        except APIException as exc:
+            # sin tiempo o sin lugar en el pool: este bloque y los siguientes
+            # quedan sin crear; los bloques anteriores ya estan guardados
+            for index, result in enumerate(results):
+                if result is None:
+                    results[index] = error(index, exc.message, exc.status_code)
+            break
+
+        rows = [
+            {
+                **{field: item[field] for field in PATIENT_FIELDS},
+                "password": hashed,
+                "is_active": True,
+            }
+            for (_, item), hashed in zip(to_insert, hashes)
+        ]
+        insert_chunk(Patient, list(zip((index for index, _ in to_insert), rows)), results, "patient exist")
+
+    return results
+
+
+def appointment_conflict(row):
+    # sin hora no hay turno que choque: el doctor o el paciente se borro
+    # entre la consulta y el INSERT
+    return "slot already booked" if row["time"] else "doctor or patient not found"
+
+
+def create_appointments(items):
+    results = [None] * len(items)
+
+    for start, chunk in chunked(items):
+        candidates = []
+        for offset, item in enumerate(chunk):
+            index = start + offset
+            missing = missing_fields(item, APPOINTMENT_FIELDS)
+            if missing:
+                results[index] = error(index, f"missing fields: {', '.join(missing)}", 400)
+                continue
+            wrong = wrong_types(item, ("id_doctor", "id_patient"), int)
+            if wrong:
+                results[index] = error(index, f"must be integers: {', '.join(wrong)}", 400)
+                continue
+            try:
+                date = datetime.date.fromisoformat(str(item["date"]))
+            except ValueError:
+                results[index] = error(index, "invalid date", 400)
+                continue
+            # la hora es opcional, como en create_appointment
+            time = item.get("time")
+            if time not in (None, ""):
+                try:
+                    time = datetime.time.fromisoformat(str(time))
+                except ValueError:
+                    results[index] = error(index, "invalid time", 400)
+                    continue
+            else:
+                time = None
+            candidates.append((index, item, date, time))
+
+        if not candidates:
+            continue
+
+        # doctores y pacientes referenciados, una consulta para cada tabla
+        doctor_ids = {item["id_doctor"] for _, item, _, _ in candidates}
+        patient_ids = {item["id_patient"] for _, item, _, _ in candidates}
+        doctors = {row.id for row in db.session.query(Doctor.id).filter(Doctor.id.in_(doctor_ids))}
+        patients = {row.id for row in db.session.query(Patient.id).filter(Patient.id.in_(patient_ids))}
+
+        to_insert = []
+        for index, item, date, time in candidates:
+            if item["id_doctor"] not in doctors:
+                results[index] = error(index, "doctor not found", 404)
+            elif item["id_patient"] not in patients:
+                results[index] = error(index, "patient not found", 404)
+            elif time is not None and not availability.is_slot(item["id_doctor"], date, time):
+                results[index] = error(index, "doctor is not available at that time", 400)
+            else:
+                to_insert.append((index, {
+                    **{field: item[field] for field in APPOINTMENT_FIELDS},
+                    "date": date,
+                    "time": time,
+                }))
+
+        if not to_insert:
+            continue
+
+        insert_chunk(Appointment, to_insert, results, appointment_conflict)
+
+    return results
@@ -0,0 +1,164 @@
+"""
+Read-through cache for the by-id lookups of hot models.
+
+Entries hold the serialized row plus its version, so a cached entry can
+answer both the JSON body and the ETag check. The default backend is a
+bounded LRU with TTL that lives in each worker. Any object with the same
+get/set/delete/clear methods (e.g. a Redis wrapper) can be assigned to
+``cache.backend`` to share entries between workers.
+
+Invalidation hangs off the SQLAlchemy session, not the routes: every
+doctor or patient updated or deleted through the ORM (the API, Flask-Admin,
+scripts) is dropped from the cache when its transaction commits, and an
+ORM bulk UPDATE/DELETE on those tables clears the cache. Inserts need
+nothing, a missing row is never cached. With the per-worker backend the
+other workers still serve their copy until CACHE_TTL; a shared backend
+removes that window.
+
+A read that misses takes generation() before it goes to the database and
+hands it to set(). Every invalidation in the worker bumps the generation,
+so a row read before a commit that invalidated it is not stored after
+that commit (it would stay stale until CACHE_TTL).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", 1024))
+CACHE_TTL = float(os.getenv("CACHE_TTL", 30))
+CACHED_TABLES = ("doctor", "patient")
+
+
+class MemoryBackend:
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ModelCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.stale_skips = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _key(self, model, id):
+        return f"{model.__tablename__}:{id}"
+
+    def get(self, model, id):
+        entry = self.backend.get(self._key(model, id))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def generation(self):
+        # se toma antes de leer la fila de la base y se pasa a set()
+        return self._generation
+
+    def set(self, model, id, version, data, generation=None):
+        # si hubo una invalidacion desde generation, la fila leida puede
+        # ser anterior a ese commit: no se guarda
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self.stale_skips += 1
+                return False
+            self.backend.set(self._key(model, id), {"version": version, "data": data})
+            return True
+
+    def invalidate(self, model, id):
+        with self._lock:
+            self._generation += 1
+            self.backend.delete(self._key(model, id))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.backend.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": getattr(self.backend, "evictions", 0),
+            "stale_skips": self.stale_skips,
+            "size": len(self.backend) if hasattr(self.backend, "__len__") else None,
+        }
+
+
+cache = ModelCache(MemoryBackend())
+
+
+def _pending(session):
+    # (modelo, id) a invalidar en el commit; None = vaciar el cache
+    return session.info.setdefault("cache_invalidate", set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        model = type(obj)
+        if getattr(model, "__tablename__", None) in CACHED_TABLES:
+            _pending(session).add((model, obj.id))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(state):
+    # update(Doctor)... / delete(Patient)...: no se sabe que ids toca
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None:
+        if getattr(state.bind_mapper.class_, "__tablename__", None) in CACHED_TABLES:
+            _pending(state.session).add(None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    # lo que quede de un rollback se invalida en el proximo commit: de
+    # mas no hace dano
+    pending = session.info.pop("cache_invalidate", None)
+    if not pending:
+        return
+    if None in pending:
+        cache.clear()
+        return
+    for model, id in pending:
+        cache.invalidate(model, id)
@@ -0,0 +1,352 @@
+"""
+Flask CLI commands, registered next to the `flask db` ones.
+
+    $ flask import patient legacy/patients.jsonl
+    $ flask import appointment legacy/appointments.csv --batch-size 10000
+    $ flask export appointments --from 2024-01-01 --to 2024-12-31 -o 2024.csv
+    $ flask stats check
+
+Files are read one row at a time and inserted in batches, so memory stays
+flat regardless of file size. Postgres batches go through COPY, other
+databases through executemany. After every committed batch the number of
+rows consumed is written to a checkpoint file; running the same command
+again resumes from there.
+
+Ids in the file are ignored unless --keep-ids is given, e.g. to import
+doctors and patients and then the appointments that reference their
+legacy ids; the Postgres id sequence is moved past the imported ids
+afterwards. A batch the database rejects (a duplicated email, a missing
+parent) stops the import with the range of rows in it;
+--skip-bad-rows instead retries that batch row by row and skips and
+reports the rows that fail. Exports are streamed the other way, see
+export.py.
+"""
+import csv
+import datetime
+import io
+import json
+import os
+import sys
+import time
+import click
+from sqlalchemy import Boolean, Date, Integer, String, Time, insert, text
+from models import db, Doctor, Patient, Appointment
+from hashing import hash_passwords
+import export
+import stats
+
+IMPORT_MODELS = {
+    "doctor": Doctor,
+    "patient": Patient,
+    "appointment": Appointment,
+}
+# columnas que el importador completa si no vienen en el archivo
+IMPORT_DEFAULTS = {"is_active": True}
+SKIPPED_COLUMNS = {"id", "version"}
+MAX_REPORTED_ERRORS = 20
+
+
+def read_rows(path, fmt):
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def coerce(column, value):
+    if value is None or value == "":
+        return None
+    if isinstance(column.type, Boolean):
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ("1", "true", "t", "yes", "y")
+    if isinstance(column.type, Integer):
+        return int(value)
+    if isinstance(column.type, Date):
+        return datetime.date.fromisoformat(str(value)[:10])
+    if isinstance(column.type, Time):
+        return datetime.time.fromisoformat(str(value))
+    if isinstance(column.type, String):
+        value = str(value)
+        if column.type.length and len(value) > column.type.length:
+            raise ValueError(f"longer than {column.type.length} characters")
+        return value
+    return value
+
+
+def validate_row(columns, raw):
+    row = {}
+    for column in columns:
+        try:
+            value = coerce(column, raw.get(column.name))
+        except (TypeError, ValueError) as error:
+            raise ValueError(f"{column.name}: {error}")
+        if value is None:
+            value = IMPORT_DEFAULTS.get(column.name)
+        if value is None and not column.nullable:
+            raise ValueError(f"{column.name}: required")
+        row[column.name] = value
+    return row
+
+
+def copy_rows(table, columns, rows):
+    # COPY ... FROM STDIN con un buffer CSV del lote
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            value.isoformat() if isinstance(value, datetime.date) else value
+            for value in (row[column.name] for column in columns)
+        ])
+    buffer.seek(0)
+
+    connection = db.engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        names = ", ".join(f'"{column.name}"' for column in columns)
+        cursor.copy_expert(f'COPY "{table.name}" ({names}) FROM STDIN WITH (FORMAT csv)', buffer)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def insert_batch(table, columns, rows):
+    if db.engine.dialect.name == "postgresql":
+        copy_rows(table, columns, rows)
+    else:
+        db.session.execute(insert(table), rows)
+        db.session.commit()
+
+
+def insert_each(table, rows, numbers):
+    # el lote fallo: fila por fila, cada una en su SAVEPOINT; devuelve
+    # [(numero de fila, error)] de las que no entraron
+    failed = []
+    for number, row in zip(numbers, rows):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table), [row])
+        except Exception as error:
+            failed.append((number, error))
+    db.session.commit()
+    return failed
+
+
+def error_message(error):
+    # primera linea del error del driver, sin el SQL
+    return str(getattr(error, "orig", None) or error).strip().splitlines()[0]
+
+
+def reset_sequence(table):
+    # con ids explicitos la secuencia de Postgres quedaria atras
+    if db.engine.dialect.name != "postgresql":
+        return
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+        f"coalesce((SELECT max(id) FROM \"{table.name}\"), 0) + 1, false)"
+    ))
+    db.session.commit()
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f).get("rows", 0)
+
+
+def write_checkpoint(path, rows):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"rows": rows}, f)
+    os.replace(tmp, path)
+
+
+def stats_range(start, end):
+    try:
+        return (
+            datetime.date.fromisoformat(start) if start else None,
+            datetime.date.fromisoformat(end) if end else None,
+        )
+    except ValueError:
+        raise click.BadParameter("from and to must be dates (YYYY-MM-DD)")
+
+
+def setup_commands(app):
+
+    @app.cli.command("import")
+    @click.argument("model", type=click.Choice(sorted(IMPORT_MODELS)))
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["jsonl", "csv"]), help="Defaults to the file extension.")
+    @click.option("--batch-size", default=5000, show_default=True)
+    @click.option("--checkpoint", help="Checkpoint file, defaults to <path>.checkpoint.")
+    @click.option("--restart", is_flag=True, help="Ignore the checkpoint and start from the first row.")
+    @click.option("--hash-passwords", "hash_plain", is_flag=True, help="Passwords in the file are plain text and must be hashed.")
+    @click.option("--keep-ids", is_flag=True, help="Insert the id column from the file instead of generating new ids.")
+    @click.option("--skip-bad-rows", is_flag=True, help="When the database rejects a batch, insert it row by row and skip the rows that fail.")
+    def import_command(model, path, fmt, batch_size, checkpoint, restart, hash_plain, keep_ids, skip_bad_rows):
+        """Stream a JSONL or CSV file into the doctor, patient or appointment table."""
+        fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        checkpoint = checkpoint or path + ".checkpoint"
+        table = IMPORT_MODELS[model].__table__
+        columns = [
+            column for column in table.columns
+            if column.name not in SKIPPED_COLUMNS or (keep_ids and column.name == "id")
+        ]
+
+        skip = 0 if restart else read_checkpoint(checkpoint)
+        if skip:
+            click.echo(f"resuming after {skip} rows")
+
+        consumed = skip
+        inserted = 0
+        rejected = 0
+        batch = []
+        numbers = []
+        started = time.monotonic()
+
+        def reject(number, error):
+            nonlocal rejected
+            rejected += 1
+            if rejected <= MAX_REPORTED_ERRORS:
+                click.echo(f"row {number}: {error}", err=True)
+
+        def flush():
+            nonlocal inserted
+            if hash_plain and "password" in table.columns:
+                hashes = hash_passwords([row["password"] for row in batch])
+                for row, hashed in zip(batch, hashes):
+                    row["password"] = hashed
+            try:
+                insert_batch(table, columns, batch)
+                inserted += len(batch)
+            except Exception as error:
+                # nada del lote quedo guardado y el checkpoint sigue antes de el
+                db.session.rollback()
+                if not skip_bad_rows:
+                    raise click.ClickException(
+                        f"rows {numbers[0]}-{numbers[-1]} rejected by the database, none of them "
+                        f"were inserted: {error_message(error)}\n"
+                        "Fix those rows, or run again with --skip-bad-rows to skip the ones that fail."
+                    )
+                failed = insert_each(table, batch, numbers)
+                for number, row_error in failed:
+                    reject(number, error_message(row_error))
+                inserted += len(batch) - len(failed)
+            batch.clear()
+            numbers.clear()
+            write_checkpoint(checkpoint, consumed)
+            elapsed = time.monotonic() - started
+            click.echo(f"{model}: {inserted} rows inserted, {inserted / elapsed:.0f} rows/s")
+
+        for number, raw in enumerate(read_rows(path, fmt), start=1):
+            if number <= skip:
+                continue
+            consumed = number
+            try:
+                batch.append(validate_row(columns, raw))
+                numbers.append(number)
+            except ValueError as error:
+                reject(number, error)
+            if len(batch) >= batch_size:
+                flush()
+
+        if batch:
+            flush()
+        else:
+            write_checkpoint(checkpoint, consumed)
+        if keep_ids:
+            reset_sequence(table)
+
+        elapsed = time.monotonic() - started
+        click.echo(
+            f"done: {inserted} inserted, {rejected} rejected in {elapsed:.1f}s "
+            f"({inserted / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+
+    @app.cli.group("export")
+    def export_group():
+        """Stream tables to CSV or Parquet files."""
+
+    @export_group.command("appointments")
+    @click.option("--from", "start", required=True, help="First date, YYYY-MM-DD.")
+    @click.option("--to", "end", required=True, help="Last date, YYYY-MM-DD.")
+    @click.option("--format", "fmt", type=click.Choice(export.EXPORT_FORMATS), help="Defaults to the output extension, or csv.")
+    @click.option("-o", "--output", help="Output file, defaults to stdout.")
+    @click.option("--chunk-size", default=export.EXPORT_CHUNK_SIZE, show_default=True)
+    def export_appointments_command(start, end, fmt, output, chunk_size):
+        """Export appointments joined with their records for a date range."""
+        try:
+            start, end = export.parse_range(start, end, max_days=None)
+        except ValueError as error:
+            raise click.BadParameter(str(error))
+        fmt = fmt or ("parquet" if output and output.lower().endswith(".parquet") else "csv")
+        if fmt not in export.available_formats():
+            raise click.UsageError("parquet export needs pyarrow (pip install pyarrow)")
+
+        rows = 0
+        size = 0
+        started = time.monotonic()
+
+        def counted(chunks):
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                yield chunk
+
+        out = open(output, "wb") if output else sys.stdout.buffer
+        try:
+            for data in export.encode(counted(export.export_rows(start, end, chunk_size)), fmt):
+                out.write(data)
+                size += len(data)
+        finally:
+            if output:
+                out.close()
+
+        elapsed = time.monotonic() - started
+        click.echo(
+            f"done: {rows} rows, {size / 1e6:.1f} MB in {elapsed:.1f}s "
+            f"({rows / elapsed if elapsed else 0:.0f} rows/s)",
+            err=True,
+        )
+
+    @app.cli.group("stats")
+    def stats_group():
+        """Check or rebuild the appointment_stat rollup."""
+
+    @stats_group.command("check")
+    @click.option("--from", "start", help="First date, YYYY-MM-DD.")
+    @click.option("--to", "end", help="Last date, YYYY-MM-DD.")
+    @click.option("--limit", default=20, show_default=True, help="Differences to report.")
+    def stats_check_command(start, end, limit):
+        """Compare the rollup with a count over appointment; exit 1 if they differ."""
+        start, end = stats_range(start, end)
+        started = time.monotonic()
+        differences = stats.check(start, end, limit)
+        for row in differences:
+            click.echo(
+                f"doctor {row['id_doctor']} {row['day']} {row['confirmation']}: "
+                f"expected {row['expected']}, stored {row['stored']}",
+                err=True,
+            )
+        elapsed = time.monotonic() - started
+        if differences:
+            raise click.ClickException(f"{len(differences)} keys differ, run `flask stats rebuild`")
+        click.echo(f"ok: rollup matches appointment ({elapsed:.1f}s)")
+
+    @stats_group.command("rebuild")
+    @click.option("--from", "start", help="First date, YYYY-MM-DD.")
+    @click.option("--to", "end", help="Last date, YYYY-MM-DD.")
+    def stats_rebuild_command(start, end):
+        """Recompute the rollup from appointment, for a date range or all of it."""
+        start, end = stats_range(start, end)
+        started = time.monotonic()
+        rows = stats.rebuild(start, end)
+        click.echo(f"done: {rows} rollup rows in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,124 @@
+"""
+Read-replica routing and connection pool settings.
+
+Replicas are listed in DATABASE_REPLICA_URLS (comma separated) and
+registered as SQLALCHEMY_BINDS named replica_0, replica_1, ... The
+session sends a statement to a replica only when all of these hold:
+
+- it runs inside a GET or HEAD request;
+- the session has nothing pending to flush;
+- the request has not committed anything;
+- the client has not written recently. After a commit the response sets
+  a short-lived cookie, and later requests that carry it read from the
+  primary (read-your-writes).
+
+Everything else (writes, CLI commands, migrations) uses the primary.
+Rows read from a replica may lag behind, so they are not put in the
+read-through cache (see read_from_replica()). One
+request always reads from the same replica. Pool settings come from
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE and
+DB_POOL_PRE_PING. An unset variable keeps the SQLAlchemy default.
+
+Locally the setup can be tried with two SQLite files:
+
+    DATABASE_URL=sqlite:////tmp/primary.db
+    DATABASE_REPLICA_URLS=sqlite:////tmp/replica.db
+"""
+import os
+import random
+import time
+from flask import g, request, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+STICKY_COOKIE = "db_primary_until"
+REPLICA_PREFIX = "replica_"
+
+
+def database_url(url):
+    return url.replace("postgres://", "postgresql://")
+
+
+def replica_binds():
+    urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",")]
+    return {f"{REPLICA_PREFIX}{i}": database_url(url) for i, url in enumerate(url for url in urls if url)}
+
+
+def engine_options():
+    options = {}
+    for name, key, cast in (
+        ("DB_POOL_SIZE", "pool_size", int),
+        ("DB_MAX_OVERFLOW", "max_overflow", int),
+        ("DB_POOL_TIMEOUT", "pool_timeout", float),
+        ("DB_POOL_RECYCLE", "pool_recycle", int),
+    ):
+        if os.getenv(name):
+            options[key] = cast(os.getenv(name))
+    if os.getenv("DB_POOL_PRE_PING"):
+        options["pool_pre_ping"] = os.getenv("DB_POOL_PRE_PING").lower() in ("1", "true", "yes")
+    return options
+
+
+def _reads_from_replica(session):
+    if not has_request_context() or request.method not in ("GET", "HEAD"):
+        return False
+    if session._flushing or session.new or session.dirty or session.deleted:
+        return False
+    if g.get("db_primary_until"):
+        return False
+    return not wrote_recently(request.cookies)
+
+
+def wrote_recently(cookies):
+    # la cookie que deja un commit: hasta entonces se lee del primario
+    try:
+        return float(cookies.get(STICKY_COOKIE, 0)) >= time.time()
+    except ValueError:
+        return False
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _reads_from_replica(self):
+            engines = self._db.engines
+            name = g.get("db_replica")
+            if name is None:
+                replicas = [key for key in engines if key and key.startswith(REPLICA_PREFIX)]
+                name = g.db_replica = random.choice(replicas) if replicas else False
+            if name:
+                return engines[name]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_from_replica():
+    # True si esta peticion ya leyo de una replica
+    return has_request_context() and bool(g.get("db_replica"))
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_to_primary(session):
+    if has_request_context():
+        g.db_primary_until = time.time() + REPLICA_STICKY_SECONDS
+
+
+def setup_db_routing(app):
+    # tiene que correr antes de db.init_app(app)
+    binds = replica_binds()
+    if binds:
+        app.config.setdefault("SQLALCHEMY_BINDS", {}).update(binds)
+    options = engine_options()
+    if options:
+        app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {}).update(options)
+
+    @app.after_request
+    def set_sticky_cookie(response):
+        until = g.get("db_primary_until")
+        if until and app.config.get("SQLALCHEMY_BINDS"):
+            response.set_cookie(
+                STICKY_COOKIE,
+                f"{until:.3f}",
+                max_age=int(REPLICA_STICKY_SECONDS) + 1,
+                httponly=True,
+            )
+        return response
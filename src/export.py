@@ -0,0 +1,187 @@
+"""
+Streaming export of appointments with their records for a date range.
+
+    GET /export/appointments?from=2024-01-01&to=2024-03-31&format=csv
+    $ flask export appointments --from 2024-01-01 --to 2024-03-31 -o q1.parquet
+
+One SELECT of Appointment LEFT JOIN Record, ordered by (date, id) over the
+ix_appointment_date_id index, is read through a server-side cursor in
+chunks of EXPORT_CHUNK_SIZE rows. Rows stay plain tuples (no ORM objects)
+and each chunk is encoded and handed out before the next one is fetched,
+so memory does not grow with the size of the range. An appointment with
+several records appears once per record, one without records once with
+empty record columns.
+
+HTTP exports go through audited(): before a chunk is sent, the patient
+and record ids in it are written to the audit log (see audit.py), the
+same as for any other read of patient data.
+
+CSV needs nothing extra. Parquet needs pyarrow, which is optional: every
+chunk becomes one row group. pyarrow is imported on the first Parquet
+export, not with this module, so workers that never export Parquet do
+not pay for it (about 30 MB of RSS).
+"""
+import csv
+import datetime
+import importlib.util
+import io
+import os
+from sqlalchemy import select
+from models import db, Appointment, Record
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 10000))
+EXPORT_MAX_DAYS = int(os.getenv("EXPORT_MAX_DAYS", 366))
+EXPORT_FORMATS = ("csv", "parquet")
+MIMETYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_COLUMNS = (
+    Appointment.id,
+    Appointment.date,
+    Appointment.time,
+    Appointment.reason,
+    Appointment.mode,
+    Appointment.confirmation,
+    Appointment.id_doctor,
+    Appointment.id_patient,
+    Record.id.label("record_id"),
+    Record.date.label("record_date"),
+    Record.diagnosis,
+    Record.treatment,
+    Record.recommendations,
+)
+HEADER = [column.key for column in EXPORT_COLUMNS]
+
+
+def available_formats():
+    # sin importar pyarrow: solo se mira si esta instalado
+    return [fmt for fmt in EXPORT_FORMATS if fmt != "parquet" or importlib.util.find_spec("pyarrow") is not None]
+
+
+def export_rows(start, end, chunk_size=EXPORT_CHUNK_SIZE):
+    # listas de tuplas, chunk_size filas a la vez, con un cursor del servidor
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .outerjoin(Record, Record.id_appointment == Appointment.id)
+        .where(Appointment.date >= start, Appointment.date <= end)
+        .order_by(Appointment.date, Appointment.id, Record.id)
+        .execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    result = db.session.execute(stmt)
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def audited(chunks):
+    # cada bloque queda en el audit log antes de salir; si el log esta
+    # lleno la descarga se corta ahi (APIException 503)
+    from audit import log_access
+
+    for rows in chunks:
+        log_access("patient", *dict.fromkeys(row.id_patient for row in rows))
+        log_access("record", *[row.record_id for row in rows if row.record_id is not None])
+        yield rows
+
+
+def csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Sink:
+    # archivo de solo escritura que entrega lo escrito en cada drain()
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def parquet_schema(pyarrow):
+    return pyarrow.schema([
+        ("id", pyarrow.int64()),
+        ("date", pyarrow.date32()),
+        ("time", pyarrow.time64("us")),
+        ("reason", pyarrow.string()),
+        ("mode", pyarrow.string()),
+        ("confirmation", pyarrow.string()),
+        ("id_doctor", pyarrow.int64()),
+        ("id_patient", pyarrow.int64()),
+        ("record_id", pyarrow.int64()),
+        ("record_date", pyarrow.date32()),
+        ("diagnosis", pyarrow.string()),
+        ("treatment", pyarrow.string()),
+        ("recommendations", pyarrow.string()),
+    ])
+
+
+def parquet_chunks(chunks):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:  # pragma: no cover - pyarrow es opcional
+        raise RuntimeError("parquet export needs pyarrow (pip install pyarrow)")
+    schema = parquet_schema(pyarrow)
+    sink = _Sink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    try:
+        for rows in chunks:
+            # columnas a partir de las tuplas, sin pasar por diccionarios
+            columns = list(zip(*rows))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def encode(chunks, fmt):
+    return parquet_chunks(chunks) if fmt == "parquet" else csv_chunks(chunks)
+
+
+def parse_range(start, end, max_days=EXPORT_MAX_DAYS):
+    # (inicio, fin) o ValueError con el mensaje para el cliente; sin
+    # max_days (la CLI) el rango no tiene limite
+    try:
+        start = datetime.date.fromisoformat(start)
+        end = datetime.date.fromisoformat(end)
+    except (TypeError, ValueError):
+        raise ValueError("from and to must be dates (YYYY-MM-DD)")
+    if end < start or (max_days is not None and (end - start).days > max_days):
+        raise ValueError(f"range must be between 0 and {max_days} days")
+    return start, end
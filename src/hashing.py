@@ -0,0 +1,150 @@
+"""
+Password hashing off the request thread.
+
+Hashes are computed in a small process pool so a burst of signups or logins
+cannot pin every worker on CPU. The number of hashes in flight (running plus
+waiting) is bounded; once the limit is reached callers get a 503 right away
+instead of queueing behind the pool.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+from utils import APIException
+
+# metodo/costo de werkzeug, ej: "scrypt:32768:8:1" o "pbkdf2:sha256:600000".
+# Si se cambia, los hashes viejos se actualizan en el siguiente login.
+HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD")
+# 0 hashea en el mismo hilo (util en desarrollo)
+HASH_WORKERS = int(os.getenv("HASH_POOL_WORKERS", 2))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_POOL_QUEUE", 16))
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", 10))
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_slots = None
+_method_prefix = None
+
+
+def _hash(password, method):
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+def _check(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+def _get_pool():
+    # el pool se crea en cada worker de gunicorn, despues del fork
+    global _pool, _pool_pid, _slots
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+            _slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+            _pool_pid = os.getpid()
+        return _pool, _slots
+
+
+def _run(fn, *args):
+    if HASH_WORKERS <= 0:
+        return fn(*args)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise APIException("Server busy, try again later", status_code=503)
+    try:
+        future = pool.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    # el lugar se libera cuando el proceso termina, no cuando nos cansamos
+    # de esperar: asi la cola nunca pasa de HASH_QUEUE_LIMIT
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except TimeoutError:
+        # si todavia no empezo, no se calcula
+        future.cancel()
+        raise APIException("Server busy, try again later", status_code=503)
+
+
+def hash_password(password):
+    return _run(_hash, password, HASH_METHOD)
+
+
+def _hash_many(passwords, method):
+    return [_hash(password, method) for password in passwords]
+
+
+def hash_passwords(passwords, chunksize=64, timeout=None):
+    # para cargas masivas: un solo lugar en la cola para todo el lote,
+    # repartido entre los procesos del pool; timeout (segundos) es para
+    # todo el lote, None espera lo que haga falta (la CLI)
+    if HASH_WORKERS <= 0:
+        return _hash_many(passwords, HASH_METHOD)
+
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise APIException("Server busy, try again later", status_code=503)
+    futures = []
+    try:
+        for start in range(0, len(passwords), chunksize):
+            futures.append(pool.submit(_hash_many, passwords[start:start + chunksize], HASH_METHOD))
+    except Exception:
+        for future in futures:
+            future.cancel()
+        slots.release()
+        raise
+    if not futures:
+        slots.release()
+        return []
+
+    # como en _run: el lugar se libera cuando termina el ultimo bloque
+    pending = [len(futures)]
+    pending_lock = threading.Lock()
+
+    def finished(_):
+        with pending_lock:
+            pending[0] -= 1
+            if pending[0] == 0:
+                slots.release()
+
+    for future in futures:
+        future.add_done_callback(finished)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    try:
+        hashes = []
+        for future in futures:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            hashes.extend(future.result(timeout=remaining))
+        return hashes
+    except TimeoutError:
+        for future in futures:
+            future.cancel()
+        raise APIException("Server busy, try again later", status_code=503)
+
+
+def verify_password(pwhash, password):
+    return _run(_check, pwhash, password)
+
+
+def method_prefix():
+    # werkzeug expande el metodo ("scrypt" -> "scrypt:32768:8:1",
+    # "pbkdf2" -> "pbkdf2:sha256:1000000"): se toma el prefijo de un hash
+    # real una sola vez, en el primer login, y se compara contra ese
+    global _method_prefix
+    if _method_prefix is None:
+        _method_prefix = _hash("x", HASH_METHOD).split("$", 1)[0]
+    return _method_prefix
+
+
+def needs_rehash(pwhash):
+    # el prefijo del hash guarda el metodo con el que se genero
+    if not HASH_METHOD:
+        return False
+    return pwhash.split("$", 1)[0] != method_prefix()
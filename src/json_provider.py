@@ -0,0 +1,51 @@
+"""
+JSON provider used by jsonify and request.get_json.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Both paths write dates and datetimes as ISO 8601 strings, so
+responses look the same with or without orjson.
+
+The dicts it encodes come from serialize(), whose keys and attrgetter are
+built once per model from serialize_fields (see models.Serialized).
+"""
+import datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def _default(o):
+    if isinstance(o, (datetime.date, datetime.datetime, datetime.time)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # los serialize() de los modelos ya devuelven las claves en orden fijo
+    sort_keys = False
+    default = staticmethod(_default)
+
+    def _encode(self, obj):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return super().dumps(obj).encode()
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault("default", _default)
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            self._encode(obj) + b"\n", mimetype=self.mimetype
+        )
@@ -0,0 +1,186 @@
+"""
+Request and database metrics, exposed at /metrics in Prometheus text format.
+
+Each request records its latency into a histogram per (endpoint, method,
+status). SQLAlchemy cursor events count the queries and the time spent in
+the database for the request in progress.
+
+Counters live in process memory. When METRICS_DIR is set, each gunicorn
+worker writes a snapshot of its counters to METRICS_DIR/metrics-<pid>.json
+at most every METRICS_FLUSH_INTERVAL seconds, and /metrics adds up the
+snapshots of every worker. Without METRICS_DIR only the worker that serves
+the scrape is reported.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from cache import cache
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+# "endpoint|method|status" -> [conteo por bucket..., +Inf, suma]
+_requests = {}
+# "endpoint" -> [consultas, segundos en la base de datos]
+_queries = {}
+_last_flush = 0.0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_start")
+    if not starts or not has_request_context():
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    g.metrics_queries = g.get("metrics_queries", 0) + 1
+    g.metrics_db_seconds = g.get("metrics_db_seconds", 0.0) + elapsed
+
+
+def _observe(endpoint, method, status, elapsed, queries, db_seconds):
+    key = f"{endpoint}|{method}|{status}"
+    with _lock:
+        series = _requests.get(key)
+        if series is None:
+            series = _requests[key] = [0] * (len(BUCKETS) + 2)
+        for position, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                series[position] += 1
+                break
+        else:
+            series[len(BUCKETS)] += 1
+        series[-1] += elapsed
+
+        totals = _queries.get(endpoint)
+        if totals is None:
+            totals = _queries[endpoint] = [0, 0.0]
+        totals[0] += queries
+        totals[1] += db_seconds
+
+
+def observe(endpoint, method, status, elapsed, queries=0, db_seconds=0.0):
+    # para lo que no pasa por Flask: los handlers async de asgi.py
+    _observe(endpoint, method, status, elapsed, queries, db_seconds)
+    _maybe_flush()
+
+
+def snapshot():
+    with _lock:
+        return {
+            "requests": {key: list(value) for key, value in _requests.items()},
+            "queries": {key: list(value) for key, value in _queries.items()},
+            "cache": cache.stats(),
+        }
+
+
+def _write_snapshot():
+    path = os.path.join(METRICS_DIR, f"metrics-{os.getpid()}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _maybe_flush():
+    global _last_flush
+    now = time.monotonic()
+    if METRICS_DIR and now - _last_flush >= METRICS_FLUSH_INTERVAL:
+        _last_flush = now
+        _write_snapshot()
+
+
+def _merge(total, part):
+    for name in ("requests", "queries"):
+        for key, values in part.get(name, {}).items():
+            current = total[name].setdefault(key, [0] * len(values))
+            for position, value in enumerate(values):
+                current[position] += value
+    for key, value in part.get("cache", {}).items():
+        if value is not None:
+            total["cache"][key] = total["cache"].get(key, 0) + value
+
+
+def collect():
+    if not METRICS_DIR:
+        return snapshot()
+
+    _write_snapshot()
+    total = {"requests": {}, "queries": {}, "cache": {}}
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                _merge(total, json.load(f))
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def render(data):
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by endpoint, method and status.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for key, series in sorted(data["requests"].items()):
+        endpoint, method, status = key.split("|")
+        labels = f'endpoint="{endpoint}",method="{method}",status="{status}"'
+        cumulative = 0
+        for position, bound in enumerate(BUCKETS):
+            cumulative += series[position]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        cumulative += series[len(BUCKETS)]
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"http_request_duration_seconds_sum{{{labels}}} {series[-1]}")
+        lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+    lines.append("# HELP http_db_queries_total SQL statements issued while serving requests.")
+    lines.append("# TYPE http_db_queries_total counter")
+    for endpoint, (queries, _) in sorted(data["queries"].items()):
+        lines.append(f'http_db_queries_total{{endpoint="{endpoint}"}} {queries}')
+    lines.append("# HELP http_db_seconds_total Time spent in the database while serving requests.")
+    lines.append("# TYPE http_db_seconds_total counter")
+    for endpoint, (_, seconds) in sorted(data["queries"].items()):
+        lines.append(f'http_db_seconds_total{{endpoint="{endpoint}"}} {seconds}')
+
+    for name in ("hits", "misses", "evictions"):
+        lines.append(f"# TYPE cache_{name}_total counter")
+        lines.append(f"cache_{name}_total {data['cache'].get(name, 0)}")
+    return "\n".join(lines) + "\n"
+
+
+def setup_metrics(app):
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("metrics_start")
+        if start is not None:
+            _observe(
+                request.endpoint or "unmatched",
+                request.method,
+                response.status_code,
+                time.perf_counter() - start,
+                g.get("metrics_queries", 0),
+                g.get("metrics_db_seconds", 0.0),
+            )
+            _maybe_flush()
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return app.response_class(render(collect()), mimetype="text/plain; version=0.0.4")
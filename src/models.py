@@ -1,25 +1,54 @@
+from operator import attrgetter, itemgetter
 from flask_sqlalchemy import SQLAlchemy
+from db_routing import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
-class User(db.Model):
+class Serialized:
+    # serialize() arma el dict con las claves y los getters calculados una
+    # sola vez por modelo, a partir de serialize_fields; serialize_keys
+    # renombra los atributos que salen con otro nombre en el JSON
+    serialize_fields = ()
+    serialize_keys = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.serialize_fields:
+            cls._serialize_layout = (
+                tuple(cls.serialize_keys.get(field, field) for field in cls.serialize_fields),
+                itemgetter(*cls.serialize_fields),
+                attrgetter(*cls.serialize_fields),
+            )
+
+    def serialize(self):
+        keys, from_dict, from_attributes = self._serialize_layout
+        try:
+            # una fila cargada tiene todo en __dict__: sin pasar por los
+            # descriptores de SQLAlchemy (unas 3 veces mas rapido)
+            values = from_dict(self.__dict__)
+        except KeyError:
+            # atributos expirados (despues de un commit) o sin cargar
+            values = from_attributes(self)
+        return dict(zip(keys, values))
+
+
+class User(Serialized, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password = db.Column(db.String(80), unique=False, nullable=False)
     is_active = db.Column(db.Boolean(), unique=False, nullable=False)
 
+    serialize_fields = (
+        "id",
+        "email",
+    )
+
     def __repr__(self):
         return f"<User {self.email}>"
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "email": self.email,
-        }
-
 
-class Doctor(db.Model):
+class Doctor(Serialized, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=False, nullable=False)
     dni = db.Column(db.String(50), unique=True, nullable=False)
@@ -30,23 +59,26 @@ class Doctor(db.Model):
     number = db.Column(db.Integer, unique=False, nullable=False)
     appointment = db.relationship("Appointment", backref="doctor", lazy=True)
     is_active = db.Column(db.Boolean(), unique=False, nullable=False)
+    # se incrementa en cada UPDATE; de aqui sale el ETag
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    serialize_fields = (
+        "id",
+        "name",
+        "dni",
+        "email",
+        "registrationt",
+        "specialty",
+        "number",
+    )
 
     def __repr__(self):
         return f"<Doctor {self.name}>"
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "dni": self.dni,
-            "email": self.email,
-            "registrationt": self.registrationt,
-            "specialty": self.specialty,
-            "number": self.number,
-        }
-
-
-class Patient(db.Model):
+
+class Patient(Serialized, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=False, nullable=False)
     dni = db.Column(db.String(50), unique=True, nullable=False)
@@ -59,25 +91,27 @@ class Patient(db.Model):
     number = db.Column(db.Integer, unique=False, nullable=False)
     appointment = db.relationship("Appointment", backref="patient", lazy=True)
     is_active = db.Column(db.Boolean(), unique=False, nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    serialize_fields = (
+        "id",
+        "name",
+        "dni",
+        "email",
+        "city",
+        "country",
+        "age",
+        "gender",
+        "number",
+    )
 
     def __repr__(self):
         return f"<Patient {self.name}>"
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "dni": self.dni,
-            "email": self.email,
-            "city": self.city,
-            "country": self.country,
-            "age": self.age,
-            "gender": self.gender,
-            "number": self.number,
-        }
-
-
-class Appointment(db.Model):
+
+class Appointment(Serialized, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, unique=False, nullable=False)
     reason = db.Column(db.String(200), unique=False, nullable=False)
@@ -85,42 +119,136 @@ class Appointment(db.Model):
     confirmation = db.Column(db.String(20), unique=False, nullable=False)
     id_doctor = db.Column(db.Integer, db.ForeignKey("doctor.id"), nullable=False)
     id_patient = db.Column(db.Integer, db.ForeignKey("patient.id"), nullable=False)
+    # hora de inicio del turno; las citas viejas no tienen hora
+    time = db.Column(db.Time, unique=False, nullable=True)
     record = db.relationship("Record", backref="appointment", lazy=True)
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    # indices para las busquedas por doctor, por paciente y por estado
+    __table_args__ = (
+        db.Index("ix_appointment_id_doctor_date", "id_doctor", "date"),
+        db.Index("ix_appointment_id_patient_date", "id_patient", "date"),
+        db.Index("ix_appointment_confirmation_date", "confirmation", "date"),
+        # exportes por rango de fechas, ya en orden (ver export.py)
+        db.Index("ix_appointment_date_id", "date", "id"),
+        # un doctor no puede tener dos citas en el mismo turno
+        db.UniqueConstraint("id_doctor", "date", "time", name="uq_appointment_doctor_slot"),
+    )
+
+    serialize_fields = (
+        "id",
+        "date",
+        "reason",
+        "mode",
+        "confirmation",
+        "id_doctor",
+        "id_patient",
+        "time",
+    )
 
     def __repr__(self):
         return f"<Appointment {self.date}>"
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "date": self.date,
-            "reason": self.reason,
-            "mode": self.mode,
-            "confirmation": self.confirmation,
-            "id_doctor": self.id_doctor,
-            "id_patient": self.id_patient,
-        }
-
-
-class Record(db.Model):
+
+class Availability(Serialized, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    id_doctor = db.Column(db.Integer, db.ForeignKey("doctor.id"), nullable=False, index=True)
+    # 0 = lunes ... 6 = domingo
+    weekday = db.Column(db.Integer, unique=False, nullable=False)
+    start_time = db.Column(db.Time, unique=False, nullable=False)
+    end_time = db.Column(db.Time, unique=False, nullable=False)
+    slot_minutes = db.Column(db.Integer, unique=False, nullable=False)
+
+    serialize_fields = (
+        "id",
+        "id_doctor",
+        "weekday",
+        "start_time",
+        "end_time",
+        "slot_minutes",
+    )
+
+    def __repr__(self):
+        return f"<Availability {self.id_doctor} {self.weekday}>"
+
+
+class Record(Serialized, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     diagnosis = db.Column(db.String(1000), unique=False, nullable=False)
     recommendations = db.Column(db.String(1000), unique=False, nullable=False)
     treatment = db.Column(db.String(1000), unique=False, nullable=False)
     date = db.Column(db.Date, unique=False, nullable=False)
     id_appointment = db.Column(
-        db.Integer, db.ForeignKey("appointment.id"), nullable=False
+        db.Integer, db.ForeignKey("appointment.id"), nullable=False, index=True
+    )
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+    serialize_fields = (
+        "id",
+        "diagnosis",
+        "recommendations",
+        "treatment",
+        "date",
+        "id_appointment",
     )
+    # id_patient es el nombre historico de la clave, guarda el id de la cita
+    serialize_keys = {"id_appointment": "id_patient"}
 
     def __repr__(self):
         return f"<Record {self.date}>"
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "diagnosis": self.diagnosis,
-            "recommendations": self.recommendations,
-            "treatment": self.treatment,
-            "date": self.date,
-            "id_patient": self.id_appointment,
-        }
+
+class AppointmentStat(Serialized, db.Model):
+    # citas por doctor, dia y estado; la mantienen triggers (ver stats.py)
+    id_doctor = db.Column(db.Integer, db.ForeignKey("doctor.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    confirmation = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_appointment_stat_day", "day"),
+    )
+
+    serialize_fields = (
+        "id_doctor",
+        "day",
+        "confirmation",
+        "count",
+    )
+
+    def __repr__(self):
+        return f"<AppointmentStat {self.id_doctor} {self.day} {self.confirmation}>"
+
+
+class AuditLog(Serialized, db.Model):
+    # solo se inserta (ver audit.py); la migracion impide UPDATE y DELETE
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+    user_type = db.Column(db.String(20), nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    ip = db.Column(db.String(45), nullable=True)
+    endpoint = db.Column(db.String(80), nullable=False)
+    resource = db.Column(db.String(30), nullable=False)
+    resource_id = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_audit_log_resource", "resource", "resource_id"),
+    )
+
+    serialize_fields = (
+        "id",
+        "created_at",
+        "user_type",
+        "user_id",
+        "ip",
+        "endpoint",
+        "resource",
+        "resource_id",
+    )
+
+    def __repr__(self):
+        return f"<AuditLog {self.resource} {self.resource_id}>"
@@ -0,0 +1,52 @@
+"""
+Repeated-query (N+1) detector for development and tests.
+
+With QUERY_CHECK=log or QUERY_CHECK=raise, every SQL statement a request
+issues is counted by its text, which has the parameters left as
+placeholders. Once the same statement runs more than
+QUERY_CHECK_THRESHOLD times in one request, the detector logs a warning or
+raises RepeatedQueryError. That usually means a lazy relationship is
+loaded once per parent row. Leave QUERY_CHECK unset in production.
+"""
+import logging
+import os
+from flask import current_app, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_CHECK = os.getenv("QUERY_CHECK")
+QUERY_CHECK_THRESHOLD = int(os.getenv("QUERY_CHECK_THRESHOLD", 5))
+
+logger = logging.getLogger(__name__)
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    # un solo listener por proceso; cada app decide con su propia config
+    if not has_request_context():
+        return
+    mode = current_app.config.get("QUERY_CHECK")
+    if mode not in ("log", "raise"):
+        return
+    threshold = current_app.config["QUERY_CHECK_THRESHOLD"]
+    counts = g.setdefault("query_shapes", {})
+    count = counts[statement] = counts.get(statement, 0) + 1
+    if count != threshold + 1:
+        return
+
+    message = f"{request.endpoint}: same query ran more than {threshold} times: {statement[:300]}"
+    if mode == "raise":
+        raise RepeatedQueryError(message)
+    logger.warning(message)
+
+
+def setup_query_check(app):
+    app.config.setdefault("QUERY_CHECK", QUERY_CHECK)
+    app.config.setdefault("QUERY_CHECK_THRESHOLD", QUERY_CHECK_THRESHOLD)
+    if app.config["QUERY_CHECK"] not in ("log", "raise"):
+        return
+    if not event.contains(Engine, "before_cursor_execute", _count_statement):
+        event.listen(Engine, "before_cursor_execute", _count_statement)
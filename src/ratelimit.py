@@ -0,0 +1,205 @@
+"""
+Token-bucket rate limiting shared by every worker on the host.
+
+Each (endpoint, client) pair has a bucket of ``capacity`` tokens that
+refills at ``capacity / seconds`` tokens per second; a request takes one
+token or gets a 429 with Retry-After. The client is the JWT identity
+("doctor:12") when the request carries a valid token and the client IP
+otherwise.
+
+Buckets live in a fixed-size table in a memory-mapped file
+(RATE_LIMIT_FILE), so all gunicorn workers of the host see the same
+counts. A check hashes the key, locks the file with flock and reads and
+writes one 24-byte slot. When the table is full the least recently used
+slot in the probe window is reused, which at worst hands a client a fresh
+bucket. Without fcntl (Windows) the table is per process.
+
+Limits are "capacity/seconds" per endpoint. RATE_LIMITS overrides or adds
+entries, e.g. "api.doctor_login=5/60,api.get_patients=30/60", and
+RATE_LIMIT_DEFAULT applies to every other API endpoint ("off" disables
+it). RATE_LIMIT_ENABLED=0 turns the limiter off.
+
+setup_rate_limit() leaves the check in app.extensions["rate_limit"] so
+the async routes in asgi.py count against the same buckets and limits.
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from flask import request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+RATE_LIMIT_FILE = os.getenv("RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "api-ratelimit.bin"))
+RATE_LIMIT_SLOTS = int(os.getenv("RATE_LIMIT_SLOTS", 65536))
+# cuantos proxies de confianza agregan X-Forwarded-For (0: usar remote_addr)
+RATE_LIMIT_PROXIES = int(os.getenv("RATE_LIMIT_PROXIES", 0))
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "600/60")
+RATE_LIMITS = os.getenv("RATE_LIMITS")
+
+# rutas caras: login hashea el password, las otras devuelven muchas filas
+DEFAULT_LIMITS = {
+    "api.doctor_login": "10/60",
+    "api.get_appointments": "10/60",
+    "api.get_appointments_status": "10/60",
+    "api.create_patients_bulk": "20/60",
+    "api.create_appointments_bulk": "20/60",
+    "api.export_appointments": "5/60",
+}
+
+# slot: hash de la clave, tokens, ultimo acceso
+SLOT = struct.Struct("<Qdd")
+PROBE = 8
+
+
+def parse_limit(value):
+    # "10/60" -> (capacidad, tokens por segundo); "off" -> None
+    if value is None or value.strip().lower() in ("", "off", "none", "0"):
+        return None
+    capacity, seconds = value.split("/")
+    capacity, seconds = int(capacity), float(seconds)
+    return capacity, capacity / seconds
+
+
+def parse_limits(value):
+    limits = {}
+    for item in (value or "").split(","):
+        if item.strip():
+            endpoint, limit = item.split("=")
+            limits[endpoint.strip()] = limit.strip()
+    return limits
+
+
+class SharedBuckets:
+    def __init__(self, path=RATE_LIMIT_FILE, slots=RATE_LIMIT_SLOTS):
+        self.path = path
+        self.slots = slots
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        # flock es por descriptor abierto: cada worker abre el archivo
+        # despues del fork para que los locks se excluyan entre ellos
+        size = self.slots * SLOT.size
+        if fcntl is None:
+            self._map = mmap.mmap(-1, size)
+        else:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+        self._pid = os.getpid()
+
+    def take(self, key, capacity, rate):
+        # devuelve 0 si se permite, o los segundos hasta el proximo token
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        first = digest % self.slots
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                return self._take(digest, first, capacity, rate)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _take(self, digest, first, capacity, rate):
+        now = time.time()
+        table = self._map
+        target = None
+        oldest = None
+        for step in range(PROBE):
+            offset = ((first + step) % self.slots) * SLOT.size
+            key, tokens, last = SLOT.unpack_from(table, offset)
+            if key == digest:
+                target = offset
+                tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+                break
+            if key == 0:
+                target, tokens = offset, capacity
+                break
+            if oldest is None or last < oldest[1]:
+                oldest = (offset, last)
+        else:
+            target, tokens = oldest[0], capacity
+
+        if tokens >= 1:
+            SLOT.pack_into(table, target, digest, tokens - 1, now)
+            return 0
+        SLOT.pack_into(table, target, digest, tokens, now)
+        return (1 - tokens) / rate
+
+
+def identity_key(identity, access_route, remote_addr):
+    # access_route: X-Forwarded-For de izquierda a derecha, o [remote_addr]
+    if isinstance(identity, dict):
+        return f"{identity.get('type')}:{identity.get('id')}"
+    if identity is not None:
+        return f"user:{identity}"
+    if RATE_LIMIT_PROXIES and access_route:
+        return f"ip:{access_route[max(0, len(access_route) - RATE_LIMIT_PROXIES)]}"
+    return f"ip:{remote_addr}"
+
+
+def client_key():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        # token vencido o invalido: la ruta respondera 401/422, se cuenta por IP
+        identity = None
+    return identity_key(identity, request.access_route, request.remote_addr)
+
+
+def retry_after(wait):
+    return str(math.ceil(wait))
+
+
+def build_limiter(app, buckets=None):
+    # check(endpoint, key) -> 0 si se permite, o segundos hasta el proximo token
+    configured = {**DEFAULT_LIMITS, **parse_limits(app.config.get("RATE_LIMITS", RATE_LIMITS))}
+    limits = {endpoint: parse_limit(limit) for endpoint, limit in configured.items()}
+    default = parse_limit(app.config.get("RATE_LIMIT_DEFAULT", RATE_LIMIT_DEFAULT))
+    buckets = buckets or SharedBuckets()
+
+    def check(endpoint, key):
+        limit = limits.get(endpoint, default)
+        if limit is None:
+            return 0
+        capacity, rate = limit
+        return buckets.take(f"{endpoint}|{key}", capacity, rate)
+
+    return check
+
+
+def setup_rate_limit(app, buckets=None):
+    if not app.config.get("RATE_LIMIT_ENABLED", RATE_LIMIT_ENABLED):
+        return
+
+    check = app.extensions["rate_limit"] = build_limiter(app, buckets)
+
+    @app.before_request
+    def check_rate_limit():
+        endpoint = request.endpoint
+        if endpoint is None or request.blueprint != "api":
+            return None
+        wait = check(endpoint, client_key())
+        if not wait:
+            return None
+        response = jsonify({"error": "too many requests"})
+        response.status_code = 429
+        response.headers["Retry-After"] = retry_after(wait)
+        return response
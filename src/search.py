@@ -0,0 +1,81 @@
+"""
+Full-text search over medical records.
+
+The index lives in the database and is maintained there, so every write
+path (create_record, edit_record, delete_record_by_id, admin, imports)
+keeps it in sync inside the same transaction:
+
+- SQLite: an external-content FTS5 table ``record_fts`` fed by triggers.
+- Postgres: a generated ``search_vector`` tsvector column with a GIN index.
+
+Both are created by the migration. Other databases fall back to LIKE.
+"""
+from sqlalchemy import text, or_
+from models import db, Record
+
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_COLUMNS = "record.id, record.date, record.diagnosis, record.treatment, record.recommendations, record.id_appointment"
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # el indice de busqueda no esta en los modelos; que autogenerate no lo borre
+    if type_ == "table" and name.startswith("record_fts"):
+        return False
+    if type_ == "column" and name == "search_vector":
+        return False
+    if type_ == "index" and name == "ix_record_search_vector":
+        return False
+    return True
+
+
+def fts5_query(q):
+    # cada palabra entre comillas: se buscan todas y no se interpreta
+    # la sintaxis de FTS5 que escriba el usuario
+    return " ".join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+
+def search_records(q, limit, offset):
+    dialect = db.engine.dialect.name
+    params = {"limit": limit, "offset": offset}
+
+    if dialect == "sqlite":
+        sql = f"""
+            SELECT {SEARCH_COLUMNS}, bm25(record_fts) AS rank
+            FROM record_fts JOIN record ON record.id = record_fts.rowid
+            WHERE record_fts MATCH :q
+            ORDER BY rank, record.id
+            LIMIT :limit OFFSET :offset
+        """
+        params["q"] = fts5_query(q)
+    elif dialect == "postgresql":
+        sql = f"""
+            SELECT {SEARCH_COLUMNS}, ts_rank(record.search_vector, query) AS rank
+            FROM record, websearch_to_tsquery('simple', :q) AS query
+            WHERE record.search_vector @@ query
+            ORDER BY rank DESC, record.id
+            LIMIT :limit OFFSET :offset
+        """
+        params["q"] = q
+    else:
+        pattern = f"%{q}%"
+        rows = (
+            db.session.query(
+                Record.id,
+                Record.date,
+                Record.diagnosis,
+                Record.treatment,
+                Record.recommendations,
+                Record.id_appointment,
+            )
+            .filter(or_(
+                Record.diagnosis.like(pattern),
+                Record.treatment.like(pattern),
+                Record.recommendations.like(pattern),
+            ))
+            .order_by(Record.id)
+            .limit(limit)
+            .offset(offset)
+        )
+        return [row._asdict() for row in rows]
+
+    return [row._asdict() for row in db.session.execute(text(sql), params)]
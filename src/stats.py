@@ -0,0 +1,125 @@
+"""
+Appointment counts for the dashboards, read from a rollup table.
+
+appointment_stat holds one row per (doctor, day, confirmation) with the
+number of appointments. The migration fills it and installs triggers on
+appointment that keep it in sync inside the same transaction as the
+write, so every write path (create_appointment, edit_appointment,
+delete_appointment_by_id, bulk, admin, imports) updates it:
+
+- SQLite: row triggers that upsert the old and new keys.
+- Postgres: statement triggers with transition tables, one grouped
+  upsert per statement (a COPY of 10000 rows is one upsert, not 10000).
+
+Other databases get no triggers; run `flask stats rebuild` after writes.
+
+Reads never touch appointment: counts per doctor, day, confirmation or
+specialty (joined from the doctor row at read time, so a doctor changing
+specialty moves their counts) are sums over the rollup.
+
+    $ flask stats check                          # compare with appointment
+    $ flask stats rebuild --from 2024-01-01      # recompute a range
+"""
+from sqlalchemy import delete, except_, func, insert, select, text
+from models import db, Appointment, AppointmentStat, Doctor
+
+STATS_GROUPS = {
+    "doctor": AppointmentStat.id_doctor,
+    "day": AppointmentStat.day,
+    "confirmation": AppointmentStat.confirmation,
+    "specialty": Doctor.specialty,
+}
+STATS_DEFAULT_GROUP = "doctor,confirmation"
+KEY = ("id_doctor", "day", "confirmation")
+
+
+def parse_groups(value):
+    # "doctor,confirmation" -> ["doctor", "confirmation"], o ValueError
+    groups = [name.strip() for name in (value or STATS_DEFAULT_GROUP).split(",") if name.strip()]
+    unknown = [name for name in groups if name not in STATS_GROUPS]
+    if unknown or not groups:
+        raise ValueError(f"group_by must be a list of {', '.join(STATS_GROUPS)}")
+    return list(dict.fromkeys(groups))
+
+
+def appointment_stats(groups, start=None, end=None, id_doctor=None, specialty=None, confirmation=None):
+    columns = [STATS_GROUPS[name].label(name) for name in groups]
+    stmt = select(*columns, func.sum(AppointmentStat.count).label("count"))
+    if "specialty" in groups or specialty is not None:
+        stmt = stmt.join(Doctor, Doctor.id == AppointmentStat.id_doctor)
+    else:
+        stmt = stmt.select_from(AppointmentStat)
+
+    if start is not None:
+        stmt = stmt.where(AppointmentStat.day >= start)
+    if end is not None:
+        stmt = stmt.where(AppointmentStat.day <= end)
+    if id_doctor is not None:
+        stmt = stmt.where(AppointmentStat.id_doctor == id_doctor)
+    if specialty is not None:
+        stmt = stmt.where(Doctor.specialty == specialty)
+    if confirmation is not None:
+        stmt = stmt.where(AppointmentStat.confirmation == confirmation)
+
+    stmt = stmt.group_by(*columns).order_by(*columns)
+    return [row._asdict() for row in db.session.execute(stmt)]
+
+
+def _in_range(column, start, end):
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column <= end)
+    return conditions
+
+
+def expected_counts(start=None, end=None):
+    # lo que deberia tener el rollup, contado sobre appointment
+    return (
+        select(
+            Appointment.id_doctor,
+            Appointment.date.label("day"),
+            Appointment.confirmation,
+            func.count().label("count"),
+        )
+        .where(*_in_range(Appointment.date, start, end))
+        .group_by(Appointment.id_doctor, Appointment.date, Appointment.confirmation)
+    )
+
+
+def stored_counts(start=None, end=None):
+    return (
+        select(AppointmentStat.id_doctor, AppointmentStat.day, AppointmentStat.confirmation, AppointmentStat.count)
+        .where(*_in_range(AppointmentStat.day, start, end))
+    )
+
+
+def check(start=None, end=None, limit=100):
+    # claves donde el rollup no coincide con appointment, a lo sumo limit
+    missing = except_(expected_counts(start, end), stored_counts(start, end)).limit(limit)
+    extra = except_(stored_counts(start, end), expected_counts(start, end)).limit(limit)
+    differences = {}
+    for row in db.session.execute(missing):
+        differences[row[:3]] = {"expected": row.count, "stored": 0}
+    for row in db.session.execute(extra):
+        differences.setdefault(row[:3], {"expected": 0})["stored"] = row.count
+    return [
+        {**dict(zip(KEY, key)), **counts}
+        for key, counts in sorted(differences.items())
+    ][:limit]
+
+
+def rebuild(start=None, end=None):
+    # recalcula el rango en una transaccion; en Postgres las escrituras a
+    # appointment esperan hasta el commit para no perder cambios
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("LOCK TABLE appointment IN SHARE MODE"))
+    db.session.execute(delete(AppointmentStat).where(*_in_range(AppointmentStat.day, start, end)))
+    result = db.session.execute(
+        insert(AppointmentStat).from_select(
+            ["id_doctor", "day", "confirmation", "count"], expected_counts(start, end)
+        )
+    )
+    db.session.commit()
+    return result.rowcount
@@ -1,4 +1,9 @@
-from flask import jsonify, url_for
+import base64
+import json
+from flask import jsonify, url_for, request, current_app, Response, stream_with_context
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+NDJSON_BATCH_SIZE = 500
 
 class APIException(Exception):
     status_code = 400
@@ -15,13 +20,64 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def wants_ndjson():
+    # el cliente pide streaming solo si prefiere NDJSON sobre JSON
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def ndjson_response(query, batch_size=NDJSON_BATCH_SIZE):
+    # recorre la query con un cursor del lado del servidor (yield_per)
+    # y envia una fila serializada por linea sin armar la lista completa
+    def generate():
+        for row in query.yield_per(batch_size):
+            yield current_app.json.dumps(row.serialize()) + "\n"
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def etag_for(model, id, version):
+    return f"{model.__tablename__}-{id}-{version}"
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    return response
+
+def not_modified(etag):
+    return with_etag(current_app.response_class(status=304), etag)
+
+def encode_cursor(values):
+    # cursor opaco para paginar por keyset, ej: [fecha, id]
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, *parsers):
+    # una tupla con un valor por parser, ej: decode_cursor(c, date.fromisoformat, int);
+    # cualquier otra cosa (base64 roto, {}, largo distinto) es un 400
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("wrong cursor shape")
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (TypeError, ValueError):
+        raise APIException("invalid cursor", status_code=400)
+
+def int_arg(name, default=None):
+    # parametro entero del query string; si viene y no es un entero es un
+    # 400, en vez de ignorarlo como hace request.args.get(type=int)
+    value = request.args.get(name, "")
+    if value == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise APIException(f"{name} must be an integer", status_code=400)
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    links = ['/admin/'] if 'admin' in app.blueprints else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
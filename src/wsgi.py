@@ -1,7 +1,28 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
+#
+# With `gunicorn --preload` this module is imported once in the master and
+# the workers are forked from it, so they share the app's memory pages
+# copy-on-write. APP_PROFILE=api leaves Flask-Admin out of API-only nodes.
+import gc
+import os
+from app import create_app
+from models import db
 
-from app import app as application
+application = create_app()
+
+
+def _dispose_engines():
+    # un worker no puede reusar las conexiones que abrio el master
+    with application.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_dispose_engines)
+# los objetos creados hasta aqui no los vuelve a recorrer el GC, asi sus
+# paginas no se copian en cada worker
+gc.freeze()
 
 if __name__ == "__main__":
     application.run()
@@ -0,0 +1,180 @@
+"""
+Shared fixtures: an app built by create_app() on a migrated SQLite file,
+a test client, doctor and patient tokens and a small seeded dataset.
+
+The schema comes from the migrations, not db.create_all(), so the indexes
+and triggers under test are the ones production gets. Migrations run once
+per session into a template file that every test copies.
+"""
+import datetime
+import importlib
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS = os.path.join(ROOT, "migrations")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# bench/ se importa como paquete desde la raiz
+sys.path.insert(1, ROOT)
+
+# los modulos leen esto al importarse: sin limites, sin auditoria y con
+# el hash en el proceso, rapido
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("AUDIT_BACKEND", "off")
+os.environ.setdefault("HASH_POOL_WORKERS", "0")
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+import pytest
+from flask_jwt_extended import create_access_token
+from flask_migrate import upgrade, downgrade
+
+import availability
+from app import create_app
+from cache import cache
+from models import db, Doctor, Patient, Appointment, Availability, Record
+
+# lunes
+MONDAY = datetime.date(2024, 1, 1)
+
+
+def build_app(database_url, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    app = create_app("api")
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture(scope="session")
+def template_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("schema") / "template.db"
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        app = build_app(f"sqlite:///{path}", monkeypatch)
+        with app.app_context():
+            upgrade(directory=MIGRATIONS)
+            db.engine.dispose()
+    return path
+
+
+@pytest.fixture
+def app(template_db, tmp_path, monkeypatch):
+    path = tmp_path / "api.db"
+    shutil.copy(template_db, path)
+    app = build_app(f"sqlite:///{path}", monkeypatch)
+    # caches de proceso: no deben traer filas de otra base
+    cache.clear()
+    availability._templates.clear()
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def pg_app(monkeypatch):
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    app = build_app(url, monkeypatch)
+    cache.clear()
+    availability._templates.clear()
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        yield app
+        db.session.remove()
+        downgrade(directory=MIGRATIONS, revision="base")
+        db.engine.dispose()
+
+
+def import_asgi(database_url, monkeypatch, replica_urls=""):
+    # asgi.py arma su app y sus engines al importarse: se importa de nuevo
+    # para cada base
+    for name in ("starlette", "a2wsgi", "aiosqlite", "httpx"):
+        pytest.importorskip(name)
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", replica_urls)
+    monkeypatch.delenv("ASYNC_DATABASE_URL", raising=False)
+    sys.modules.pop("asgi", None)
+    asgi = importlib.import_module("asgi")
+    cache.clear()
+    return asgi
+
+
+@pytest.fixture
+def asgi_app(template_db, tmp_path, monkeypatch):
+    path = tmp_path / "asgi.db"
+    shutil.copy(template_db, path)
+    asgi = import_asgi(f"sqlite:///{path}", monkeypatch)
+    with asgi.flask_app.app_context():
+        seed = seed_data()
+    yield asgi, seed
+    sys.modules.pop("asgi", None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def token_for(app, type, id):
+    with app.app_context():
+        return create_access_token({"id": id, "type": type})
+
+
+def auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def seed_data():
+    # 2 doctores, 2 pacientes, un turno por hora los lunes de 9 a 12,
+    # 10 citas del paciente 1 con el doctor 1 y un record cada dos citas
+    doctors = [
+        Doctor(
+            name=f"Doctor {i}", dni=f"D{i}", email=f"doctor{i}@test.dev", password="x",
+            registrationt=f"R{i}", specialty="cardiologia" if i == 1 else "pediatria",
+            number=i, is_active=True,
+        )
+        for i in (1, 2)
+    ]
+    patients = [
+        Patient(
+            name=f"Patient {i}", dni=f"P{i}", email=f"patient{i}@test.dev", password="x",
+            city="Lima", country="Peru", age=30, gender="f", number=i, is_active=True,
+        )
+        for i in (1, 2)
+    ]
+    db.session.add_all(doctors + patients)
+    db.session.flush()
+    db.session.add(Availability(
+        id_doctor=doctors[0].id, weekday=0, start_time=datetime.time(9),
+        end_time=datetime.time(12), slot_minutes=60,
+    ))
+    appointments = [
+        Appointment(
+            date=MONDAY + datetime.timedelta(days=i), reason="control", mode="virtual",
+            confirmation="pendiente" if i % 2 else "confirmada",
+            id_doctor=doctors[0].id, id_patient=patients[0].id,
+        )
+        for i in range(10)
+    ]
+    db.session.add_all(appointments)
+    db.session.flush()
+    db.session.add_all(
+        Record(
+            diagnosis="dolor de cabeza", recommendations="descanso", treatment="paracetamol",
+            date=appointment.date, id_appointment=appointment.id,
+        )
+        for appointment in appointments[::2]
+    )
+    db.session.commit()
+    return {"doctors": [d.id for d in doctors], "patients": [p.id for p in patients]}
+
+
+@pytest.fixture
+def seed(app):
+    return seed_data()
+
+
+@pytest.fixture
+def doctor_token(app, seed):
+    return token_for(app, "doctor", seed["doctors"][0])
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import event
+
+pytest.importorskip("flask_admin")
+
+import admin
+from app import create_app
+from models import db, Appointment, Doctor
+
+
+@pytest.fixture
+def views(app, seed):
+    admin._page_boundaries.clear()
+    return admin.AppointmentView(Appointment, db.session), admin.DoctorView(Doctor, db.session)
+
+
+def ids(view, page, search=None, page_size=4):
+    _, rows = view.get_list(page, None, None, search, None, page_size=page_size)
+    return [row.id for row in rows]
+
+
+def test_pages_by_id_cover_every_row_once(views):
+    appointments, _ = views
+    expected = [row.id for row in Appointment.query.order_by(Appointment.id.desc())]
+    # sin visitar las anteriores (deferred join) y despues en orden (rango de ids)
+    jumped = ids(appointments, 2)
+    walked = [id for page in range(3) for id in ids(appointments, page)]
+    assert walked == expected
+    assert jumped == expected[8:]
+    assert ids(appointments, 2) == jumped
+
+
+def test_list_never_counts_rows(views):
+    appointments, _ = views
+    statements = []
+
+    def capture(conn, cursor, statement, *args):
+        statements.append(statement.lower())
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        count, rows = appointments.get_list(0, None, None, None, None)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    assert count == Appointment.query.count()
+    assert not any("count(" in statement for statement in statements)
+
+
+def test_search_uses_prefixes_and_ids(views):
+    _, doctors = views
+    doctor = Doctor.query.filter_by(email="doctor2@test.dev").one()
+    assert ids(doctors, 0, "doctor2") == [doctor.id]
+    assert ids(doctors, 0, "D2") == [doctor.id]
+    assert ids(doctors, 0, str(doctor.id)) == [doctor.id]
+    # no es un LIKE '%term%'
+    assert ids(doctors, 0, "test.dev") == []
+    count, _ = doctors.get_list(0, None, None, "doctor2", None)
+    assert count is None
+
+
+def test_list_page_renders(app, seed):
+    full = create_app("full")
+    response = full.test_client().get("/admin/appointment/?page=1")
+    assert response.status_code == 200
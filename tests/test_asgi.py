@@ -0,0 +1,74 @@
+import asyncio
+from conftest import auth, token_for
+import metrics
+
+
+def run(asgi, *requests):
+    # todas en un mismo event loop; al final se cierra el engine, atado a ese loop
+    import httpx
+
+    async def send():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = [await client.request(method, url, headers=headers or {}) for method, url, headers in requests]
+        await asgi.engine.dispose()
+        return responses
+
+    return asyncio.run(send())
+
+
+def test_async_reads_match_the_flask_routes(asgi_app):
+    asgi, seed = asgi_app
+    token = token_for(asgi.flask_app, "doctor", seed["doctors"][0])
+    paths = [f"/doctor/{seed['doctors'][0]}", f"/patient/{seed['patients'][0]}", "/appointment/1", "/record/1", "/patients?limit=1"]
+    async_responses = run(asgi, *[("GET", path, auth(token)) for path in paths])
+    flask = asgi.flask_app.test_client()
+    for path, response in zip(paths, async_responses):
+        expected = flask.get(path, headers=auth(token))
+        assert response.status_code == expected.status_code == 200
+        assert response.json() == expected.get_json()
+        assert response.headers.get("etag") == expected.headers.get("ETag")
+
+
+def test_async_etag_auth_and_not_found(asgi_app):
+    asgi, seed = asgi_app
+    token = token_for(asgi.flask_app, "doctor", seed["doctors"][0])
+    first, missing, anonymous = run(
+        asgi,
+        ("GET", "/appointment/1", auth(token)),
+        ("GET", "/appointment/999", auth(token)),
+        ("GET", "/appointment/1", None),
+    )
+    assert missing.status_code == 404
+    assert anonymous.status_code == 401
+    [cached] = run(asgi, ("GET", "/appointment/1", {**auth(token), "If-None-Match": first.headers["etag"]}))
+    assert cached.status_code == 304
+
+
+def test_async_reads_are_measured(asgi_app):
+    asgi, seed = asgi_app
+    before = metrics.snapshot()["queries"].get("api.get_appointment_by_id", [0, 0.0])[0]
+    token = token_for(asgi.flask_app, "doctor", seed["doctors"][0])
+    run(asgi, ("GET", "/appointment/1", auth(token)))
+    after = metrics.snapshot()
+    assert sum(after["requests"]["api.get_appointment_by_id|GET|200"][:-1]) >= 1
+    assert after["queries"]["api.get_appointment_by_id"][0] == before + 1
+
+
+def test_other_routes_go_to_flask(asgi_app):
+    asgi, seed = asgi_app
+    [response] = run(asgi, ("GET", f"/doctor/{seed['doctors'][0]}/availability", None))
+    assert response.status_code == 200
+    assert len(response.json()["availability"]) == 1
+
+
+def test_async_patients_rejects_the_same_parameters(asgi_app):
+    asgi, seed = asgi_app
+    paths = ["/patients?after=abc", "/patients?limit=x", "/patients?limit=1&after=1"]
+    async_responses = run(asgi, *[("GET", path, None) for path in paths])
+    flask = asgi.flask_app.test_client()
+    for path, response in zip(paths, async_responses):
+        expected = flask.get(path)
+        assert response.status_code == expected.status_code
+        assert response.json() == expected.get_json()
+    assert [response.status_code for response in async_responses] == [400, 400, 200]
@@ -0,0 +1,94 @@
+import json
+import os
+import time
+import pytest
+import sqlalchemy
+import audit
+from conftest import auth
+from models import db, AuditLog, Record
+
+
+@pytest.fixture
+def audit_log(monkeypatch):
+    # un logger propio por test; sin hilo escritor, se vacia con flush()
+    logger = audit.AuditLogger(maxsize=3, batch_size=2, interval=60)
+    logger._pid = os.getpid()
+    monkeypatch.setattr(audit, "audit", logger)
+    return logger
+
+
+class ListSink:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    def write(self, events):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.batches.append(list(events))
+
+
+def test_patient_and_record_reads_land_in_the_table(app, seed, doctor_token, audit_log):
+    audit_log.sink = audit.DatabaseSink(app)
+    audit_log.maxsize = 100
+    client = app.test_client()
+    patient = seed["patients"][0]
+    assert client.get(f"/patient/{patient}", headers=auth(doctor_token)).status_code == 200
+    assert client.get(f"/patient/{patient}/timeline", headers=auth(doctor_token)).status_code == 200
+    audit_log.flush()
+    rows = AuditLog.query.order_by(AuditLog.id).all()
+    assert {(row.endpoint, row.resource) for row in rows} == {
+        ("api.get_patient_by_id", "patient"),
+        ("api.get_patient_timeline", "patient"),
+        ("api.get_patient_timeline", "record"),
+    }
+    assert all((row.user_type, row.user_id) == ("doctor", seed["doctors"][0]) for row in rows)
+    records = sorted(row.resource_id for row in rows if row.resource == "record")
+    assert records == sorted(record.id for record in Record.query)
+
+
+def test_table_is_append_only(app, audit_log):
+    audit_log.sink = audit.DatabaseSink(app)
+    audit_log.enqueue(audit.events_for({"type": "doctor", "id": 1}, "127.0.0.1", "test", "patient", [1]))
+    audit_log.flush()
+    with pytest.raises(sqlalchemy.exc.DatabaseError):
+        with db.engine.begin() as connection:
+            connection.execute(AuditLog.__table__.delete())
+    assert AuditLog.query.count() == 1
+
+
+def test_file_sink_writes_json_lines_and_rotates(tmp_path, audit_log):
+    audit_log.sink = audit.FileSink(str(tmp_path), segment_bytes=1)
+    for id in (1, 2, 3):
+        audit_log.enqueue(audit.events_for(None, "10.0.0.1", "test", "record", [id]))
+    audit_log.flush()
+    segments = sorted(tmp_path.iterdir())
+    assert len(segments) == 2
+    lines = [json.loads(line) for segment in segments for line in segment.read_text().splitlines()]
+    assert [line["resource_id"] for line in lines] == [1, 2, 3]
+    assert lines[0]["user_type"] is None and lines[0]["ip"] == "10.0.0.1"
+
+
+def test_full_buffer_turns_reads_into_503(app, seed, doctor_token, audit_log):
+    audit_log.sink = ListSink()
+    audit_log.enqueue(audit.events_for(None, None, "test", "patient", [1, 2, 3]))
+    started = time.monotonic()
+    assert not audit_log.enqueue(audit.events_for(None, None, "test", "patient", [4]), timeout=0.05)
+    assert time.monotonic() - started >= 0.05
+    response = app.test_client().get(f"/patient/{seed['patients'][0]}", headers=auth(doctor_token))
+    assert response.status_code == 503
+    audit_log.flush()
+    assert audit_log.stats() == {"buffered": 0, "written": 3}
+
+
+def test_writer_retries_failed_batches_in_order():
+    sink = ListSink(failures=1)
+    logger = audit.AuditLogger(maxsize=10, batch_size=2, interval=0.01)
+    logger.sink = sink
+    assert logger.enqueue(audit.events_for(None, None, "test", "record", [1, 2, 3]))
+    deadline = time.monotonic() + 5
+    while logger.stats()["written"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [event[-1] for batch in sink.batches for event in batch] == [1, 2, 3]
+    assert logger.stats() == {"buffered": 0, "written": 3}
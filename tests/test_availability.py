@@ -0,0 +1,71 @@
+from conftest import auth
+
+BOOKING = {"date": "2024-01-08", "reason": "control", "mode": "virtual", "confirmation": "pendiente"}
+
+
+def free_times(client, doctor, day="2024-01-08"):
+    response = client.get(f"/doctor/{doctor}/slots?from={day}&to={day}")
+    assert response.status_code == 200
+    return [slot["time"] for slot in response.get_json()["slots"]]
+
+
+def book(client, seed, token, time, patient=0):
+    doctor, patient = seed["doctors"][0], seed["patients"][patient]
+    return client.post(f"/appointment/{doctor}/{patient}", json={**BOOKING, "time": time}, headers=auth(token))
+
+
+def test_booking_takes_a_free_slot(client, seed, doctor_token):
+    doctor = seed["doctors"][0]
+    assert free_times(client, doctor) == ["09:00:00", "10:00:00", "11:00:00"]
+    assert book(client, seed, doctor_token, "09:00").status_code == 201
+    assert free_times(client, doctor) == ["10:00:00", "11:00:00"]
+
+
+def test_booked_slot_conflicts(client, seed, doctor_token):
+    assert book(client, seed, doctor_token, "10:00").status_code == 201
+    response = book(client, seed, doctor_token, "10:00", patient=1)
+    assert response.status_code == 409
+    assert response.get_json() == {"error": "slot already booked"}
+
+
+def test_booking_outside_working_hours(client, seed, doctor_token):
+    assert book(client, seed, doctor_token, "09:30").status_code == 400
+    assert book(client, seed, doctor_token, "bad").status_code == 400
+
+
+def test_moving_an_appointment_into_a_booked_slot_conflicts(client, seed, doctor_token):
+    assert book(client, seed, doctor_token, "09:00").status_code == 201
+    moving = book(client, seed, doctor_token, "11:00", patient=1).get_json()["id"]
+    edit = {**BOOKING, "confirmation": "confirmada"}
+
+    assert client.put(f"/appointment/{moving}", json={**edit, "time": "09:30"}, headers=auth(doctor_token)).status_code == 400
+    response = client.put(f"/appointment/{moving}", json={**edit, "time": "09:00"}, headers=auth(doctor_token))
+    assert response.status_code == 409
+    response = client.put(f"/appointment/{moving}", json={**edit, "time": "10:00"}, headers=auth(doctor_token))
+    assert response.status_code == 200
+    assert response.get_json()["appointment"]["time"] == "10:00:00"
+    assert free_times(client, seed["doctors"][0]) == ["11:00:00"]
+
+
+def test_doctor_replaces_its_availability(client, seed, doctor_token):
+    doctor = seed["doctors"][0]
+    blocks = [{"weekday": 0, "start_time": "14:00", "end_time": "15:00", "slot_minutes": 30}]
+    response = client.put(f"/doctor/{doctor}/availability", json=blocks, headers=auth(doctor_token))
+    assert response.status_code == 200
+    assert free_times(client, doctor) == ["14:00:00", "14:30:00"]
+
+    other = client.put(f"/doctor/{seed['doctors'][1]}/availability", json=blocks, headers=auth(doctor_token))
+    assert other.status_code == 403
+
+
+def test_booking_without_a_time(client, seed, doctor_token):
+    doctor, patient = seed["doctors"][0], seed["patients"][0]
+    response = client.post(f"/appointment/{doctor}/{patient}", json=BOOKING, headers=auth(doctor_token))
+    assert response.status_code == 201
+    assert response.get_json()["time"] is None
+    # sin hora no ocupa un turno
+    assert "09:00:00" in free_times(client, doctor)
+    for date in ("08/01/2024", None):
+        response = client.post(f"/appointment/{doctor}/{patient}", json={**BOOKING, "date": date}, headers=auth(doctor_token))
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "invalid date or time"}
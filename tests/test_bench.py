@@ -0,0 +1,43 @@
+import datetime
+import pytest
+from conftest import ROOT
+from bench import datagen
+from bench.run import compare, summarize
+from models import Doctor, Patient, Appointment, Record
+
+TINY = {"doctors": 3, "patients": 10, "appointments": 60, "records": 20}
+
+
+def test_appointments_never_share_a_slot():
+    rows = list(datagen.appointments(500, 7, 20))
+    assert len({(row["id_doctor"], row["date"], row["time"]) for row in rows}) == len(rows)
+    assert all(row["date"].weekday() < 5 for row in rows)
+    assert all(datetime.time(9) <= row["time"] < datetime.time(17) for row in rows)
+    assert rows == list(datagen.appointments(500, 7, 20))
+
+
+def test_generate_fills_an_empty_database_once(app, monkeypatch):
+    monkeypatch.setitem(datagen.SCALES, "tiny", TINY)
+    monkeypatch.chdir(ROOT)
+    datagen.generate(app, "tiny")
+    assert (Doctor.query.count(), Patient.query.count()) == (3, 10)
+    assert (Appointment.query.count(), Record.query.count()) == (60, 20)
+    # cada record tiene la fecha de su cita
+    for record in Record.query:
+        assert record.date == record.appointment.date
+    with pytest.raises(SystemExit):
+        datagen.generate(app, "tiny")
+
+
+def test_compare_flags_regressions():
+    baseline = {
+        "fast": summarize([0.010] * 100, 0, 200, 1.0),
+        "stable": summarize([0.010] * 100, 0, 100, 1.0),
+    }
+    current = {
+        "fast": summarize([0.020] * 100, 1, 300, 2.0),
+        "stable": summarize([0.011] * 100, 0, 100, 1.05),
+    }
+    regressions = compare(current, baseline, tolerance=0.25)
+    assert all(line.startswith("fast:") for line in regressions)
+    assert {line.split()[1] for line in regressions} == {"p50_ms", "p99_ms", "rps", "errors", "queries/request"}
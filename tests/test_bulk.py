@@ -0,0 +1,108 @@
+import bulk
+from conftest import auth
+from models import db, Patient, Appointment
+
+
+def patient_item(n, **extra):
+    return {
+        "name": f"Bulk {n}", "dni": f"B{n}", "email": f"bulk{n}@test.dev", "password": "secret",
+        "city": "Quito", "country": "Ecuador", "age": 40, "gender": "m", "number": n, **extra,
+    }
+
+
+def statuses(response):
+    return [result["status"] for result in response.get_json()["results"]]
+
+
+def test_patients_bulk_reports_each_item(client, doctor_token):
+    items = [
+        patient_item(1),
+        patient_item(2, email="bulk1@test.dev"),
+        patient_item(3, email="patient1@test.dev"),
+        {"name": "incomplete"},
+    ]
+    response = client.post("/patients/bulk", json=items, headers=auth(doctor_token))
+    assert response.status_code == 207
+    assert statuses(response) == [201, 409, 409, 400]
+    assert response.get_json()["created"] == 1
+    created = db.session.get(Patient, response.get_json()["results"][0]["id"])
+    assert created.email == "bulk1@test.dev"
+    assert created.password != "secret"
+
+
+def test_patients_bulk_conflict_at_insert_keeps_the_rest(client, doctor_token, monkeypatch):
+    # otro request inserta el mismo email entre la validacion y el INSERT
+    hash_passwords = bulk.hash_passwords
+
+    def racing_hash(passwords, **kwargs):
+        other = patient_item(9, email="bulk2@test.dev", dni="OTHER")
+        db.session.add(Patient(**other, is_active=True))
+        db.session.commit()
+        return hash_passwords(passwords, **kwargs)
+
+    monkeypatch.setattr(bulk, "hash_passwords", racing_hash)
+    items = [patient_item(1), patient_item(2), patient_item(3)]
+    response = client.post("/patients/bulk", json=items, headers=auth(doctor_token))
+    assert response.status_code == 207
+    assert statuses(response) == [201, 409, 201]
+
+
+def test_patients_bulk_too_large(client, doctor_token):
+    items = [patient_item(n) for n in range(bulk.BULK_MAX_PATIENTS + 1)]
+    assert client.post("/patients/bulk", json=items, headers=auth(doctor_token)).status_code == 413
+
+
+def test_appointments_bulk_reports_each_item(client, seed, doctor_token):
+    doctor, patient = seed["doctors"][0], seed["patients"][0]
+    item = {"date": "2024-03-01", "reason": "control", "mode": "virtual", "confirmation": "pendiente"}
+    items = [
+        {**item, "id_doctor": doctor, "id_patient": patient},
+        {**item, "id_doctor": 999, "id_patient": patient},
+        {**item, "id_doctor": doctor, "id_patient": patient, "date": "not a date"},
+        {**item, "id_doctor": doctor},
+    ]
+    before = Appointment.query.count()
+    response = client.post("/appointments/bulk", json=items, headers=auth(doctor_token))
+    assert response.status_code == 207
+    assert statuses(response) == [201, 404, 400, 400]
+    assert Appointment.query.count() == before + 1
+
+
+def test_bulk_items_with_wrong_types_fail_alone(client, seed, doctor_token):
+    doctor, patient = seed["doctors"][0], seed["patients"][0]
+    item = {"date": "2024-03-01", "reason": "control", "mode": "virtual", "confirmation": "pendiente"}
+    items = [
+        {**item, "id_doctor": [doctor], "id_patient": patient},
+        {**item, "id_doctor": str(doctor), "id_patient": patient},
+        {**item, "id_doctor": doctor, "id_patient": True},
+        {**item, "id_doctor": doctor, "id_patient": patient},
+    ]
+    response = client.post("/appointments/bulk", json=items, headers=auth(doctor_token))
+    assert response.status_code == 207
+    assert statuses(response) == [400, 400, 400, 201]
+    assert "id_doctor" in response.get_json()["results"][1]["error"]
+
+    patients = [patient_item(1, email={}), patient_item(2, dni=["B2"]), patient_item(3)]
+    response = client.post("/patients/bulk", json=patients, headers=auth(doctor_token))
+    assert response.status_code == 207
+    assert statuses(response) == [400, 400, 201]
+
+
+def test_appointments_bulk_books_slots(client, seed, doctor_token):
+    doctor, patient = seed["doctors"][0], seed["patients"][0]
+    # lunes 9-12 en turnos de una hora (ver seed_data)
+    item = {"date": "2024-01-15", "reason": "control", "mode": "virtual", "confirmation": "pendiente",
+            "id_doctor": doctor, "id_patient": patient}
+    items = [
+        {**item, "time": "09:00"},
+        {**item, "time": "09:00"},
+        {**item, "time": "09:30"},
+        {**item, "time": "later"},
+        {**item, "time": "10:00"},
+    ]
+    response = client.post("/appointments/bulk", json=items, headers=auth(doctor_token))
+    assert statuses(response) == [201, 409, 400, 400, 201]
+    results = response.get_json()["results"]
+    assert results[1]["error"] == "slot already booked"
+    assert results[2]["error"] == "doctor is not available at that time"
+    assert str(db.session.get(Appointment, results[4]["id"]).time) == "10:00:00"
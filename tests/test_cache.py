@@ -0,0 +1,71 @@
+from sqlalchemy import event, update
+from cache import cache
+from conftest import auth
+from models import db, Doctor, Patient
+
+
+def test_doctor_read_through(client, seed):
+    id = seed["doctors"][0]
+    hits = cache.hits
+    assert client.get(f"/doctor/{id}").status_code == 200
+    assert client.get(f"/doctor/{id}").status_code == 200
+    assert cache.hits == hits + 1
+
+
+def test_orm_changes_invalidate(client, seed):
+    id = seed["doctors"][0]
+    client.get(f"/doctor/{id}")
+    db.session.get(Doctor, id).specialty = "neurologia"
+    db.session.commit()
+    assert client.get(f"/doctor/{id}").get_json()["specialty"] == "neurologia"
+
+
+def test_bulk_update_clears_the_cache(client, seed, doctor_token):
+    patient = seed["patients"][0]
+    client.get(f"/patient/{patient}", headers=auth(doctor_token))
+    db.session.execute(update(Patient).where(Patient.id == patient).values(city="Cusco", version=Patient.version + 1))
+    db.session.commit()
+    assert client.get(f"/patient/{patient}", headers=auth(doctor_token)).get_json()["city"] == "Cusco"
+
+
+def test_rollback_keeps_the_cache(client, seed):
+    id = seed["doctors"][0]
+    client.get(f"/doctor/{id}")
+    db.session.get(Doctor, id).specialty = "neurologia"
+    db.session.flush()
+    db.session.rollback()
+    hits = cache.hits
+    assert client.get(f"/doctor/{id}").get_json()["specialty"] == "cardiologia"
+    assert cache.hits == hits + 1
+
+
+def test_deleted_doctor_is_not_served(client, seed):
+    id = seed["doctors"][1]
+    client.get(f"/doctor/{id}")
+    db.session.delete(db.session.get(Doctor, id))
+    db.session.commit()
+    assert client.get(f"/doctor/{id}").status_code == 404
+
+
+def test_read_raced_by_an_invalidation_is_not_stored(client, seed):
+    id = seed["doctors"][0]
+    raced = []
+
+    def commit_elsewhere(conn, cursor, statement, *args):
+        # otro worker confirma un cambio mientras esta lectura va a la base
+        if not raced and statement.lstrip().upper().startswith("SELECT") and "FROM doctor" in statement:
+            raced.append(statement)
+            cache.invalidate(Doctor, id)
+
+    event.listen(db.engine, "before_cursor_execute", commit_elsewhere)
+    try:
+        skips = cache.stale_skips
+        assert client.get(f"/doctor/{id}").status_code == 200
+    finally:
+        event.remove(db.engine, "before_cursor_execute", commit_elsewhere)
+    assert raced
+    assert cache.stale_skips == skips + 1
+    assert cache.get(Doctor, id) is None
+    # la siguiente lectura, sin carrera, si llena el cache
+    client.get(f"/doctor/{id}")
+    assert cache.get(Doctor, id) is not None
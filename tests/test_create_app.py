@@ -0,0 +1,25 @@
+import pytest
+from app import create_app
+
+
+def test_api_profile_leaves_admin_out(client):
+    assert client.application.config["APP_PROFILE"] == "api"
+    assert "admin" not in client.application.blueprints
+    assert client.get("/admin/").status_code == 404
+    assert client.get("/").status_code == 200
+
+
+def test_full_profile_serves_admin(app):
+    pytest.importorskip("flask_admin")
+    full = create_app("full")
+    assert "admin" in full.blueprints
+    assert full.test_client().get("/admin/").status_code == 200
+
+
+def test_each_call_builds_a_new_app(app):
+    assert create_app("api") is not create_app("api")
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        create_app("worker")
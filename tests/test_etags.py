@@ -0,0 +1,28 @@
+from conftest import auth
+from models import db, Doctor, Record
+
+
+def test_doctor_not_modified_until_it_changes(client, seed):
+    id = seed["doctors"][0]
+    first = client.get(f"/doctor/{id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    cached = client.get(f"/doctor/{id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.data == b""
+
+    db.session.get(Doctor, id).name = "Doctor Renamed"
+    db.session.commit()
+    changed = client.get(f"/doctor/{id}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["name"] == "Doctor Renamed"
+
+
+def test_record_not_modified(client, doctor_token):
+    id = db.session.query(Record.id).first().id
+    etag = client.get(f"/record/{id}", headers=auth(doctor_token)).headers["ETag"]
+    headers = {**auth(doctor_token), "If-None-Match": etag}
+    assert client.get(f"/record/{id}", headers=headers).status_code == 304
@@ -0,0 +1,108 @@
+import csv
+import io
+import pytest
+import audit
+import export
+from conftest import auth
+from models import Appointment, Record
+from utils import APIException
+
+RANGE = {"from": "2024-01-02", "to": "2024-01-05"}
+
+
+class Recorder:
+    # reemplaza al AuditLogger: guarda cada enqueue, acepta los primeros `room`
+    def __init__(self, room=None):
+        self.calls = []
+        self.room = room
+
+    def enqueue(self, events, timeout=None):
+        if self.room is not None and len(self.calls) >= self.room:
+            return False
+        self.calls.append([(event[-2], event[-1]) for event in events])
+        return True
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(audit, "audit", recorder)
+    return recorder
+
+
+def expected_ids():
+    return [
+        row.id for row in Appointment.query
+        .filter(Appointment.date.between("2024-01-02", "2024-01-05"))
+        .order_by(Appointment.date, Appointment.id)
+    ]
+
+
+def test_csv_export_streams_every_row_in_the_range(client, seed, doctor_token, recorder):
+    response = client.get("/export/appointments", query_string=RANGE, headers=auth(doctor_token))
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert 'filename="appointments-2024-01-02-2024-01-05.csv"' in response.headers["Content-Disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [int(row["id"]) for row in rows] == expected_ids()
+    with_records = [row for row in rows if row["record_id"]]
+    assert {int(row["id"]) for row in with_records} == {
+        record.id_appointment for record in Record.query if record.id_appointment in expected_ids()
+    }
+    assert all(row["diagnosis"] == "dolor de cabeza" for row in with_records)
+    assert {resource for call in recorder.calls for resource, _ in call} == {"patient", "record"}
+
+
+def test_parquet_export_matches_csv(client, seed, doctor_token, recorder):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    response = client.get("/export/appointments", query_string={**RANGE, "format": "parquet"}, headers=auth(doctor_token))
+    assert response.status_code == 200
+    table = parquet.read_table(io.BytesIO(response.get_data()))
+    assert table.column_names == export.HEADER
+    assert table.column("id").to_pylist() == expected_ids()
+
+
+@pytest.mark.parametrize("query, error", [
+    ({"from": "2024-01-05", "to": "2024-01-01"}, "range must be"),
+    ({"from": "2024-01-01", "to": "2026-01-01"}, "range must be"),
+    ({"from": "yesterday", "to": "2024-01-01"}, "must be dates"),
+    ({**RANGE, "format": "xlsx"}, "format must be one of"),
+])
+def test_bad_requests(client, seed, doctor_token, query, error):
+    response = client.get("/export/appointments", query_string=query, headers=auth(doctor_token))
+    assert response.status_code == 400
+    assert error in response.get_json()["error"]
+
+
+def test_each_chunk_is_audited_before_it_is_sent(app, seed, monkeypatch):
+    recorder = Recorder(room=2)
+    monkeypatch.setattr(audit, "audit", recorder)
+    start, end = export.parse_range("2024-01-01", "2024-01-10")
+    with app.test_request_context():
+        chunks = export.audited(export.export_rows(start, end, chunk_size=4))
+        first = next(chunks)
+        assert len(first) == 4
+        assert recorder.calls[0] == [("patient", id) for id in dict.fromkeys(row.id_patient for row in first)]
+        assert recorder.calls[1] == [("record", row.record_id) for row in first if row.record_id]
+        # sin lugar en el audit log la descarga se corta antes del segundo bloque
+        with pytest.raises(APIException) as error:
+            next(chunks)
+    assert error.value.status_code == 503
+
+
+def test_cli_writes_the_file(app, seed, tmp_path):
+    output = tmp_path / "appointments.csv"
+    result = app.test_cli_runner().invoke(args=[
+        "export", "appointments", "--from", "2024-01-02", "--to", "2024-01-05",
+        "-o", str(output), "--chunk-size", "2",
+    ])
+    assert result.exit_code == 0, result.output
+    assert "done: 4 rows" in result.output
+    rows = list(csv.DictReader(output.open()))
+    assert [int(row["id"]) for row in rows] == expected_ids()
+
+
+def test_cli_rejects_a_reversed_range(app):
+    result = app.test_cli_runner().invoke(args=["export", "appointments", "--from", "2024-02-01", "--to", "2024-01-01"])
+    assert result.exit_code == 2
+    assert "range must be" in result.output
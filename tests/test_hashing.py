@@ -0,0 +1,66 @@
+import threading
+import time
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+import hashing
+from models import db, Doctor
+from utils import APIException
+
+
+@pytest.fixture
+def hash_method(monkeypatch):
+    def use(method):
+        monkeypatch.setattr(hashing, "HASH_METHOD", method)
+        monkeypatch.setattr(hashing, "_method_prefix", None)
+    return use
+
+
+def test_needs_rehash_compares_the_expanded_method(hash_method):
+    hash_method("pbkdf2")
+    assert not hashing.needs_rehash(generate_password_hash("x", method="pbkdf2"))
+    assert hashing.needs_rehash(generate_password_hash("x", method="pbkdf2:sha256:1000"))
+
+
+def test_login_rehashes_an_old_hash(client, seed, hash_method):
+    doctor = db.session.get(Doctor, seed["doctors"][0])
+    doctor.password = generate_password_hash("doctor-pass", method="pbkdf2:sha256:1000")
+    db.session.commit()
+
+    hash_method("pbkdf2:sha256:2000")
+    response = client.post("/login", json={"email": "doctor1@test.dev", "password": "doctor-pass"})
+    assert response.status_code == 200
+    db.session.expire_all()
+    stored = db.session.get(Doctor, seed["doctors"][0]).password
+    assert stored.startswith("pbkdf2:sha256:2000$")
+    assert check_password_hash(stored, "doctor-pass")
+
+
+def test_pool_hashes_and_releases_its_slot(monkeypatch):
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 1)
+    # el callback que libera el lugar puede correr justo despues de result()
+    monkeypatch.setattr(hashing, "HASH_QUEUE_LIMIT", 2)
+    monkeypatch.setattr(hashing, "_pool", None)
+    try:
+        for _ in range(3):
+            assert check_password_hash(hashing.hash_password("secret"), "secret")
+        assert len(hashing.hash_passwords(["a", "b", "c"], chunksize=2)) == 3
+        deadline = time.monotonic() + 5
+        while hashing._slots._value < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert hashing._slots._value == 2
+    finally:
+        if hashing._pool is not None:
+            hashing._pool.shutdown()
+
+
+def test_full_queue_answers_503(client, seed, monkeypatch):
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(hashing, "HASH_WORKERS", 1)
+    monkeypatch.setattr(hashing, "_get_pool", lambda: (None, slots))
+
+    with pytest.raises(APIException) as error:
+        hashing.hash_password("secret")
+    assert error.value.status_code == 503
+    response = client.post("/login", json={"email": "doctor1@test.dev", "password": "x"})
+    assert response.status_code == 503
@@ -0,0 +1,67 @@
+import json
+from models import db, Doctor, Appointment
+
+
+def doctor_row(id, email):
+    return {
+        "id": id, "name": "Imported", "dni": f"I{id}-{email}", "email": f"{email}@import.dev",
+        "password": "secret", "registrationt": f"RI{id}-{email}", "specialty": "clinica", "number": 1,
+        "is_active": True,
+    }
+
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    return str(path)
+
+
+def run_import(app, *args):
+    return app.test_cli_runner().invoke(args=["import", *args])
+
+
+def test_import_generates_ids_and_rejects_invalid_rows(app, tmp_path):
+    rows = [doctor_row(500, "a"), {"name": "no email"}, doctor_row(501, "b")]
+    result = run_import(app, "doctor", write_jsonl(tmp_path / "doctors.jsonl", rows), "--hash-passwords")
+    assert result.exit_code == 0, result.output
+    assert "2 inserted, 1 rejected" in result.output
+    imported = Doctor.query.filter(Doctor.email.like("%@import.dev")).all()
+    assert len(imported) == 2
+    assert {doctor.id for doctor in imported}.isdisjoint({500, 501})
+    assert all(doctor.password != "secret" for doctor in imported)
+
+
+def test_import_keeps_ids_and_skips_rows_the_database_rejects(app, tmp_path):
+    first = write_jsonl(tmp_path / "first.jsonl", [doctor_row(10, "a"), doctor_row(20, "b")])
+    assert run_import(app, "doctor", first, "--keep-ids").exit_code == 0
+    assert {doctor.id for doctor in Doctor.query} == {10, 20}
+
+    second = write_jsonl(tmp_path / "second.jsonl", [doctor_row(30, "c"), doctor_row(20, "dup"), doctor_row(40, "d")])
+    result = run_import(app, "doctor", second, "--keep-ids")
+    assert result.exit_code == 1
+    assert "rows 1-3" in result.output
+    assert "--skip-bad-rows" in result.output
+    assert {doctor.id for doctor in Doctor.query} == {10, 20}
+
+    # retoma desde el checkpoint, que quedo antes del lote rechazado
+    result = run_import(app, "doctor", second, "--keep-ids", "--skip-bad-rows")
+    assert result.exit_code == 0, result.output
+    assert "row 2:" in result.output
+    assert "2 inserted, 1 rejected" in result.output
+    db.session.expire_all()
+    assert {doctor.id for doctor in Doctor.query} == {10, 20, 30, 40}
+
+
+def test_import_resumes_from_the_checkpoint(app, seed, tmp_path):
+    doctor, patient = seed["doctors"][0], seed["patients"][0]
+    rows = [
+        {"date": f"2025-02-{day:02d}", "time": "10:00", "reason": "import", "mode": "virtual",
+         "confirmation": "pendiente", "id_doctor": doctor, "id_patient": patient}
+        for day in range(1, 6)
+    ]
+    path = write_jsonl(tmp_path / "appointments.jsonl", rows)
+    (tmp_path / "appointments.jsonl.checkpoint").write_text(json.dumps({"rows": 3}))
+    result = run_import(app, "appointment", path, "--batch-size", "1")
+    assert result.exit_code == 0, result.output
+    imported = Appointment.query.filter_by(reason="import").order_by(Appointment.date).all()
+    assert [appointment.date.day for appointment in imported] == [4, 5]
+    assert str(imported[0].time) == "10:00:00"
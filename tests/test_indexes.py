@@ -0,0 +1,79 @@
+"""
+The doctor, patient, date and record lookups run on their indexes.
+
+Each case sends a real request, records the SELECTs the route issues and
+runs EXPLAIN on them with the same parameters, so a query rewrite that
+stops using an index fails here. The Postgres variant runs the same cases
+against TEST_DATABASE_URL, with sequential scans disabled so the tiny
+test tables do not hide a missing index.
+
+The doctor lookup may also run on the slot unique constraint, whose
+(id_doctor, date) prefix is the same as ix_appointment_id_doctor_date;
+SQLite names that index sqlite_autoindex_appointment_<n>.
+"""
+import pytest
+from sqlalchemy import event
+from conftest import auth, seed_data, token_for
+from models import db
+
+DOCTOR_DATE = ("ix_appointment_id_doctor_date", "uq_appointment_doctor_slot", "sqlite_autoindex_appointment")
+
+# ruta -> indices que tiene que usar; una tupla es "cualquiera de estos"
+CASES = [
+    ("/doctor/{doctor}/schedule?from=2024-01-01&to=2024-01-31", [DOCTOR_DATE, "ix_record_id_appointment"]),
+    ("/patient/{patient}/timeline", ["ix_appointment_id_patient_date", "ix_record_id_appointment"]),
+    ("/appointments/search?confirmation=pendiente&from=2024-01-01", ["ix_appointment_confirmation_date"]),
+    ("/appointments/search?from=2024-01-02&to=2024-01-05", ["ix_appointment_date_id"]),
+    ("/record/appointment/1", ["ix_record_id_appointment"]),
+]
+FULL_SCANS = ("SCAN appointment\n", "SCAN record\n", "Seq Scan on appointment", "Seq Scan on record")
+
+
+def captured_selects(app, path, token):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        response = app.test_client().get(path, headers=auth(token))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    assert response.status_code == 200, response.get_json()
+    return statements
+
+
+def query_plan(statements):
+    lines = []
+    with db.engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET enable_seqscan = off")
+            prefix = "EXPLAIN "
+        else:
+            prefix = "EXPLAIN QUERY PLAN "
+        for statement, parameters in statements:
+            for row in conn.exec_driver_sql(prefix + statement, parameters):
+                lines.append(" ".join(str(value) for value in row))
+    return "\n".join(lines)
+
+
+def check_plans(app, seed, path, indexes):
+    token = token_for(app, "doctor", seed["doctors"][0])
+    path = path.format(doctor=seed["doctors"][0], patient=seed["patients"][0])
+    plan = query_plan(captured_selects(app, path, token)) + "\n"
+    for index in indexes:
+        names = index if isinstance(index, tuple) else (index,)
+        assert any(name in plan for name in names), plan
+    assert not any(scan in plan for scan in FULL_SCANS), plan
+
+
+@pytest.mark.parametrize("path,indexes", CASES)
+def test_sqlite_plans_use_indexes(app, seed, path, indexes):
+    check_plans(app, seed, path, indexes)
+
+
+@pytest.mark.parametrize("path,indexes", CASES)
+def test_postgres_plans_use_indexes(pg_app, path, indexes):
+    check_plans(pg_app, seed_data(), path, indexes)
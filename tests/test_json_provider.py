@@ -0,0 +1,56 @@
+import datetime
+import decimal
+import pytest
+import json_provider
+from conftest import auth
+from json_provider import FastJSONProvider
+
+PAYLOAD = {
+    "date": datetime.date(2024, 1, 1),
+    "time": datetime.time(9, 30),
+    "at": datetime.datetime(2024, 1, 1, 9, 30),
+    "price": decimal.Decimal("1.50"),
+    "name": "Peña",
+    1: "int key",
+}
+
+
+@pytest.mark.parametrize("with_orjson", [True, False])
+def test_same_output_with_and_without_orjson(app, monkeypatch, with_orjson):
+    if not with_orjson:
+        monkeypatch.setattr(json_provider, "orjson", None)
+    provider = FastJSONProvider(app)
+    assert provider.loads(provider.dumps(PAYLOAD)) == {
+        "date": "2024-01-01",
+        "time": "09:30:00",
+        "at": "2024-01-01T09:30:00",
+        "price": "1.50",
+        "name": "Peña",
+        "1": "int key",
+    }
+
+
+def test_responses_keep_model_key_order(client, seed, doctor_token):
+    response = client.get("/appointment/1", headers=auth(doctor_token))
+    assert response.mimetype == "application/json"
+    assert list(response.get_json()) == ["id", "date", "reason", "mode", "confirmation", "id_doctor", "id_patient", "time"]
+    assert response.get_json()["date"] == "2024-01-01"
+
+
+def test_serialize_uses_the_model_layout(app, seed):
+    from models import db, Appointment, Record
+
+    record = Record.query.first()
+    assert list(record.serialize()) == ["id", "diagnosis", "recommendations", "treatment", "date", "id_patient"]
+    assert record.serialize()["id_patient"] == record.id_appointment
+
+    appointment = db.session.get(Appointment, record.id_appointment)
+    loaded = appointment.serialize()
+    assert list(loaded) == list(Appointment.serialize_fields)
+    # expirado despues de un commit: se recarga por los atributos
+    appointment.reason = "seguimiento"
+    db.session.commit()
+    assert "reason" not in appointment.__dict__
+    assert appointment.serialize() == {**loaded, "reason": "seguimiento"}
+    # un objeto nuevo sin todos los atributos asignados
+    assert Appointment(id=1, date=datetime.date(2024, 1, 1)).serialize()["time"] is None
@@ -0,0 +1,42 @@
+from flask_jwt_extended import decode_token
+from hashing import hash_password
+from models import db, Doctor, Patient
+
+
+def set_password(model, id, password):
+    db.session.get(model, id).password = hash_password(password)
+    db.session.commit()
+
+
+def test_login_as_doctor_and_patient(client, seed):
+    set_password(Doctor, seed["doctors"][0], "doctor-pass")
+    set_password(Patient, seed["patients"][0], "patient-pass")
+
+    for email, password, type in (
+        ("doctor1@test.dev", "doctor-pass", "doctor"),
+        ("patient1@test.dev", "patient-pass", "patient"),
+    ):
+        response = client.post("/login", json={"email": email, "password": password})
+        assert response.status_code == 200
+        assert response.get_json()["type"] == type
+        identity = decode_token(response.get_json()["token"])["sub"]
+        assert identity["email"] == email
+        # el token que entrega /login sirve en las rutas con jwt_required
+        headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        expected = 200 if type == "doctor" else 404
+        assert client.get("/appointments", headers=headers).status_code == expected
+
+
+def test_login_doctor_wins_when_email_is_in_both_tables(client, seed):
+    set_password(Doctor, seed["doctors"][0], "doctor-pass")
+    patient = db.session.get(Patient, seed["patients"][0])
+    patient.email = "doctor1@test.dev"
+    db.session.commit()
+    response = client.post("/login", json={"email": "doctor1@test.dev", "password": "doctor-pass"})
+    assert response.get_json()["type"] == "doctor"
+
+
+def test_login_errors(client, seed):
+    set_password(Doctor, seed["doctors"][0], "doctor-pass")
+    assert client.post("/login", json={"email": "nobody@test.dev", "password": "x"}).status_code == 404
+    assert client.post("/login", json={"email": "doctor1@test.dev", "password": "wrong"}).status_code == 401
@@ -0,0 +1,27 @@
+import metrics
+
+
+def test_requests_and_queries_are_recorded(client, seed):
+    before = metrics.snapshot()
+    client.get(f"/doctor/{seed['doctors'][0]}")
+    client.get("/doctor/999")
+    after = metrics.snapshot()
+
+    def requests(data, status):
+        return sum(data["requests"].get(f"api.get_doctor_by_id|GET|{status}", [0])[:-1])
+
+    assert requests(after, 200) == requests(before, 200) + 1
+    assert requests(after, 404) == requests(before, 404) + 1
+    queries = after["queries"]["api.get_doctor_by_id"][0] - before["queries"].get("api.get_doctor_by_id", [0])[0]
+    assert queries >= 2
+
+
+def test_metrics_endpoint_renders_prometheus_text(client, seed):
+    client.get(f"/doctor/{seed['doctors'][0]}")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_bucket{endpoint="api.get_doctor_by_id",method="GET",status="200",le="+Inf"}' in text
+    assert 'http_db_queries_total{endpoint="api.get_doctor_by_id"}' in text
+    assert "cache_hits_total" in text
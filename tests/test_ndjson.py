@@ -0,0 +1,55 @@
+import json
+import pytest
+from conftest import auth, token_for
+from models import Appointment
+
+NDJSON = "application/x-ndjson"
+
+
+def expected(app, appointments):
+    # lo que el provider JSON de la app hace con cada serialize()
+    return [app.json.loads(app.json.dumps(appointment.serialize())) for appointment in appointments]
+
+
+def lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_get_appointments_streams_one_object_per_line(client, seed, doctor_token):
+    response = client.get("/appointments", headers={**auth(doctor_token), "Accept": NDJSON})
+    assert response.status_code == 200
+    assert response.mimetype == NDJSON
+    rows = lines(response)
+    assert rows == expected(client.application, Appointment.query.order_by(Appointment.id))
+    assert len(rows) == 10
+
+
+def test_status_filter_streams_too(client, seed, doctor_token):
+    response = client.post(
+        "/appointment/status",
+        json={"confirmation": "pendiente"},
+        headers={**auth(doctor_token), "Accept": NDJSON},
+    )
+    assert response.mimetype == NDJSON
+    rows = lines(response)
+    assert len(rows) == 5
+    assert {row["confirmation"] for row in rows} == {"pendiente"}
+
+
+@pytest.mark.parametrize("accept", [None, "application/json", "*/*", f"application/json, {NDJSON};q=0.5"])
+def test_json_is_unchanged_unless_ndjson_is_preferred(client, seed, doctor_token, accept):
+    headers = auth(doctor_token)
+    if accept:
+        headers["Accept"] = accept
+    response = client.get("/appointments", headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    body = response.get_json()
+    assert list(body) == ["appointment"]
+    assert body["appointment"] == expected(client.application, Appointment.query.all())
+
+
+def test_patients_do_not_get_a_stream(client, seed):
+    token = token_for(client.application, "patient", seed["patients"][0])
+    response = client.get("/appointments", headers={**auth(token), "Accept": NDJSON})
+    assert response.status_code == 404
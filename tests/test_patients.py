@@ -0,0 +1,49 @@
+import pytest
+import app as app_module
+from models import db, Patient
+
+
+@pytest.fixture
+def patients(seed):
+    db.session.add_all(
+        Patient(
+            name=f"Patient {i}", dni=f"P{i}", email=f"patient{i}@test.dev", password="x",
+            city="Lima", country="Peru", age=30, gender="f", number=i, is_active=True,
+        )
+        for i in range(3, 8)
+    )
+    db.session.commit()
+    return [row.id for row in Patient.query.order_by(Patient.id)]
+
+
+def page(client, query=""):
+    response = client.get(f"/patients{query}")
+    assert response.status_code == 200
+    body = response.get_json()
+    return [row["id"] for row in body["patienst"]], body["next"]
+
+
+def test_cursor_walks_every_patient_once(client, patients):
+    first, cursor = page(client, "?limit=3")
+    assert first == patients[:3]
+    assert cursor == patients[2]
+    second, cursor = page(client, f"?limit=3&after={cursor}")
+    assert second == patients[3:6]
+    last, cursor = page(client, f"?limit=3&after={cursor}")
+    assert last == patients[6:]
+    assert cursor is None
+    # solo las columnas de Patient.serialize(), sin password
+    assert "password" not in client.get("/patients?limit=1").get_json()["patienst"][0]
+
+
+def test_limit_is_clamped(client, patients, monkeypatch):
+    monkeypatch.setattr(app_module, "PATIENTS_MAX_PAGE_SIZE", 4)
+    assert len(page(client, "?limit=1000")[0]) == 4
+    assert page(client, "?limit=0")[0] == patients[:1]
+
+
+@pytest.mark.parametrize("query", ["?after=abc", "?limit=x", "?after=1.5"])
+def test_unparseable_parameters_are_a_400(client, patients, query):
+    response = client.get(f"/patients{query}")
+    assert response.status_code == 400
+    assert "must be an integer" in response.get_json()["message"]
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import querycheck
+from conftest import auth
+from models import db, Appointment, Doctor
+from querycheck import RepeatedQueryError, setup_query_check
+
+
+def enable(app, threshold):
+    app.config["QUERY_CHECK"] = "raise"
+    app.config["QUERY_CHECK_THRESHOLD"] = threshold
+    app.config["PROPAGATE_EXCEPTIONS"] = True
+    setup_query_check(app)
+
+
+@pytest.fixture
+def strict_queries(app):
+    enable(app, 2)
+    yield
+    event.remove(Engine, "before_cursor_execute", querycheck._count_statement)
+
+
+def test_schedule_loads_records_without_n_plus_one(client, seed, doctor_token, strict_queries):
+    response = client.get(f"/doctor/{seed['doctors'][0]}/schedule?from=2024-01-01&to=2024-01-31", headers=auth(doctor_token))
+    assert response.status_code == 200
+    appointments = response.get_json()["appointment"]
+    assert len(appointments) == 10
+    assert sum(len(appointment["records"]) for appointment in appointments) == 5
+
+
+def test_lazy_loop_is_detected(app, seed, strict_queries):
+    @app.route("/lazy")
+    def lazy():
+        return {"records": sum(len(appointment.record) for appointment in Appointment.query.all())}
+
+    with pytest.raises(RepeatedQueryError):
+        app.test_client().get("/lazy")
+
+
+def test_setting_up_again_does_not_multiply_the_counts(app, seed, strict_queries):
+    # otra app en el mismo proceso (o create_app llamado de nuevo)
+    enable(app, 3)
+    setup_query_check(app)
+
+    @app.route("/three")
+    def three():
+        return {"names": [db.session.get(Doctor, seed["doctors"][0], populate_existing=True).name for _ in range(3)]}
+
+    assert app.test_client().get("/three").status_code == 200
+
+
+def test_apps_without_the_check_are_left_alone(app, seed, strict_queries):
+    app.config["QUERY_CHECK"] = None
+
+    @app.route("/lazy")
+    def lazy():
+        return {"records": sum(len(appointment.record) for appointment in Appointment.query.all())}
+
+    assert app.test_client().get("/lazy").status_code == 200
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from conftest import auth, token_for
+from ratelimit import SharedBuckets, build_limiter, setup_rate_limit
+
+LIMITS = "api.get_doctor_by_id=2/60,api.get_appointment_by_id=2/60"
+
+
+@pytest.fixture
+def buckets(tmp_path):
+    return SharedBuckets(path=str(tmp_path / "ratelimit.bin"), slots=1024)
+
+
+def limit(app, buckets):
+    app.config["RATE_LIMIT_ENABLED"] = True
+    app.config["RATE_LIMITS"] = LIMITS
+    setup_rate_limit(app, buckets)
+
+
+def test_429_with_retry_after(app, seed, buckets):
+    limit(app, buckets)
+    client = app.test_client()
+    path = f"/doctor/{seed['doctors'][0]}"
+    assert [client.get(path).status_code for _ in range(3)] == [200, 200, 429]
+    response = client.get(path)
+    assert response.get_json() == {"error": "too many requests"}
+    assert 1 <= int(response.headers["Retry-After"]) <= 30
+    # otras rutas tienen su propio balde
+    assert client.get("/doctor/1/availability").status_code == 200
+
+
+def test_buckets_are_per_identity(app, seed, buckets):
+    limit(app, buckets)
+    client = app.test_client()
+    path = f"/doctor/{seed['doctors'][0]}"
+    first, second = (auth(token_for(app, "doctor", id)) for id in seed["doctors"])
+    assert [client.get(path, headers=first).status_code for _ in range(3)] == [200, 200, 429]
+    assert client.get(path, headers=second).status_code == 200
+    assert client.get(path).status_code == 200
+
+
+def test_asgi_routes_share_the_buckets(asgi_app, buckets):
+    import httpx
+    asgi, seed = asgi_app
+    app = asgi.flask_app
+    app.config["RATE_LIMITS"] = LIMITS
+    app.extensions["rate_limit"] = build_limiter(app, buckets)
+    headers = auth(token_for(app, "doctor", seed["doctors"][0]))
+
+    async def responses():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            result = [await client.get("/appointment/1", headers=headers) for _ in range(3)]
+        await asgi.engine.dispose()
+        return result
+
+    ok, also_ok, limited = asyncio.run(responses())
+    assert (ok.status_code, also_ok.status_code, limited.status_code) == (200, 200, 429)
+    assert limited.json() == {"error": "too many requests"}
+    assert "retry-after" in limited.headers
+    # la ruta de Flask cuenta contra el mismo balde del mismo usuario
+    check = app.extensions["rate_limit"]
+    assert check("api.get_appointment_by_id", f"doctor:{seed['doctors'][0]}") > 0
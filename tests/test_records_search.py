@@ -0,0 +1,58 @@
+import datetime
+from conftest import auth
+from models import db, Record
+
+
+def add_record(seed, **fields):
+    record = Record(date=datetime.date(2024, 2, 1), id_appointment=1, **{
+        "diagnosis": "control", "treatment": "ninguno", "recommendations": "ninguna", **fields,
+    })
+    db.session.add(record)
+    db.session.commit()
+    return record.id
+
+
+def search(client, token, q, **params):
+    query = "&".join(f"{key}={value}" for key, value in {"q": q, **params}.items())
+    return client.get(f"/records/search?{query}", headers=auth(token))
+
+
+def test_search_matches_every_word_across_columns(client, seed, doctor_token):
+    match = add_record(seed, diagnosis="migraña cronica", treatment="ibuprofeno")
+    add_record(seed, diagnosis="migraña leve", treatment="descanso")
+    response = search(client, doctor_token, "migraña ibuprofeno")
+    assert response.status_code == 200
+    assert [record["id"] for record in response.get_json()["record"]] == [match]
+
+
+def test_index_follows_edits_and_deletes(client, seed, doctor_token):
+    id = add_record(seed, diagnosis="hipertension")
+    record = db.session.get(Record, id)
+    record.diagnosis = "glucosa alta"
+    db.session.commit()
+    assert search(client, doctor_token, "hipertension").get_json()["record"] == []
+    assert [r["id"] for r in search(client, doctor_token, "glucosa").get_json()["record"]] == [id]
+
+    db.session.delete(record)
+    db.session.commit()
+    assert search(client, doctor_token, "glucosa").get_json()["record"] == []
+
+
+def test_search_syntax_is_not_interpreted(client, seed, doctor_token):
+    add_record(seed, diagnosis="dolor")
+    for q in ('"', "dolor OR", "NEAR(dolor", "dolor*"):
+        assert search(client, doctor_token, q).status_code == 200
+
+
+def test_search_pages(client, seed, doctor_token):
+    # el seed ya tiene 5 records con "dolor de cabeza"
+    first = search(client, doctor_token, "cabeza", limit=3).get_json()["record"]
+    second = search(client, doctor_token, "cabeza", limit=3, page=2).get_json()["record"]
+    assert len(first) == 3 and len(second) == 2
+    assert not {r["id"] for r in first} & {r["id"] for r in second}
+    assert search(client, doctor_token, " ").status_code == 400
+
+
+def test_non_integer_paging_is_a_400(client, seed, doctor_token):
+    assert search(client, doctor_token, "cabeza", page="two").status_code == 400
+    assert search(client, doctor_token, "cabeza", limit="all").status_code == 400
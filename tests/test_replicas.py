@@ -0,0 +1,77 @@
+import asyncio
+import shutil
+import sqlite3
+import sys
+import pytest
+from cache import cache
+from conftest import build_app, import_asgi, seed_data
+from db_routing import STICKY_COOKIE
+from models import db
+
+
+@pytest.fixture
+def databases(template_db, tmp_path, monkeypatch):
+    # primario y replica con los mismos datos, salvo el nombre del doctor 1,
+    # que en la replica delata de donde se leyo
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    shutil.copy(template_db, primary)
+    monkeypatch.delenv("DATABASE_REPLICA_URLS", raising=False)
+    with build_app(f"sqlite:///{primary}", monkeypatch).app_context():
+        seed = seed_data()
+        db.engine.dispose()
+    shutil.copy(primary, replica)
+    with sqlite3.connect(replica) as conn:
+        conn.execute("UPDATE doctor SET name = 'From Replica' WHERE id = ?", (seed["doctors"][0],))
+    return f"sqlite:///{primary}", f"sqlite:///{replica}", seed
+
+
+@pytest.fixture
+def replica_client(databases, monkeypatch):
+    primary, replica, seed = databases
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", replica)
+    app = build_app(primary, monkeypatch)
+    cache.clear()
+    with app.app_context():
+        yield app.test_client(), seed
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_reads_go_to_the_replica_and_are_not_cached(replica_client):
+    client, seed = replica_client
+    hits = cache.hits
+    for _ in range(2):
+        assert client.get(f"/doctor/{seed['doctors'][0]}").get_json()["name"] == "From Replica"
+    assert cache.hits == hits
+
+
+def test_client_reads_the_primary_after_writing(replica_client):
+    client, seed = replica_client
+    response = client.delete(f"/doctor/{seed['doctors'][1]}")
+    assert response.status_code == 200
+    assert STICKY_COOKIE in response.headers.get("Set-Cookie", "")
+    assert client.get(f"/doctor/{seed['doctors'][1]}").status_code == 404
+    assert client.get(f"/doctor/{seed['doctors'][0]}").get_json()["name"] == "Doctor 1"
+
+
+def test_async_reads_use_the_replica(databases, monkeypatch):
+    primary, replica, seed = databases
+    asgi = import_asgi(primary, monkeypatch, replica)
+    import httpx
+
+    async def names(*cookies):
+        transport = httpx.ASGITransport(app=asgi.application)
+        names = []
+        for cookie in cookies:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", cookies=cookie) as client:
+                names.append((await client.get(f"/doctor/{seed['doctors'][0]}")).json()["name"])
+        for engine in [asgi.engine, *asgi.replica_engines]:
+            await engine.dispose()
+        return names
+
+    try:
+        fresh = {STICKY_COOKIE: "9999999999"}
+        assert asyncio.run(names({}, {}, fresh)) == ["From Replica", "From Replica", "Doctor 1"]
+    finally:
+        sys.modules.pop("asgi", None)
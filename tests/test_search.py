@@ -0,0 +1,75 @@
+import base64
+import datetime
+import json
+import pytest
+from conftest import MONDAY, auth
+from models import db, Appointment
+
+
+def pages(client, token, query):
+    ids, after = [], None
+    while True:
+        url = f"/appointments/search?{query}" + (f"&after={after}" if after else "")
+        response = client.get(url, headers=auth(token))
+        assert response.status_code == 200
+        body = response.get_json()
+        ids.extend(row["id"] for row in body["appointment"])
+        after = body["next"]
+        if not after:
+            return ids
+
+
+@pytest.fixture
+def same_day(seed):
+    # citas con la misma fecha: el id desempata el orden
+    db.session.add_all(
+        Appointment(date=MONDAY, reason="extra", mode="virtual", confirmation="pendiente",
+                    id_doctor=seed["doctors"][1], id_patient=seed["patients"][1])
+        for _ in range(3)
+    )
+    db.session.commit()
+
+
+@pytest.mark.parametrize("sort", ["date", "-date"])
+def test_cursor_pages_cover_every_row_once(client, doctor_token, same_day, sort):
+    expected = sorted(Appointment.query, key=lambda row: (row.date, row.id), reverse=sort == "-date")
+    assert pages(client, doctor_token, f"limit=3&sort={sort}") == [row.id for row in expected]
+
+
+def test_filters_and_count(client, seed, doctor_token, same_day):
+    query = f"id_doctor={seed['doctors'][0]}&confirmation=pendiente&from=2024-01-02&to=2024-01-08"
+    expected = [
+        row.id for row in Appointment.query.order_by(Appointment.date, Appointment.id)
+        if row.id_doctor == seed["doctors"][0] and row.confirmation == "pendiente"
+        and datetime.date(2024, 1, 2) <= row.date <= datetime.date(2024, 1, 8)
+    ]
+    assert pages(client, doctor_token, query + "&limit=2") == expected
+    count = client.get(f"/appointments/search?{query}&count_only=1", headers=auth(doctor_token))
+    assert count.get_json() == {"count": len(expected)}
+
+
+def cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("after", [
+    "not-a-cursor",
+    cursor(["2024-01-01"]),
+    cursor({"date": "2024-01-01", "id": 1}),
+    cursor(["yesterday", 1]),
+    cursor(["2024-01-01", "one"]),
+])
+def test_invalid_cursor_is_a_400(client, doctor_token, after):
+    response = client.get(f"/appointments/search?after={after}", headers=auth(doctor_token))
+    assert response.status_code == 400
+
+
+def test_bad_dates_are_a_400(client, doctor_token):
+    assert client.get("/appointments/search?from=today", headers=auth(doctor_token)).status_code == 400
+
+
+@pytest.mark.parametrize("query", ["id_doctor=abc&count_only=1", "id_patient=1.5", "limit=x"])
+def test_non_integer_parameters_are_a_400(client, seed, doctor_token, query):
+    response = client.get(f"/appointments/search?{query}", headers=auth(doctor_token))
+    assert response.status_code == 400
+    assert "must be an integer" in response.get_json()["message"]
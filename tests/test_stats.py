@@ -0,0 +1,98 @@
+import datetime
+import pytest
+from sqlalchemy import text
+import stats
+from conftest import auth
+from models import db, Appointment, AppointmentStat
+
+BOOKING = {"date": "2024-01-15", "reason": "control", "mode": "virtual", "confirmation": "pendiente"}
+
+
+def rollup():
+    return {
+        (row.id_doctor, row.day, row.confirmation): row.count
+        for row in AppointmentStat.query if row.count
+    }
+
+
+def counted():
+    return {row[:3]: row.count for row in db.session.execute(stats.expected_counts())}
+
+
+def assert_in_sync():
+    db.session.expire_all()
+    assert rollup() == counted()
+    assert stats.check() == []
+
+
+def total(client, token, **query):
+    response = client.get("/appointments/stats", query_string=query, headers=auth(token))
+    assert response.status_code == 200
+    return response.get_json()["total"]
+
+
+def test_seeded_rollup_matches_appointment(client, seed, doctor_token):
+    assert_in_sync()
+    assert total(client, doctor_token) == Appointment.query.count() == 10
+    assert total(client, doctor_token, confirmation="pendiente") == 5
+    assert total(client, doctor_token, **{"from": "2024-01-01", "to": "2024-01-03"}) == 3
+    response = client.get("/appointments/stats?group_by=specialty", headers=auth(doctor_token))
+    assert response.get_json()["stats"] == [{"specialty": "cardiologia", "count": 10}]
+
+
+def test_every_write_path_keeps_it_in_sync(client, seed, doctor_token):
+    doctor, patient = seed["doctors"][0], seed["patients"][0]
+    headers = auth(doctor_token)
+
+    created = client.post(f"/appointment/{doctor}/{patient}", json={**BOOKING, "time": "09:00"}, headers=headers)
+    assert created.status_code == 201
+    id = created.get_json()["id"]
+    assert_in_sync()
+
+    # cambio de estado y de dia: se descuenta la clave vieja
+    edit = {**BOOKING, "date": "2024-01-22", "time": "10:00", "confirmation": "confirmada"}
+    assert client.put(f"/appointment/{id}", json=edit, headers=headers).status_code == 200
+    assert_in_sync()
+    assert (doctor, datetime.date(2024, 1, 15), "pendiente") not in rollup()
+
+    assert client.delete(f"/appointment/{id}", headers=headers).status_code == 200
+    assert_in_sync()
+
+    items = [{**BOOKING, "date": f"2024-02-0{day}", "id_doctor": doctor, "id_patient": patient} for day in (5, 6)]
+    assert client.post("/appointments/bulk", json=items, headers=headers).status_code == 207
+    assert_in_sync()
+
+    # escrituras fuera de la API (admin, imports) pasan por los mismos triggers
+    db.session.execute(text("UPDATE appointment SET confirmation = 'cancelada' WHERE date >= '2024-02-01'"))
+    db.session.commit()
+    assert_in_sync()
+    assert total(client, doctor_token) == Appointment.query.count() == 12
+
+
+def test_check_and_rebuild_from_the_cli(app, seed):
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=["stats", "check"]).exit_code == 0
+
+    # el rollup se desvia (p. ej. una base sin triggers)
+    db.session.execute(text("DELETE FROM appointment_stat WHERE day = '2024-01-01'"))
+    db.session.execute(text("UPDATE appointment_stat SET count = count + 5 WHERE day = '2024-01-02'"))
+    db.session.commit()
+    differences = stats.check()
+    assert [(row["day"].isoformat(), row["expected"], row["stored"]) for row in differences] == [
+        ("2024-01-01", 1, 0),
+        ("2024-01-02", 1, 6),
+    ]
+    result = runner.invoke(args=["stats", "check"])
+    assert result.exit_code == 1
+    assert "2 keys differ" in result.output
+
+    result = runner.invoke(args=["stats", "rebuild", "--from", "2024-01-01", "--to", "2024-01-02"])
+    assert result.exit_code == 0, result.output
+    assert_in_sync()
+    assert runner.invoke(args=["stats", "check"]).exit_code == 0
+
+
+@pytest.mark.parametrize("query", ["group_by=week", "from=yesterday", "id_doctor=abc"])
+def test_bad_queries(client, doctor_token, query):
+    response = client.get(f"/appointments/stats?{query}", headers=auth(doctor_token))
+    assert response.status_code == 400
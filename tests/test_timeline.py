@@ -0,0 +1,47 @@
+import pytest
+from conftest import auth, token_for
+from models import Appointment, Record
+
+
+def timeline(client, token, patient, query=""):
+    appointments, after = [], None
+    while True:
+        url = f"/patient/{patient}/timeline?{query}" + (f"&after={after}" if after else "")
+        response = client.get(url, headers=auth(token))
+        assert response.status_code == 200
+        body = response.get_json()
+        appointments.extend(body["appointment"])
+        after = body["next"]
+        if not after:
+            return appointments
+
+
+@pytest.mark.parametrize("sort", ["date", "-date"])
+def test_timeline_pages_with_records(client, seed, doctor_token, sort):
+    patient = seed["patients"][0]
+    appointments = timeline(client, doctor_token, patient, f"limit=4&sort={sort}")
+    expected = Appointment.query.filter_by(id_patient=patient).order_by(Appointment.date, Appointment.id).all()
+    if sort == "-date":
+        expected.reverse()
+    assert [appointment["id"] for appointment in appointments] == [row.id for row in expected]
+    for appointment in appointments:
+        records = Record.query.filter_by(id_appointment=appointment["id"]).order_by(Record.id).all()
+        assert [record["id"] for record in appointment["records"]] == [record.id for record in records]
+
+
+def test_patient_reads_only_its_own_timeline(client, seed):
+    own, other = seed["patients"]
+    token = token_for(client.application, "patient", own)
+    assert client.get(f"/patient/{own}/timeline", headers=auth(token)).status_code == 200
+    assert client.get(f"/patient/{other}/timeline", headers=auth(token)).status_code == 403
+
+
+@pytest.mark.parametrize("after", ["not-a-cursor", "WzFd", "WyJ4IiwxXQ"])
+def test_invalid_cursor_is_a_400(client, seed, doctor_token, after):
+    response = client.get(f"/patient/{seed['patients'][0]}/timeline?after={after}", headers=auth(doctor_token))
+    assert response.status_code == 400
+
+
+def test_non_integer_limit_is_a_400(client, seed, doctor_token):
+    response = client.get(f"/patient/{seed['patients'][0]}/timeline?limit=ten", headers=auth(doctor_token))
+    assert response.status_code == 400